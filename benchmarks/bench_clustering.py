@@ -0,0 +1,305 @@
+"""Scalability benchmarks for the clustering estimators in msmbuilder.cluster
+
+Each estimator is fit to (and then predicts) synthetic data for every
+combination of the requested n_samples, n_features, n_clusters and metric.
+The data is generated offline, either from a random mixture of Gaussians or
+by sampling trajectories of the Muller or quad-well potentials.
+
+For every run, one JSON record per line is written with the fit and predict
+wall-clock times, the peak memory allocated during the run (with
+``tracemalloc``, on Python 3) and the number of distance evaluations made
+through ``msmbuilder.libdistance`` (and the scipy-based helpers used by
+``LandmarkAgglomerative``), so that the output can be collected and
+compared between revisions to track regressions.
+
+Examples
+--------
+$ python bench_clustering.py --estimators KCenters KMedoids \\
+      --n-samples 1000 5000 --n-features 2 10 --metrics euclidean cityblock \\
+      --output results.jsonl
+$ python bench_clustering.py --dataset muller --n-samples 10000
+"""
+from __future__ import print_function, division, absolute_import
+
+import sys
+import json
+import argparse
+import functools
+import itertools
+import platform
+from timeit import default_timer as timer
+
+import numpy as np
+from sklearn.utils import check_random_state
+
+from msmbuilder import libdistance, version
+from msmbuilder.cluster import (KCenters, KMedoids, MiniBatchKMedoids,
+                                RegularSpatial, NDGrid, LandmarkAgglomerative)
+from msmbuilder.cluster import agglomerative
+from msmbuilder.example_datasets import load_muller, load_quadwell
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+
+#-----------------------------------------------------------------------------
+# Estimators
+#-----------------------------------------------------------------------------
+
+def make_kcenters(X, n_clusters, metric, random_state, args):
+    return KCenters(n_clusters=n_clusters, metric=metric,
+                    random_state=random_state)
+
+
+def make_kmedoids(X, n_clusters, metric, random_state, args):
+    return KMedoids(n_clusters=n_clusters, metric=metric,
+                    random_state=random_state, n_jobs=args.n_jobs)
+
+
+def make_minibatchkmedoids(X, n_clusters, metric, random_state, args):
+    return MiniBatchKMedoids(n_clusters=n_clusters, metric=metric,
+                             batch_size=args.batch_size,
+                             random_state=random_state)
+
+
+def make_regularspatial(X, n_clusters, metric, random_state, args):
+    # RegularSpatial is parameterized by the minimum distance between the
+    # centers. Pick it so that a uniform distribution of the points over
+    # their typical spread would give about n_clusters clusters.
+    random = check_random_state(random_state)
+    sample = X[random.randint(len(X), size=min(len(X), 500))]
+    spread = np.median(libdistance.pdist(sample, metric))
+    d_min = spread * n_clusters ** (-1.0 / X.shape[1])
+    return RegularSpatial(d_min=d_min, metric=metric)
+
+
+def make_ndgrid(X, n_clusters, metric, random_state, args):
+    n_bins = max(1, int(round(n_clusters ** (1.0 / X.shape[1]))))
+    # a dense grid with more cells than samples is mostly empty
+    sparse = n_bins ** X.shape[1] > len(X)
+    return NDGrid(n_bins_per_feature=n_bins, sparse=sparse)
+
+
+def make_landmarkagglomerative(X, n_clusters, metric, random_state, args):
+    n_landmarks = None
+    if args.n_landmarks is not None and args.n_landmarks < len(X):
+        n_landmarks = args.n_landmarks
+    return LandmarkAgglomerative(n_clusters=n_clusters,
+                                 n_landmarks=n_landmarks, metric=metric,
+                                 random_state=random_state)
+
+
+# name -> (factory, uses a distance metric)
+ESTIMATORS = {
+    'KCenters': (make_kcenters, True),
+    'KMedoids': (make_kmedoids, True),
+    'MiniBatchKMedoids': (make_minibatchkmedoids, True),
+    'RegularSpatial': (make_regularspatial, True),
+    'NDGrid': (make_ndgrid, False),
+    'LandmarkAgglomerative': (make_landmarkagglomerative, True),
+}
+
+
+#-----------------------------------------------------------------------------
+# Datasets
+#-----------------------------------------------------------------------------
+
+def make_gaussians(n_samples, n_features, n_clusters, random_state):
+    """Random mixture of n_clusters isotropic Gaussians"""
+    random = check_random_state(random_state)
+    means = random.uniform(-10, 10, size=(n_clusters, n_features))
+    labels = random.randint(n_clusters, size=n_samples)
+    return means[labels] + random.randn(n_samples, n_features)
+
+
+def _trajectory_frames(trajectories, n_samples):
+    X = np.concatenate(trajectories)
+    if len(X) < n_samples:
+        print('warning: the dataset only has %d frames' % len(X),
+              file=sys.stderr)
+    return np.ascontiguousarray(X[:n_samples], dtype=np.float64)
+
+
+def make_muller(n_samples, n_features, n_clusters, random_state):
+    """Frames from brownian dynamics on the Muller potential (2 features)"""
+    return _trajectory_frames(
+        load_muller(random_state=random_state).trajectories, n_samples)
+
+
+def make_quadwell(n_samples, n_features, n_clusters, random_state):
+    """Frames from brownian dynamics on the quad-well potential (1 feature)"""
+    return _trajectory_frames(
+        load_quadwell(random_state=random_state).trajectories, n_samples)
+
+
+DATASETS = {
+    'gaussians': make_gaussians,
+    'muller': make_muller,
+    'quadwell': make_quadwell,
+}
+
+
+#-----------------------------------------------------------------------------
+# Instrumentation
+#-----------------------------------------------------------------------------
+
+def _n_points(X, X_indices):
+    return len(X) if X_indices is None else len(X_indices)
+
+
+# number of distances computed by each call, given its arguments
+_DISTANCE_COUNTS = [
+    (libdistance, 'pdist', lambda X, metric, X_indices=None, **kwargs:
+        _n_points(X, X_indices) * (_n_points(X, X_indices) - 1) // 2),
+    (libdistance, 'dist', lambda X, y, metric, X_indices=None:
+        _n_points(X, X_indices)),
+    (libdistance, 'assign_nearest', lambda X, Y, metric, X_indices=None:
+        _n_points(X, X_indices) * len(Y)),
+    (libdistance, 'sumdist', lambda X, metric, pair_indices:
+        len(pair_indices)),
+    (agglomerative, 'pdist', lambda X, metric='euclidean':
+        len(X) * (len(X) - 1) // 2),
+    (agglomerative, 'cdist', lambda XA, XB, metric='euclidean':
+        len(XA) * len(XB)),
+]
+
+
+class DistanceCounter(object):
+    """Context manager which counts the distance evaluations made by the
+    clustering code, by wrapping the distance functions that it calls"""
+
+    def __init__(self):
+        self.count = 0
+        self._originals = []
+
+    def __enter__(self):
+        for module, name, count in _DISTANCE_COUNTS:
+            original = getattr(module, name)
+            self._originals.append((module, name, original))
+            setattr(module, name, self._wrap(original, count))
+        return self
+
+    def __exit__(self, *exc_info):
+        for module, name, original in self._originals:
+            setattr(module, name, original)
+        self._originals = []
+
+    def _wrap(self, func, count):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.count += count(*args, **kwargs)
+            return func(*args, **kwargs)
+        return wrapper
+
+
+#-----------------------------------------------------------------------------
+# Benchmark
+#-----------------------------------------------------------------------------
+
+def run(name, X, n_clusters, metric, random_state, args):
+    factory, _ = ESTIMATORS[name]
+    model = factory(X, n_clusters, metric, random_state, args)
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+    with DistanceCounter() as counter:
+        start = timer()
+        model.fit([X])
+        fit_time = timer() - start
+        fit_evaluations = counter.count
+
+        start = timer()
+        labels = model.predict([X])[0]
+        predict_time = timer() - start
+    peak_memory = None
+    if tracemalloc is not None:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    total_time = fit_time + predict_time
+    return {
+        'estimator': name,
+        'params': dict((k, v) for k, v in model.get_params().items()
+                       if isinstance(v, (int, float, str, bool,
+                                         type(None)))),
+        'metric': metric,
+        'n_samples': X.shape[0],
+        'n_features': X.shape[1],
+        'n_clusters': n_clusters,
+        'n_clusters_found': len(np.unique(labels[labels >= 0])),
+        'fit_time': fit_time,
+        'predict_time': predict_time,
+        'peak_memory': peak_memory,
+        'distance_evaluations': counter.count,
+        'fit_distance_evaluations': fit_evaluations,
+        'distance_evaluations_per_second':
+            counter.count / total_time if total_time > 0 else None,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--estimators', nargs='+', default=sorted(ESTIMATORS),
+                   choices=sorted(ESTIMATORS), help='Estimators to benchmark')
+    p.add_argument('--dataset', default='gaussians', choices=sorted(DATASETS),
+                   help='''Source of the data. The muller and quadwell
+                   datasets have a fixed number of features.''')
+    p.add_argument('--n-samples', nargs='+', type=int, default=[1000, 5000])
+    p.add_argument('--n-features', nargs='+', type=int, default=[2, 10])
+    p.add_argument('--n-clusters', nargs='+', type=int, default=[10, 100])
+    p.add_argument('--metrics', nargs='+', default=['euclidean'],
+                   help='Distance metrics (any vector metric in libdistance)')
+    p.add_argument('--repeat', type=int, default=1,
+                   help='Number of times to repeat each benchmark')
+    p.add_argument('--n-jobs', type=int, default=1,
+                   help='Number of threads, for the estimators that take it')
+    p.add_argument('--batch-size', type=int, default=100,
+                   help='Minibatch size for MiniBatchKMedoids')
+    p.add_argument('--n-landmarks', type=int, default=1000,
+                   help='Number of landmarks for LandmarkAgglomerative')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--output', default='-',
+                   help='File to append JSON records to (default: stdout)')
+    args = p.parse_args()
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'a')
+    environment = {
+        'msmbuilder_version': version.full_version,
+        'numpy_version': np.__version__,
+        'python_version': platform.python_version(),
+        'machine': platform.machine(),
+        'dataset': args.dataset,
+    }
+
+    configs = itertools.product(args.n_samples, args.n_features,
+                                args.n_clusters, range(args.repeat))
+    for n_samples, n_features, n_clusters, repeat in configs:
+        X = DATASETS[args.dataset](n_samples, n_features, n_clusters,
+                                   args.seed)
+        for name in args.estimators:
+            # estimators which don't use a metric are only run once
+            metrics = args.metrics if ESTIMATORS[name][1] else [None]
+            for metric in metrics:
+                record = run(name, X, n_clusters, metric, args.seed, args)
+                record.update(environment)
+                record['repeat'] = repeat
+                print(json.dumps(record, sort_keys=True), file=out)
+                out.flush()
+                print('%-22s %-12s n_samples=%-7d n_features=%-4d '
+                      'n_clusters=%-5d fit=%.3fs predict=%.3fs' % (
+                          name, metric, record['n_samples'],
+                          record['n_features'], n_clusters,
+                          record['fit_time'], record['predict_time']),
+                      file=sys.stderr)
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
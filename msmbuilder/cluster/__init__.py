@@ -13,10 +13,13 @@ from sklearn import cluster
 from sklearn import mixture
 
 import mdtraj as md
+from sklearn.utils import check_random_state
+from .. import libdistance
 from ..base import BaseEstimator
-from ..utils import check_iter_of_sequences
+from ..utils import check_iter_of_sequences, array2d
 
-from .base import MultiSequenceClusterMixin
+from .base import (MultiSequenceClusterMixin, load_assignment_model,
+                   _sequence_keys, _get_lazy, _take_frames)
 from .kcenters import KCenters
 from .ndgrid import NDGrid
 from .agglomerative import LandmarkAgglomerative
@@ -27,7 +30,8 @@ from .minibatchkmedoids import MiniBatchKMedoids
 __all__ = ['KMeans', 'MiniBatchKMeans', 'AffinityPropagation', 'MeanShift',
            'GMM', 'SpectralClustering', 'Ward', 'KCenters', 'NDGrid',
            'LandmarkAgglomerative', 'RegularSpatial', 'KMedoids',
-           'MiniBatchKMedoids', 'MultiSequenceClusterMixin']
+           'MiniBatchKMedoids', 'MultiSequenceClusterMixin',
+           'load_assignment_model']
 
 
 def _replace_labels(doc):
@@ -62,6 +66,92 @@ class KMeans(MultiSequenceClusterMixin, cluster.KMeans, BaseEstimator):
 class MiniBatchKMeans(MultiSequenceClusterMixin, cluster.MiniBatchKMeans, BaseEstimator):
     __doc__ = _replace_labels(cluster.MiniBatchKMeans.__doc__)
 
+    def partial_fit(self, X, y=None):
+        """Update the cluster centers with a single mini-batch.
+
+        Parameters
+        ----------
+        X : array-like shape=(n_samples, n_features)
+            A single timeseries, or a chunk of one.
+
+        Returns
+        -------
+        self
+        """
+        return cluster.MiniBatchKMeans.partial_fit(self, array2d(X))
+
+    def fit_lazy(self, sequences, lengths=None, out_ds=None):
+        """Fit the clustering, reading only the frames in each mini-batch
+
+        Unlike ``fit()``, the sequences are never concatenated in memory.
+        Each mini-batch of ``batch_size`` frames is drawn at random from all
+        of the sequences, read directly from ``sequences``, and used to
+        update the cluster centers with ``partial_fit``. The first mini-batch
+        has ``init_size`` frames, and is used to initialize the centers. In
+        total, ``max_iter * n_samples / batch_size`` mini-batches are used.
+        Sequences in a 'dir-npy' dataset are memory-mapped.
+
+        Parameters
+        ----------
+        sequences : dataset, or list of array-like
+            An msmbuilder dataset, or any other indexable collection of
+            sequences, each of shape [sequence_length, n_features]
+        lengths : list of int, optional
+            The length of each sequence. If not supplied, the lengths are
+            computed by opening each sequence.
+        out_ds : dataset, optional
+            If supplied, the assignments of each sequence are written to
+            ``out_ds``, under the same key as in ``sequences``, instead of
+            being stored in ``labels_``.
+
+        Returns
+        -------
+        self
+        """
+        keys = _sequence_keys(sequences)
+        if lengths is None:
+            lengths = [len(_get_lazy(sequences, k)) for k in keys]
+        if len(lengths) != len(keys):
+            raise ValueError('lengths must have one entry per sequence')
+        offsets = np.append([0], np.cumsum(lengths))
+        n_samples = offsets[-1]
+
+        def take(size):
+            # sorted, so that the frames of each sequence are read in order
+            indices = np.sort(random_state.randint(n_samples, size=size))
+            return _take_frames(sequences, keys, offsets, indices)
+
+        # partial_fit continues from any existing fit, so start over by
+        # removing everything except the parameters
+        params = self.get_params(deep=False)
+        for name in list(vars(self)):
+            if name not in params:
+                delattr(self, name)
+
+        random_state = check_random_state(self.random_state)
+        init_size = self.init_size
+        if init_size is None:
+            init_size = 3 * self.batch_size
+        n_batches = max(int(self.max_iter * n_samples // self.batch_size), 1)
+
+        self.partial_fit(take(max(init_size, self.n_clusters)))
+        for i in range(n_batches - 1):
+            self.partial_fit(take(self.batch_size))
+
+        labels = []
+        self.inertia_ = 0
+        centers = np.asarray(self.cluster_centers_, dtype=np.float64)
+        for k in keys:
+            X = np.asarray(_get_lazy(sequences, k), dtype=np.float64)
+            y, inertia = libdistance.assign_nearest(X, centers, 'sqeuclidean')
+            self.inertia_ += inertia
+            if out_ds is None:
+                labels.append(y)
+            else:
+                out_ds[k] = y
+        self.labels_ = labels if out_ds is None else None
+        return self
+
 
 class AffinityPropagation(MultiSequenceClusterMixin, cluster.AffinityPropagation, BaseEstimator):
     __doc__ = _replace_labels(cluster.AffinityPropagation.__doc__)
@@ -73,11 +163,16 @@ class MeanShift(MultiSequenceClusterMixin, cluster.MeanShift, BaseEstimator):
 
 class SpectralClustering(MultiSequenceClusterMixin, cluster.SpectralClustering, BaseEstimator):
     __doc__ = _replace_labels(cluster.SpectralClustering.__doc__)
+    # no predict()
+    _assignment_attributes = None
 
 
 class Ward(MultiSequenceClusterMixin, cluster.Ward, BaseEstimator):
     __doc__ = _replace_labels(cluster.Ward.__doc__)
+    # no predict()
+    _assignment_attributes = None
 
 
 class GMM(MultiSequenceClusterMixin, mixture.GMM, BaseEstimator):
     __doc__ = _replace_labels(mixture.GMM.__doc__)
+    _assignment_attributes = ('means_', 'covars_', 'weights_')
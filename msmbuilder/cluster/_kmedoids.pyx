@@ -6,8 +6,10 @@
 from __future__ import print_function, division, absolute_import
 import numpy as np
 from sklearn.utils import check_random_state
+from sklearn.externals.joblib import Parallel, delayed
 
 from numpy cimport npy_intp
+from cython cimport floating
 from libc.stdlib cimport malloc, free
 from libcpp.map cimport map
 from cpython.ref cimport PyObject
@@ -15,13 +17,16 @@ from cpython.ref cimport PyObject
 cdef extern from "src/kmedoids.h":
     void _kmedoids "kmedoids" (npy_intp nclusters, npy_intp nelements,
         double* distmatrix, npy_intp npass, npy_intp clusterid[],
-        PyObject* random, double* error, npy_intp* ifound)
+        PyObject* random, double* error, npy_intp* ifound) nogil
+    void _kmedoids "kmedoids" (npy_intp nclusters, npy_intp nelements,
+        float* distmatrix, npy_intp npass, npy_intp clusterid[],
+        PyObject* random, double* error, npy_intp* ifound) nogil
     map[npy_intp, npy_intp] _contigify_ids "contigify_ids" (
         npy_intp* ids, npy_intp length)
 
 
-def kmedoids(npy_intp n_clusters, double[::1] distmatrix, npy_intp n_pass,
-             npy_intp[::1] clusterid=None, random_state=None):
+def kmedoids(npy_intp n_clusters, floating[::1] distmatrix, npy_intp n_pass,
+             npy_intp[::1] clusterid=None, random_state=None, n_jobs=1):
     """KMedoids clustering
 
     Arguments
@@ -29,7 +34,7 @@ def kmedoids(npy_intp n_clusters, double[::1] distmatrix, npy_intp n_pass,
     n_clusters : int
         The number of clusters to be found.
 
-    distmatrix : double array
+    distmatrix : double or float array
         A condensed distance matrix of the pairwise distance between elements.
         This distance matrix should have the form of matrices produced by
         ``scipy.spatial.distance.pdist()``, or ``msmbuilder.libdistance.pdist``
@@ -55,6 +60,11 @@ def kmedoids(npy_intp n_clusters, double[::1] distmatrix, npy_intp n_pass,
         given, it fixes the seed. Defaults to the global numpy random
         number generator.
 
+    n_jobs : int, optional
+        Number of threads used to run the passes concurrently. Each pass
+        has its own random number generator, seeded from ``random_state``,
+        so the result does not depend on n_jobs.
+
     Returns
     --------
     clusterid : int[nelements]
@@ -74,7 +84,7 @@ def kmedoids(npy_intp n_clusters, double[::1] distmatrix, npy_intp n_pass,
         available, ifound is set to 0.
     """
     cdef double error
-    cdef npy_intp i, ifound
+    cdef npy_intp ifound
     cdef npy_intp[::1] clusterid_
     cdef npy_intp n_elements
     n_elements = int(1 + np.sqrt(8*len(distmatrix) + 1) / 2.0)
@@ -92,19 +102,57 @@ def kmedoids(npy_intp n_clusters, double[::1] distmatrix, npy_intp n_pass,
     if n_pass < 0:
         raise ValueError('n_pass must be greater than or equal to zero.')
 
-    # this is going to be the output, so we make a copy
-    if clusterid is None:
-        clusterid_ = np.zeros(n_elements, dtype=np.intp)
-    else:
-        clusterid_ = np.array(clusterid, dtype=np.intp, copy=True)
-
+    if n_pass == 0:
+        # this is going to be the output, so we make a copy
+        if clusterid is None:
+            clusterid_ = np.zeros(n_elements, dtype=np.intp)
+        else:
+            clusterid_ = np.array(clusterid, dtype=np.intp, copy=True)
+        error = _kmedoids_pass(n_clusters, distmatrix, clusterid_)
+        return np.array(clusterid_, copy=False), error, 1
+
+    # the passes are independent, so each one gets its own generator and
+    # they can be run concurrently (without the GIL) on the shared
+    # distance matrix
     random = check_random_state(random_state)
-
-    # Call the underlying library
-    _kmedoids(n_clusters, n_elements, &distmatrix[0], n_pass,
-              &clusterid_[0], <PyObject*> random, &error, &ifound)
-
-    return np.array(clusterid_, copy=False), error, ifound
+    seeds = random.randint(np.iinfo(np.int32).max, size=n_pass)
+    results = Parallel(n_jobs=n_jobs, backend='threading')(
+        delayed(_random_pass)(n_clusters, np.asarray(distmatrix), n_elements,
+                              seed)
+        for seed in seeds)
+
+    best, error = min(results, key=lambda r: r[1])
+    ifound = sum(np.array_equal(ids, best) for ids, _ in results)
+    return best, error, ifound
+
+
+def _random_pass(n_clusters, distmatrix, n_elements, seed):
+    clusterid = _random_assignment(n_clusters, n_elements,
+                                   np.random.RandomState(seed))
+    error = _kmedoids_pass(n_clusters, distmatrix, clusterid)
+    return clusterid, error
+
+
+def _random_assignment(n_clusters, n_elements, random):
+    """Randomly assign the elements to clusters, with at least one element
+    in each cluster"""
+    counts = 1 + random.multinomial(n_elements - n_clusters,
+                                    np.ones(n_clusters) / n_clusters)
+    clusterid = np.repeat(np.arange(n_clusters, dtype=np.intp), counts)
+    random.shuffle(clusterid)
+    return clusterid
+
+
+def _kmedoids_pass(npy_intp n_clusters, floating[::1] distmatrix,
+                   npy_intp[::1] clusterid):
+    """Run k-medoids from the initial assignment in clusterid, which is
+    overwritten by the solution"""
+    cdef double error
+    cdef npy_intp ifound
+    with nogil:
+        _kmedoids(n_clusters, clusterid.shape[0], &distmatrix[0], 0,
+                  &clusterid[0], NULL, &error, &ifound)
+    return error
 
 
 def contigify_ids(npy_intp[::1] clusterids):
@@ -30,12 +30,20 @@ except ImportError:
 
 __all__ = ['_LandmarkAgglomerative']
 
+# Pool the distances from each point (row) to the landmarks (columns) in each
+# cluster. The landmarks are sorted by cluster, and `starts` gives the column
+# where each cluster starts.
 POOLING_FUNCTIONS = {
-    'average': lambda x: np.mean(x, axis=1),
-    'complete': lambda x: np.max(x, axis=1),
-    'single': lambda x: np.min(x, axis=1),
+    'average': lambda x, starts: (np.add.reduceat(x, starts, axis=1) /
+                                  np.diff(np.append(starts, x.shape[1]))),
+    'complete': lambda x, starts: np.maximum.reduceat(x, starts, axis=1),
+    'single': lambda x, starts: np.minimum.reduceat(x, starts, axis=1),
 }
 
+# Maximum number of entries in each block of the (n_samples, n_landmarks)
+# distance matrix computed during predict (256 MB of doubles)
+PREDICT_BLOCK_SIZE = 2**25
+
 
 #-----------------------------------------------------------------------------
 # Utilities
@@ -64,6 +72,133 @@ def cdist(XA, XB, metric='euclidean'):
     return d
 
 
+def mst_single_linkage(X, metric='euclidean'):
+    """Single linkage hierarchical clustering from the minimum spanning tree
+    of the data, built with Prim's algorithm.
+
+    Only one row of the distance matrix is computed at a time, so the memory
+    requirement is O(n) instead of O(n^2).
+
+    Returns
+    -------
+    Z : ndarray, shape=(n_samples - 1, 4)
+        The hierarchical clustering encoded as a linkage matrix, in the format
+        of ``scipy.cluster.hierarchy.linkage``.
+    """
+    n = len(X)
+    in_tree = np.zeros(n, dtype=bool)
+    min_dist = np.empty(n)
+    min_dist.fill(np.inf)
+    parent = np.zeros(n, dtype=np.intp)
+
+    merges = np.zeros((max(n - 1, 0), 3))
+    current = 0
+    in_tree[current] = True
+    for k in range(n - 1):
+        d = cdist(X[current:current + 1], X, metric)[0]
+        closer = np.logical_and(d < min_dist, ~in_tree)
+        min_dist[closer] = d[closer]
+        parent[closer] = current
+
+        current = np.argmin(np.where(in_tree, np.inf, min_dist))
+        merges[k] = parent[current], current, min_dist[current]
+        in_tree[current] = True
+
+    return _linkage_matrix(n, merges)
+
+
+def nn_chain_ward_linkage(X):
+    """Ward linkage hierarchical clustering with the nearest-neighbor chain
+    algorithm [1], using the euclidean distance.
+
+    The Ward distance between two clusters is computed from their centroids
+    and sizes, so the memory requirement is O(n * n_features) instead of
+    O(n^2).
+
+    Returns
+    -------
+    Z : ndarray, shape=(n_samples - 1, 4)
+        The hierarchical clustering encoded as a linkage matrix, in the format
+        of ``scipy.cluster.hierarchy.linkage``.
+
+    References
+    ----------
+    .. [1] Mullner, D. "Modern hierarchical, agglomerative clustering
+        algorithms." arXiv:1109.2378 (2011).
+    """
+    n = len(X)
+    # each cluster is stored in the slot of one of its points
+    centroids = np.array(X, dtype=np.float64)
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+
+    merges = np.zeros((max(n - 1, 0), 3))
+    chain = []
+    for k in range(n - 1):
+        if len(chain) == 0:
+            chain.append(np.flatnonzero(active)[0])
+
+        while True:
+            a = chain[-1]
+            active[a] = False
+            sq = np.sum((centroids - centroids[a])**2, axis=1)
+            d = np.sqrt(2 * sizes[a] * sizes / (sizes[a] + sizes) * sq)
+            d[~active] = np.inf
+            active[a] = True
+
+            b = np.argmin(d)
+            # prefer the previous element of the chain on ties, so that
+            # the chain terminates
+            if len(chain) > 1 and d[chain[-2]] <= d[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+
+        chain = chain[:-2]
+        merges[k] = a, b, d[b]
+        centroids[a] = (sizes[a] * centroids[a] + sizes[b] * centroids[b]) / (sizes[a] + sizes[b])
+        sizes[a] += sizes[b]
+        active[b] = False
+
+    return _linkage_matrix(n, merges)
+
+
+def _linkage_matrix(n, merges):
+    """Build a scipy-style linkage matrix from a list of merges.
+
+    Parameters
+    ----------
+    n : int
+        Number of data points
+    merges : array, shape=(n-1, 3)
+        Each row ``(i, j, d)`` records that the clusters containing points
+        ``i`` and ``j`` were merged at distance ``d``. The rows do not need
+        to be sorted.
+    """
+    merges = merges[np.argsort(merges[:, 2], kind='mergesort')]
+
+    # union-find over the data points, tracking the id of each cluster
+    root = np.arange(n)
+    cluster_id = np.arange(n)
+    size = np.ones(n, dtype=int)
+
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    Z = np.zeros((len(merges), 4))
+    for k, (i, j, d) in enumerate(merges):
+        ri, rj = find(int(i)), find(int(j))
+        ci, cj = sorted((cluster_id[ri], cluster_id[rj]))
+        Z[k] = ci, cj, d, size[ri] + size[rj]
+        root[rj] = ri
+        size[ri] += size[rj]
+        cluster_id[ri] = n + k
+    return Z
+
+
 #-----------------------------------------------------------------------------
 # Main Code
 #-----------------------------------------------------------------------------
@@ -90,7 +225,7 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
         the only the landmarks, and then assign the remaining dataset based
         on distances to the landmarks. Note that n_landmarks=None is equivalent
         to using every point in the dataset as a landmark.
-    linkage : {'single', 'complete', 'average'}, default='average'
+    linkage : {'single', 'complete', 'average', 'ward'}, default='average'
         Which linkage criterion to use. The linkage criterion determines which
         distance to use between sets of observation. The algorithm will merge
         the pairs of cluster that minimize this criterion.
@@ -100,6 +235,8 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
               all observations of the two sets.
             - single uses the minimum distance between all observations of the
               two sets.
+            - ward minimizes the increase in the within-cluster variance when
+              merging the two sets. Requires metric='euclidean'.
         The linkage also effects the predict() method and the use of landmarks.
         After computing the distance from each new data point to the landmarks,
         the new data point will be assigned to the cluster that minimizes the
@@ -107,7 +244,8 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
         (i.e with ``single``, new data points will be assigned the label of
         the closest landmark, with ``average``, it will be assigned the label
         of the landmark s.t. the mean distance from the test point to all the
-        landmarks with that label is minimized, etc.)
+        landmarks with that label is minimized, etc. With ``ward``, it will
+        be assigned to the cluster whose variance increases the least.)
     memory : Instance of joblib.Memory or string (optional)
         Used to cache the output of the computation of the distance matrix.
     metric : string or callable, default= "euclidean"
@@ -120,6 +258,13 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
         The generator used to select random landmarks. Only used if
         landmark_strategy=='random'. If an integer is given, it fixes the seed.
         Defaults to the global numpy random number generator.
+    low_memory : bool, default=False
+        Cluster the landmarks without computing the matrix of pairwise
+        distances between them, reducing the memory requirement from
+        O(n_landmarks^2) to O(n_landmarks). Single linkage is computed from
+        a minimum spanning tree, one row of distances at a time, and ward
+        linkage with the nearest-neighbor chain algorithm on the cluster
+        centroids. Not supported for 'average' or 'complete' linkage.
 
     References
     ----------
@@ -134,7 +279,8 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
 
     def __init__(self, n_clusters, n_landmarks=None, linkage='average',
                  memory=Memory(cachedir=None, verbose=0), metric='euclidean',
-                 landmark_strategy='stride', random_state=None):
+                 landmark_strategy='stride', random_state=None,
+                 low_memory=False):
         self.n_clusters = n_clusters
         self.n_landmarks = n_landmarks
         self.memory = memory
@@ -142,6 +288,7 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
         self.landmark_strategy = landmark_strategy
         self.random_state = random_state
         self.linkage = linkage
+        self.low_memory = low_memory
 
         self.landmark_labels_ = None
         self.landmarks_ = None
@@ -159,25 +306,34 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
         self
         """
 
+        if self.linkage == 'ward' and self.metric != 'euclidean':
+            raise ValueError("linkage='ward' requires metric='euclidean'")
+        if self.low_memory and self.linkage not in ('single', 'ward'):
+            raise ValueError("low_memory=True requires linkage='single' or "
+                             "linkage='ward'. got %s" % self.linkage)
+
         memory = self.memory
         if isinstance(memory, six.string_types):
             memory = Memory(cachedir=memory, verbose=0)
         if self.n_landmarks is None:
-            distances = memory.cache(pdist)(X, self.metric)
+            landmarks = X
         else:
             if self.landmark_strategy == 'random':
                 land_indices = check_random_state(self.random_state).randint(len(X), size=self.n_landmarks)
             else:
                 land_indices = np.arange(len(X))[::(len(X) // self.n_landmarks)][:self.n_landmarks]
-            distances = memory.cache(pdist)(X[land_indices], self.metric)
-
-        tree = memory.cache(linkage)(distances, method=self.linkage)
-        self.landmark_labels_ = fcluster(tree, criterion='maxclust', t=self.n_clusters) - 1
+            landmarks = X[land_indices]
 
-        if self.n_landmarks is None:
-            self.landmarks_ = X
+        if self.low_memory and self.linkage == 'single':
+            tree = memory.cache(mst_single_linkage)(landmarks, self.metric)
+        elif self.low_memory:
+            tree = memory.cache(nn_chain_ward_linkage)(landmarks)
         else:
-            self.landmarks_ = X[land_indices]
+            distances = memory.cache(pdist)(landmarks, self.metric)
+            tree = memory.cache(linkage)(distances, method=self.linkage)
+
+        self.landmark_labels_ = fcluster(tree, criterion='maxclust', t=self.n_clusters) - 1
+        self.landmarks_ = landmarks
 
         return self
 
@@ -195,24 +351,53 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
             Index of the cluster each sample belongs to.
         """
 
-        dists = cdist(X, self.landmarks_, self.metric)
+        if self.linkage == 'ward':
+            return self._predict_ward(X)
 
         try:
             pooling_func = POOLING_FUNCTIONS[self.linkage]
         except KeyError:
             raise ValueError('linkage=%s is not supported' % self.linkage)
 
-        pooled_distances = np.empty(len(X))
-        pooled_distances.fill(np.infty)
+        # sort the landmarks by cluster, so that the distances to all of the
+        # landmarks in a cluster are a contiguous block of columns
+        order = np.argsort(self.landmark_labels_, kind='mergesort')
+        landmark_labels = self.landmark_labels_[order]
+        landmarks = self.landmarks_[order]
+        clusters, starts = np.unique(landmark_labels, return_index=True)
+
+        # process X in blocks of rows, to bound the size of the distance matrix
+        block_rows = max(1, PREDICT_BLOCK_SIZE // len(landmarks))
         labels = np.zeros(len(X), dtype=int)
 
-        for i in range(self.n_clusters):
-            if np.any(self.landmark_labels_ == i):
-                d = pooling_func(dists[:, self.landmark_labels_ == i])
-                mask = (d < pooled_distances)
-                pooled_distances[mask] = d[mask]
-                labels[mask] = i
+        for start in range(0, len(X), block_rows):
+            end = min(start + block_rows, len(X))
+            dists = cdist(X[start:end], landmarks, self.metric)
+            if self.linkage == 'single':
+                # the closest cluster is the one with the closest landmark
+                labels[start:end] = landmark_labels[np.argmin(dists, axis=1)]
+            else:
+                pooled_distances = pooling_func(dists, starts)
+                labels[start:end] = clusters[np.argmin(pooled_distances, axis=1)]
+
+        return labels
 
+    def _predict_ward(self, X):
+        # adding a point x to a cluster with centroid c and n points increases
+        # the within-cluster sum of squares by n / (n + 1) * |x - c|^2
+        clusters, inverse, sizes = np.unique(
+            self.landmark_labels_, return_inverse=True, return_counts=True)
+        centroids = np.zeros((len(clusters), self.landmarks_.shape[1]))
+        np.add.at(centroids, inverse, self.landmarks_)
+        centroids /= sizes[:, np.newaxis]
+        weights = sizes / (sizes + 1.0)
+
+        block_rows = max(1, PREDICT_BLOCK_SIZE // len(clusters))
+        labels = np.zeros(len(X), dtype=int)
+        for start in range(0, len(X), block_rows):
+            end = min(start + block_rows, len(X))
+            cost = weights * cdist(X[start:end], centroids, 'sqeuclidean')
+            labels[start:end] = clusters[np.argmin(cost, axis=1)]
         return labels
 
     def fit_predict(self, X):
@@ -227,3 +412,4 @@ class _LandmarkAgglomerative(ClusterMixin, TransformerMixin):
 
 class LandmarkAgglomerative(MultiSequenceClusterMixin, _LandmarkAgglomerative, BaseEstimator):
     __doc__ = _LandmarkAgglomerative.__doc__
+    _assignment_attributes = ('landmarks_', 'landmark_labels_')
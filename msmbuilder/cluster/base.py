@@ -8,9 +8,13 @@
 #-----------------------------------------------------------------------------
 
 from __future__ import absolute_import, print_function, division
+import os
+import pickle
 import numpy as np
+from sklearn.externals.joblib import Parallel, delayed
 
 import mdtraj as md
+from .. import libdistance
 from ..utils import check_iter_of_sequences
 
 
@@ -30,6 +34,14 @@ class MultiSequenceClusterMixin(object):
 
     _allow_trajectory = False
 
+    # The fitted attributes used by predict(). These are the only
+    # attributes stored by save_assignment_model(). None means that the
+    # estimator can't assign new data, and so can't be saved that way.
+    _assignment_attributes = ('cluster_centers_',)
+    # Attributes which predict() only uses in some configurations, and which
+    # are stored by save_assignment_model() if they exist
+    _optional_assignment_attributes = ()
+
     def fit(self, sequences, y=None):
         """Fit the  clustering on the data
 
@@ -49,23 +61,45 @@ class MultiSequenceClusterMixin(object):
 
         if hasattr(self, 'labels_'):
             self.labels_ = self._split(self.labels_)
+        if isinstance(getattr(self, 'cluster_centers_', None),
+                      libdistance.RMSDCoordinates):
+            self.cluster_centers_ = self.cluster_centers_.to_trajectory()
 
         return self
 
     def _concat(self, sequences):
-        self.__lengths = [len(s) for s in sequences]
-        if len(sequences) > 0 and isinstance(sequences[0], np.ndarray):
-            concat = np.ascontiguousarray(np.concatenate(sequences))
-        elif isinstance(sequences[0], md.Trajectory):
-            # if the input sequences are not numpy arrays, we need to guess
-            # how to concatenate them. this operation below works for mdtraj
-            # trajectories (which is the use case that I want to be sure to
-            # support), but in general the python container protocol doesn't
-            # give us a generic way to make sure we merged sequences
-            concat = sequences[0]
-            if len(sequences) > 1:
-                concat = concat.join(sequences[1:])
-            concat.center_coordinates()
+        keys = _sequence_keys(sequences)
+        first = _get_lazy(sequences, keys[0]) if len(keys) > 0 else None
+
+        if isinstance(first, np.ndarray):
+            if len(keys) == 1:
+                # nothing to concatenate, so avoid the copy if we can
+                concat = np.ascontiguousarray(sequences[keys[0]])
+                self.__lengths = [len(concat)]
+                return concat
+
+            # the output array is allocated up front and filled one sequence
+            # at a time, so that (e.g. for a memory-mapped dataset) the input
+            # is never held in memory a second time alongside the output
+            lengths, dtypes = [], []
+            for k in keys:
+                X = _get_lazy(sequences, k)
+                lengths.append(len(X))
+                dtypes.append(X.dtype)
+            self.__lengths = lengths
+
+            offsets = np.append([0], np.cumsum(lengths))
+            concat = np.empty((offsets[-1],) + first.shape[1:],
+                              dtype=np.result_type(*dtypes))
+            for k, start, end in zip(keys, offsets[:-1], offsets[1:]):
+                concat[start:end] = _get_lazy(sequences, k)
+        elif isinstance(first, md.Trajectory):
+            trajectories = [sequences[k] for k in keys]
+            self.__lengths = [len(t) for t in trajectories]
+            # trajectories are only used with metric='rmsd', so instead of
+            # joining them, copy the coordinates once into an array that is
+            # centered (with the traces computed) up front
+            concat = libdistance.RMSDCoordinates.from_trajectories(trajectories)
         else:
             raise TypeError('sequences must be a list of numpy arrays '
                             'or ``md.Trajectory``s')
@@ -80,14 +114,13 @@ class MultiSequenceClusterMixin(object):
         """Take indices in 'concatenated space' and return as pairs
         of (traj_i, frame_i)
         """
-        clengths = np.append([0], np.cumsum(self.__lengths))
-        mapping = np.zeros((clengths[-1], 2), dtype=int)
-        for traj_i, (start, end) in enumerate(zip(clengths[:-1], clengths[1:])):
-            mapping[start:end, 0] = traj_i
-            mapping[start:end, 1] = np.arange(end - start)
-        return mapping[concat_inds]
-
-    def predict(self, sequences, y=None):
+        offsets = np.append([0], np.cumsum(self.__lengths))
+        concat_inds = np.asarray(concat_inds)
+        # with side='right', empty sequences (repeated offsets) are skipped
+        traj_i = np.searchsorted(offsets, concat_inds, side='right') - 1
+        return np.column_stack((traj_i, concat_inds - offsets[traj_i]))
+
+    def predict(self, sequences, y=None, n_jobs=1):
         """Predict the closest cluster each sample in each sequence in
         sequences belongs to.
 
@@ -101,17 +134,21 @@ class MultiSequenceClusterMixin(object):
             A list of multivariate timeseries. Each sequence may have
             a different length, but they all must have the same number
             of features.
+        n_jobs : int, optional
+            Number of threads used to predict the sequences in parallel.
+            The libdistance kernels release the GIL, so the threads run
+            concurrently.
 
         Returns
         -------
         Y : list of arrays, each of shape [sequence_length,]
             Index of the closest center each sample belongs to.
         """
-        predictions = []
         check_iter_of_sequences(sequences, allow_trajectory=self._allow_trajectory)
-        for X in sequences:
-            predictions.append(self.partial_predict(X))
-        return predictions
+        if n_jobs == 1:
+            return [self.partial_predict(X) for X in sequences]
+        return Parallel(n_jobs=n_jobs, backend='threading')(
+            delayed(_partial_predict)(self, X) for X in sequences)
 
     def partial_predict(self, X, y=None):
         """Predict the closest cluster each sample in X belongs to.
@@ -160,9 +197,9 @@ class MultiSequenceClusterMixin(object):
             labels = self._split(labels)
         return labels
 
-    def transform(self, sequences):
+    def transform(self, sequences, n_jobs=1):
         """Alias for predict"""
-        return self.predict(sequences)
+        return self.predict(sequences, n_jobs=n_jobs)
 
     def partial_transform(self, X):
         """Alias for partial_predict"""
@@ -171,3 +208,144 @@ class MultiSequenceClusterMixin(object):
     def fit_transform(self, sequences, y=None):
         """Alias for fit_predict"""
         return self.fit_predict(sequences, y)
+
+    def save_assignment_model(self, path):
+        """Save only what is needed to assign new data to the clusters
+
+        Unlike pickling the whole estimator, the labels of the training
+        data are not saved. The arrays (e.g. ``cluster_centers_``) are
+        stored as separate ``.npy`` files, so that they can be memory-mapped
+        by ``load_assignment_model``.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to save the model. It must not exist.
+
+        See Also
+        --------
+        load_assignment_model
+        """
+        if self._assignment_attributes is None:
+            raise NotImplementedError(
+                "%s can't assign new data, so it has no assignment model" %
+                type(self).__name__)
+        missing = [name for name in self._assignment_attributes
+                   if not hasattr(self, name)]
+        if len(missing) > 0:
+            raise ValueError('%s is missing the fitted attribute(s) %s. The '
+                             'model must be fit before it is saved.' %
+                             (type(self).__name__, ', '.join(missing)))
+        names = list(self._assignment_attributes) + [
+            name for name in self._optional_assignment_attributes
+            if hasattr(self, name)]
+
+        os.makedirs(path)
+        meta = {'class': type(self), 'params': self.get_params(),
+                'attributes': {}, 'arrays': [], 'trajectories': {}}
+
+        for name in names:
+            value = getattr(self, name)
+            if isinstance(value, md.Trajectory):
+                # the (pre-centered) coordinates go in an array, and the
+                # rest of the trajectory, which is small, in the metadata
+                np.save(os.path.join(path, name + '.npy'), value.xyz)
+                meta['trajectories'][name] = (value.topology, value._rmsd_traces)
+            elif isinstance(value, np.ndarray) and value.dtype != object:
+                np.save(os.path.join(path, name + '.npy'), value)
+                meta['arrays'].append(name)
+            else:
+                meta['attributes'][name] = value
+
+        with open(os.path.join(path, 'model.pkl'), 'wb') as f:
+            pickle.dump(meta, f)
+
+
+def load_assignment_model(path, mmap=True):
+    """Load a clustering model saved with ``save_assignment_model``
+
+    Parameters
+    ----------
+    path : str
+        Directory in which the model was saved
+    mmap : bool, default=True
+        Memory-map the arrays (copy-on-write), instead of reading them
+        into memory.
+
+    Returns
+    -------
+    model : MultiSequenceClusterMixin
+        A model with the same parameters as the saved one, and the fitted
+        attributes needed by ``predict`` and ``partial_predict``.
+    """
+    with open(os.path.join(path, 'model.pkl'), 'rb') as f:
+        meta = pickle.load(f)
+    mmap_mode = 'c' if mmap else None
+
+    model = meta['class'](**meta['params'])
+    for name, value in meta['attributes'].items():
+        setattr(model, name, value)
+    for name in meta['arrays']:
+        setattr(model, name, np.load(os.path.join(path, name + '.npy'),
+                                     mmap_mode=mmap_mode))
+    for name, (topology, traces) in meta['trajectories'].items():
+        xyz = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+        traj = md.Trajectory(xyz, topology)
+        traj._rmsd_traces = traces
+        setattr(model, name, traj)
+    return model
+
+
+def _partial_predict(model, X):
+    return model.partial_predict(X)
+
+
+def _sequence_keys(sequences):
+    if hasattr(sequences, 'keys'):
+        return list(sequences.keys())
+    return list(range(len(sequences)))
+
+
+def _get_lazy(sequences, key):
+    """Get one sequence, memory-mapped if the container supports it
+
+    A read-only memory map (which is what a dir-npy dataset gives) is
+    reopened copy-on-write, because libdistance only accepts writeable
+    buffers.
+    """
+    get = getattr(sequences, 'get', None)
+    if get is not None:
+        try:
+            X = get(key, mmap=True)
+        except TypeError:
+            pass
+        else:
+            if isinstance(X, np.memmap) and not X.flags.writeable:
+                order = 'F' if X.flags.fnc else 'C'
+                X = np.memmap(X.filename, dtype=X.dtype, mode='c',
+                              offset=X.offset, shape=X.shape, order=order)
+            return X
+    return sequences[key]
+
+
+def _take_frames(sequences, keys, offsets, indices):
+    """Read the frames with the given indices (in "concatenated space")
+    from a collection of sequences, opening each sequence at most once.
+    """
+    traj_i = np.searchsorted(offsets, indices, side='right') - 1
+    frame_i = indices - offsets[traj_i]
+
+    positions, parts = [], []
+    for t in np.unique(traj_i):
+        which = np.flatnonzero(traj_i == t)
+        X = _get_lazy(sequences, keys[t])
+        positions.append(which)
+        parts.append(X[frame_i[which]])
+
+    if isinstance(parts[0], md.Trajectory):
+        frames = libdistance.RMSDCoordinates.from_trajectories(parts)
+    else:
+        frames = np.ascontiguousarray(np.concatenate(parts))
+
+    # put the frames back into the order of `indices`
+    return frames[np.argsort(np.concatenate(positions), kind='mergesort')]
@@ -11,7 +11,9 @@ from __future__ import absolute_import, print_function, division
 
 from operator import itemgetter
 import numpy as np
+from sklearn.utils import check_random_state
 from sklearn.base import ClusterMixin, TransformerMixin
+from sklearn.externals.joblib import Parallel, delayed
 
 from . import MultiSequenceClusterMixin
 from . import _kmedoids
@@ -28,7 +30,10 @@ class _KMedoids(ClusterMixin, TransformerMixin):
 
     This algorithm requires computing the full distance matrix between all pairs
     of data points, requiring O(N^2) memory. The implementation of this
-    method is based on the C clustering library [1].
+    method is based on the C clustering library [1]. Storing the distances
+    in single precision (``distance_dtype='float32'``) halves that memory.
+    For large datasets, the ``sample_size`` option bounds the memory usage
+    by clustering random subsets of the data instead (CLARA [2]).
 
     Parameters
     ----------
@@ -47,11 +52,35 @@ class _KMedoids(ClusterMixin, TransformerMixin):
         The generator used to initialize the centers. If an integer is
         given, it fixes the seed. Defaults to the global numpy random
         number generator.
+    sample_size : int, optional
+        Memory-saving approximation. Instead of computing the distance
+        matrix between all pairs of data points, cluster ``n_subsamples``
+        random subsets of ``sample_size`` data points each, and keep the
+        set of medoids which gives the lowest inertia over the full dataset.
+        Each subset requires ``8 * sample_size * (sample_size - 1) / 2``
+        bytes for its distance matrix (half that with float32 distances),
+        regardless of the size of the dataset. sample_size=None (default)
+        clusters the full dataset.
+    n_subsamples : int, default=5
+        Number of random subsets to cluster. Only used if ``sample_size``
+        is not None.
+    n_jobs : int, default=1
+        Number of threads. The distance matrix is computed in parallel and
+        the ``n_passes`` random restarts are run concurrently, or if
+        ``sample_size`` is not None, the subsets are clustered and
+        evaluated in parallel.
+    distance_dtype : {'float64', 'float32'}
+        Precision in which the distance matrix is stored. 'float32' needs
+        half the memory, so about 1.4 times as many data points can be
+        clustered in the same memory, at the cost of rounding the distances
+        to single precision.
 
     References
     ----------
     .. [1] de Hoon, Michiel JL, et al. "Open source clustering software."
        Bioinformatics 20.9 (2004): 1453-1454.
+    .. [2] Kaufman, L., and P. J. Rousseeuw. "Clustering large applications
+       (Program CLARA)." Finding Groups in Data (1990): 126-163.
 
     See Also
     --------
@@ -71,11 +100,16 @@ class _KMedoids(ClusterMixin, TransformerMixin):
     """
 
     def __init__(self, n_clusters=8, n_passes=1, metric='euclidean',
-                 random_state=None):
+                 random_state=None, sample_size=None, n_subsamples=5,
+                 n_jobs=1, distance_dtype='float64'):
         self.n_clusters = n_clusters
         self.n_passes = n_passes
         self.metric = metric
         self.random_state = random_state
+        self.sample_size = sample_size
+        self.n_subsamples = n_subsamples
+        self.n_jobs = n_jobs
+        self.distance_dtype = distance_dtype
 
     def fit(self, X, y=None):
         if self.n_passes < 1:
@@ -85,10 +119,14 @@ class _KMedoids(ClusterMixin, TransformerMixin):
             raise ValueError('n_passes must be greater than 0. got %s' %
                              self.n_clusters)
 
-        dmat = libdistance.pdist(X, metric=self.metric)
+        if self.sample_size is not None:
+            return self._fit_subsamples(X)
+
+        dmat = libdistance.pdist(X, metric=self.metric, n_jobs=self.n_jobs,
+                                 dtype=self.distance_dtype)
         ids, self.inertia_, _ = _kmedoids.kmedoids(
             self.n_clusters, dmat, self.n_passes,
-            random_state=self.random_state)
+            random_state=self.random_state, n_jobs=self.n_jobs)
 
         self.labels_, mapping = _kmedoids.contigify_ids(ids)
         smapping = sorted(mapping.items(), key=itemgetter(1))
@@ -97,6 +135,33 @@ class _KMedoids(ClusterMixin, TransformerMixin):
 
         return self
 
+    def _fit_subsamples(self, X):
+        if self.sample_size < self.n_clusters:
+            raise ValueError('sample_size must be greater than or equal to '
+                             'n_clusters. got %s' % self.sample_size)
+        if self.n_subsamples < 1:
+            raise ValueError('n_subsamples must be greater than 0. got %s' %
+                             self.n_subsamples)
+
+        random_state = check_random_state(self.random_state)
+        seeds = random_state.randint(np.iinfo(np.int32).max,
+                                     size=self.n_subsamples)
+
+        # the subsets are independent, and libdistance releases the GIL, so
+        # threads avoid copying X into separate processes.
+        results = Parallel(n_jobs=self.n_jobs, backend='threading')(
+            delayed(_kmedoids_subsample)(
+                X, self.n_clusters, self.n_passes, self.metric,
+                self.sample_size, self.distance_dtype, seed)
+            for seed in seeds)
+
+        self.cluster_ids_, _ = min(results, key=itemgetter(1))
+        self.cluster_centers_ = X[self.cluster_ids_]
+        self.labels_, self.inertia_ = libdistance.assign_nearest(
+            X, self.cluster_centers_, metric=self.metric)
+
+        return self
+
     def predict(self, X):
         """Predict the closest cluster each sample in X belongs to.
 
@@ -122,6 +187,29 @@ class _KMedoids(ClusterMixin, TransformerMixin):
         return self.fit(X, y).labels_
 
 
+def _kmedoids_subsample(X, n_clusters, n_passes, metric, sample_size,
+                        distance_dtype, random_state):
+    """Cluster a random subset of X, and return the medoids (as indices
+    into X) along with their inertia over all of X.
+    """
+    random_state = check_random_state(random_state)
+    n_samples = len(X)
+    sample_size = min(sample_size, n_samples)
+    indices = np.sort(random_state.choice(
+        n_samples, size=sample_size, replace=False)).astype(np.intp)
+
+    dmat = libdistance.pdist(X, metric=metric, X_indices=indices,
+                             dtype=distance_dtype)
+    ids, _, _ = _kmedoids.kmedoids(n_clusters, dmat, n_passes,
+                                   random_state=random_state)
+    _, mapping = _kmedoids.contigify_ids(ids)
+    smapping = sorted(mapping.items(), key=itemgetter(1))
+    cluster_ids = indices[np.array(smapping)[:, 0]]
+
+    _, inertia = libdistance.assign_nearest(X, X[cluster_ids], metric=metric)
+    return cluster_ids, inertia
+
+
 class KMedoids(MultiSequenceClusterMixin, _KMedoids, BaseEstimator):
     _allow_trajectory = True
     __doc__ = _KMedoids.__doc__[: _KMedoids.__doc__.find('Attributes')] + \
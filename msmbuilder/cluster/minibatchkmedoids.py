@@ -11,11 +11,13 @@ from __future__ import absolute_import, print_function, division
 
 from operator import itemgetter
 import numpy as np
+import mdtraj as md
 from sklearn.utils import check_random_state
 from sklearn.base import ClusterMixin, TransformerMixin
 
 from . import MultiSequenceClusterMixin
 from . import _kmedoids
+from .base import _sequence_keys, _get_lazy, _take_frames
 from .. import libdistance
 from ..base import BaseEstimator
 
@@ -88,7 +90,14 @@ class _MiniBatchKMedoids(ClusterMixin, TransformerMixin):
         self.random_state = random_state
 
     def fit(self, X, y=None):
-        n_samples = len(X)
+        self._fit_minibatches(len(X), lambda indices: X[indices])
+        self.labels_, self.inertia_ = libdistance.assign_nearest(
+            X, self.cluster_centers_, metric=self.metric)
+        return self
+
+    def _fit_minibatches(self, n_samples, take):
+        # `take(indices)` returns the data points with the given indices, so
+        # that only the rows in each minibatch need to be in memory at once.
         n_batches = int(np.ceil(float(n_samples) / self.batch_size))
         n_iter = int(self.max_iter * n_batches)
         random_state = check_random_state(self.random_state)
@@ -107,7 +116,7 @@ class _MiniBatchKMedoids(ClusterMixin, TransformerMixin):
                 random_state.random_integers(
                     0, n_samples - 1, self.batch_size),
             ])
-            dmat = libdistance.pdist(X, metric=self.metric, X_indices=minibatch_indices)
+            dmat = libdistance.pdist(take(minibatch_indices), metric=self.metric)
             minibatch_labels = np.concatenate([
                 np.arange(self.n_clusters),
                 labels_[minibatch_indices[self.n_clusters:]]
@@ -134,9 +143,7 @@ class _MiniBatchKMedoids(ClusterMixin, TransformerMixin):
                 break
 
         self.cluster_ids_ = cluster_ids_
-        self.cluster_centers_ = X[cluster_ids_]
-        self.labels_, self.inertia_ = libdistance.assign_nearest(
-            X, self.cluster_centers_, metric=self.metric)
+        self.cluster_centers_ = take(cluster_ids_)
         return self
 
     def predict(self, X):
@@ -197,3 +204,55 @@ class MiniBatchKMedoids(MultiSequenceClusterMixin, _MiniBatchKMedoids, BaseEstim
         MultiSequenceClusterMixin.fit(self, sequences)
         self.cluster_ids_ = self._split_indices(self.cluster_ids_)
         return self
+
+    def fit_lazy(self, sequences, lengths=None):
+        """Fit the clustering, reading only the frames in each minibatch
+
+        Unlike ``fit()``, the sequences are never concatenated in memory.
+        Each minibatch is read directly from ``sequences``, so that the
+        memory requirement scales with ``batch_size`` instead of the size
+        of the dataset. Sequences in a 'dir-npy' dataset are memory-mapped.
+
+        Parameters
+        ----------
+        sequences : dataset, or list of array-like or ``md.Trajectory``
+            An msmbuilder dataset, or any other indexable collection of
+            sequences, each of shape [sequence_length, n_features]
+        lengths : list of int, optional
+            The length of each sequence. If not supplied, the lengths are
+            computed by opening each sequence.
+
+        Returns
+        -------
+        self
+        """
+        keys = _sequence_keys(sequences)
+        if lengths is None:
+            lengths = [len(_get_lazy(sequences, k)) for k in keys]
+        if len(lengths) != len(keys):
+            raise ValueError('lengths must have one entry per sequence')
+        offsets = np.append([0], np.cumsum(lengths))
+
+        self._fit_minibatches(
+            offsets[-1],
+            lambda indices: _take_frames(sequences, keys, offsets, indices))
+
+        if isinstance(self.cluster_centers_, libdistance.RMSDCoordinates):
+            self.cluster_centers_ = self.cluster_centers_.to_trajectory()
+
+        self.labels_ = []
+        self.inertia_ = 0
+        for k in keys:
+            X = _get_lazy(sequences, k)
+            if isinstance(X, md.Trajectory):
+                X.center_coordinates()
+            labels, inertia = libdistance.assign_nearest(
+                X, self.cluster_centers_, metric=self.metric)
+            self.labels_.append(labels)
+            self.inertia_ += inertia
+
+        traj_i = np.searchsorted(offsets, self.cluster_ids_, side='right') - 1
+        self.cluster_ids_ = np.column_stack(
+            (traj_i, self.cluster_ids_ - offsets[traj_i]))
+        return self
+
@@ -34,30 +34,45 @@ class _NDGrid(ClusterMixin, TransformerMixin):
 
     Parameters
     ----------
-    n_bins_per_feature : int
+    n_bins_per_feature : {int, array-like}
         Number of bins along each feature (degree of freedom) the total
-        number of bins will be :math:`n_bins^{n_features}`.
+        number of bins will be :math:`n_bins^{n_features}`. If array-like,
+        the number of bins for each feature.
     min : {float, array-like, None}, optional
         Lower bin edge. If None (default), the min and max for each feature
         will be fit during training.
     max : {float, array-like, None}, optional
         Upper bin edge. If None (default), the min and max for each feature
         will be fit during training.
+    sparse : bool, default=False
+        Only label the grid cells which are occupied by the training data.
+        The occupied cells are stored in a hash table during `fit`, and
+        numbered contiguously (in the same order as the labels they would
+        receive from the full grid). This makes high-dimensional grids
+        feasible, where the total number of bins is too large to enumerate.
+        Samples which fall in a cell that was empty during training are
+        labeled -1 by `predict`.
 
     Attributes
     ----------
     n_features : int
         Number of features
     n_bins : int
-        The total number of bins
+        The total number of bins. With ``sparse=True``, the number of
+        occupied bins.
     grid : np.ndarray, shape=[n_features, n_bins_per_feature+1]
-        Bin edges
+        Bin edges. If the number of bins differs between features, a list
+        with the bin edges for each feature.
+    cells_ : np.ndarray, shape=[n_bins, n_features]
+        With ``sparse=True``, the index along each feature of each occupied
+        bin.
     """
 
-    def __init__(self, n_bins_per_feature=2, min=None, max=None):
+    def __init__(self, n_bins_per_feature=2, min=None, max=None, sparse=False):
         self.n_bins_per_feature = n_bins_per_feature
         self.min = min
         self.max = max
+        self.sparse = sparse
         # unknown until we have the number of features
         self.n_features = None
         self.n_bins = None
@@ -77,7 +92,15 @@ class _NDGrid(ClusterMixin, TransformerMixin):
         """
         X = array2d(X)
         self.n_features = X.shape[1]
-        self.n_bins = self.n_bins_per_feature ** self.n_features
+
+        if isinstance(self.n_bins_per_feature, numbers.Integral):
+            n_bins = self.n_bins_per_feature * np.ones(self.n_features, dtype=int)
+        else:
+            n_bins = np.asarray(self.n_bins_per_feature, dtype=int)
+            if not n_bins.shape == (self.n_features,):
+                raise ValueError('n_bins_per_feature shape error')
+        if np.any(n_bins < 1):
+            raise ValueError('n_bins_per_feature must be positive')
 
         if self.min is None:
             min = np.min(X, axis=0)
@@ -97,12 +120,49 @@ class _NDGrid(ClusterMixin, TransformerMixin):
             if not max.shape == (self.n_features,):
                 raise ValueError('max shape error')
 
-        self.grid = np.array(
-            [np.linspace(min[i] - EPS, max[i] + EPS, self.n_bins_per_feature + 1)
-             for i in range(self.n_features)])
+        grid = [np.linspace(min[i] - EPS, max[i] + EPS, n_bins[i] + 1)
+                for i in range(self.n_features)]
+        if np.all(n_bins == n_bins[0]):
+            self.grid = np.array(grid)
+        else:
+            self.grid = grid
+
+        self._n_bins = n_bins
+        self._lower = np.array([g[0] for g in grid])
+        self._upper = np.array([g[-1] for g in grid])
+        self._width = (self._upper - self._lower) / n_bins
+        # labels on the full grid, with the first feature varying fastest
+        self._strides = np.concatenate(([1], np.cumprod(n_bins[:-1])))
+
+        if self.sparse:
+            cells, _ = _unique_rows(self._bin_indices(X))
+            # sort in the same order as the labels on the full grid
+            cells = cells[np.lexsort(cells.T)]
+            self.cells_ = cells
+            self._cell_labels = dict(
+                (cell.tobytes(), i) for i, cell in enumerate(cells))
+            self.n_bins = len(cells)
+        else:
+            n_total = 1
+            for n in n_bins:
+                n_total *= int(n)
+            if n_total > np.iinfo(np.int64).max:
+                raise ValueError('The grid has too many bins (%d) to be '
+                                 'labeled. Use sparse=True.' % n_total)
+            self.n_bins = n_total
 
         return self
 
+    def _bin_indices(self, X):
+        """Index along each feature of the grid cell containing each sample
+
+        Since the bins are evenly spaced, the bin index is computed directly
+        from the bin width instead of searching the bin edges.
+        """
+        cells = np.floor((X - self._lower) / self._width).astype(np.intp)
+        # a sample on the upper bin edge goes in the last bin
+        return np.minimum(cells, self._n_bins - 1, out=cells)
+
     def predict(self, X):
         """Get the index of the grid cell containing each sample in X
 
@@ -116,20 +176,46 @@ class _NDGrid(ClusterMixin, TransformerMixin):
         y : array, shape = [n_samples,]
             Index of the grid cell containing each sample
         """
-        if np.any(X < self.grid[:, 0]) or np.any(X > self.grid[:, -1]):
+        if np.any(X < self._lower) or np.any(X > self._upper):
             raise ValueError('data out of min/max bounds')
 
-        binassign = np.zeros((self.n_features, len(X)), dtype=int)
-        for i in range(self.n_features):
-            binassign[i] = np.digitize(X[:, i], self.grid[i]) - 1
+        cells = self._bin_indices(X)
+        if not self.sparse:
+            labels = np.dot(cells, self._strides)
+            assert np.max(labels) < self.n_bins
+            return labels
 
-        labels = np.dot(self.n_bins_per_feature ** np.arange(self.n_features), binassign)
-        assert np.max(labels) < self.n_bins
-        return labels
+        # look up each distinct cell only once
+        unique_cells, inverse = _unique_rows(cells)
+        unique_labels = np.array(
+            [self._cell_labels.get(cell.tobytes(), -1) for cell in unique_cells],
+            dtype=int)
+        return unique_labels[inverse]
 
     def fit_predict(self, X, y=None):
         return self.fit(X).predict(X)
 
 
+def _unique_rows(a):
+    """Find the unique rows of a 2D integer array
+
+    Returns
+    -------
+    unique : np.ndarray
+        The unique rows of `a`
+    inverse : np.ndarray
+        The indices of the unique rows that reconstruct `a`
+    """
+    a = np.ascontiguousarray(a)
+    rows = a.view(np.dtype((np.void, a.dtype.itemsize * a.shape[1])))
+    _, index, inverse = np.unique(rows.ravel(), return_index=True,
+                                  return_inverse=True)
+    return a[index], inverse.ravel()
+
+
 class NDGrid(MultiSequenceClusterMixin, _NDGrid, BaseEstimator):
     __doc__ = _NDGrid.__doc__
+    _assignment_attributes = ('n_features', 'n_bins', 'grid', '_n_bins',
+                              '_lower', '_upper', '_width', '_strides')
+    # only used with sparse=True
+    _optional_assignment_attributes = ('cells_', '_cell_labels')
@@ -40,8 +40,9 @@
 static int randomassign(npy_intp nclusters, npy_intp nelements,
                         npy_intp clusterid[], PyObject* random);
 
+template <typename T>
 static void getclustermedoids(npy_intp nclusters, npy_intp nelements,
-                              double* distance, npy_intp clusterid[],
+                              const T* distance, npy_intp clusterid[],
                               npy_intp centroids[], double errors[]);
 
 #if PY_MAJOR_VERSION >= 3
@@ -71,9 +72,11 @@ static inline npy_intp ix(npy_intp i, npy_intp j, npy_intp n) {
 /* ************************************************************************ */
 
 
-void kmedoids(npy_intp nclusters, npy_intp nelements, double* distmatrix,
-              npy_intp npass, npy_intp clusterid[], PyObject* random,
-              double* error, npy_intp* ifound)
+template <typename T>
+static void kmedoids_impl(npy_intp nclusters, npy_intp nelements,
+                          const T* distmatrix, npy_intp npass,
+                          npy_intp clusterid[], PyObject* random,
+                          double* error, npy_intp* ifound)
 /*
 Purpose
 =======
@@ -93,7 +96,7 @@ The number of clusters to be found.
 nelements  (input) int
 The number of elements to be clustered.
 
-distmatrix (input) double array,
+distmatrix (input) double or float array,
 Condensed distance matrix. The lower triangular entries of the symmetric
 distance matrix. This is the format returned by ``scipy.spatial.distance.pdist()``
 
@@ -259,10 +262,27 @@ to 0. If kmedoids fails due to a memory allocation error, ifound is set to -1.
     return;
 }
 
+void kmedoids(npy_intp nclusters, npy_intp nelements, double* distmatrix,
+              npy_intp npass, npy_intp clusterid[], PyObject* random,
+              double* error, npy_intp* ifound)
+{
+    kmedoids_impl(nclusters, nelements, distmatrix, npass, clusterid, random,
+                  error, ifound);
+}
+
+void kmedoids(npy_intp nclusters, npy_intp nelements, float* distmatrix,
+              npy_intp npass, npy_intp clusterid[], PyObject* random,
+              double* error, npy_intp* ifound)
+{
+    kmedoids_impl(nclusters, nelements, distmatrix, npass, clusterid, random,
+                  error, ifound);
+}
+
 /* ********************************************************************* */
 
+template <typename T>
 static void getclustermedoids(npy_intp nclusters, npy_intp nelements,
-                              double* distmatrix, npy_intp clusterid[], npy_intp centroids[],
+                              const T* distmatrix, npy_intp clusterid[], npy_intp centroids[],
                               double errors[])
 /*
 Purpose
@@ -276,7 +296,7 @@ nclusters  (input) int
 The number of clusters.
 nelements  (input) int
 The total number of elements.
-distmatrix (input) double array
+distmatrix (input) double or float array
 Condensed distance matrix. The lower triangular entries of the symmetric
 distance matrix. This is the format returned by ``scipy.spatial.distance.pdist()``
 clusterid  (output) int[nelements]
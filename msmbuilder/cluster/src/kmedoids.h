@@ -36,6 +36,9 @@
 void kmedoids(npy_intp nclusters, npy_intp nelements, double* distmatrix,
 	      npy_intp npass, npy_intp clusterid[], PyObject* random,
               double* error, npy_intp* ifound);
+void kmedoids(npy_intp nclusters, npy_intp nelements, float* distmatrix,
+	      npy_intp npass, npy_intp clusterid[], PyObject* random,
+              double* error, npy_intp* ifound);
 
 
 /*
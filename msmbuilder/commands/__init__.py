@@ -5,6 +5,7 @@ from .featurizer import (AtomPairsFeaturizerCommand, ContactFeaturizerCommand,
 from .fit import GaussianFusionHMMCommand
 from .fit_transform import KMeansCommand, KCentersCommand
 from .transform import TransformCommand
+from .assign_server import AssignServerCommand
 from .example_datasets import AlanineDipeptideDatasetCommand
 from .atom_indices import AtomIndices
 from .implied_timescales import ImpliedTimescales
@@ -0,0 +1,245 @@
+'''
+Assign streaming frames to the clusters of a pre-fit model.
+
+The server loads the model once, and then answers requests over stdin/stdout,
+or a local TCP socket (with --port). Each request is a single array in the
+numpy ``.npy`` format: for vector models, the features of a block of frames,
+shape=(n_frames, n_features), and for metric='rmsd' models, the coordinates,
+shape=(n_frames, n_atoms, 3). Each response is an ``.npy`` array with the
+label of each frame. Requests from concurrent socket connections are assigned
+together, in batches of up to --max_batch frames.
+
+If a request can't be assigned (e.g. it has the wrong number of features),
+the response is instead a 0-d string array with the error message, and the
+server carries on with the next request. If a request isn't a valid ``.npy``
+array, the error response is sent and the connection is closed, since the
+start of the next request can't be found.
+
+'''
+
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import threading
+
+import numpy as np
+import mdtraj as md
+from six.moves import queue, socketserver
+
+from ..base import BaseEstimator
+from ..utils import load
+from ..cluster import load_assignment_model
+from ..cmdline import Command, argument_group
+
+__all__ = ['AssignmentServer']
+
+
+class AssignmentServer(object):
+    """Assign frames to clusters, batching requests from several threads
+
+    Each call to ``assign`` queues its frames for a single worker thread,
+    which concatenates all of the pending requests (up to ``max_batch``
+    frames) and labels them with one call to the model's
+    ``partial_predict``.
+
+    Parameters
+    ----------
+    model : MultiSequenceClusterMixin
+        A fit clustering model
+    max_batch : int, default=10000
+        Maximum number of frames to assign in one call to the model
+    """
+
+    def __init__(self, model, max_batch=10000):
+        self.model = model
+        self.max_batch = max_batch
+        # frames are given to rmsd models as coordinates, and wrapped in a
+        # trajectory with the topology of the cluster centers
+        centers = getattr(model, 'cluster_centers_', None)
+        self._topology = getattr(centers, 'topology', None)
+        self._requests = queue.Queue()
+
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def assign(self, X):
+        """Get the cluster label of each frame in X
+
+        Parameters
+        ----------
+        X : array, shape=(n_frames, n_features) or (n_frames, n_atoms, 3)
+            The frames to assign
+
+        Returns
+        -------
+        labels : array, shape=(n_frames,)
+        """
+        request = _Request(np.asarray(X))
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.labels
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            n_frames = len(batch[0].X)
+            while n_frames < self.max_batch:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                n_frames += len(request.X)
+            self._assign_batch(batch)
+
+    def _assign_batch(self, batch):
+        try:
+            X = np.concatenate([r.X for r in batch])
+            if self._topology is not None:
+                X = md.Trajectory(X, self._topology)
+            labels = self.model.partial_predict(X)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                batch[0].done.set()
+            else:
+                # find the culprit(s) by assigning each request on its own
+                for request in batch:
+                    self._assign_batch([request])
+            return
+
+        offsets = np.cumsum([len(r.X) for r in batch])[:-1]
+        for request, l in zip(batch, np.split(labels, offsets)):
+            request.labels = l
+            request.done.set()
+
+
+class _Request(object):
+    def __init__(self, X):
+        self.X = X
+        self.labels = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def _read_array(fp):
+    """Read one .npy array from a stream, or None at the end of the stream.
+
+    Only a stream which ends before the first byte of an array is treated as
+    the end of the stream. A malformed or truncated array raises ValueError.
+    """
+    first = fp.read(1)
+    if len(first) == 0:
+        return None
+    return np.lib.format.read_array(_Unread(first, fp), allow_pickle=False)
+
+
+class _Unread(object):
+    """Read-only stream which returns ``data``, followed by the rest of
+    ``fp``"""
+
+    def __init__(self, data, fp):
+        self.data = data
+        self.fp = fp
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data, self.data = self.data + self.fp.read(), b''
+            return data
+        data, self.data = self.data[:size], self.data[size:]
+        if len(data) < size:
+            data += self.fp.read(size - len(data))
+        return data
+
+
+def _write_array(fp, array):
+    np.lib.format.write_array(fp, np.asarray(array), allow_pickle=False)
+    fp.flush()
+
+
+def _write_error(fp, e):
+    message = '%s: %s' % (type(e).__name__, e)
+    print('Error: %s' % message, file=sys.stderr)
+    _write_array(fp, np.array(message))
+
+
+def serve_stream(server, inp, out):
+    """Answer requests, read from the stream inp, until it is closed"""
+    while True:
+        try:
+            X = _read_array(inp)
+        except ValueError as e:
+            # the start of the next request can't be found
+            _write_error(out, e)
+            break
+        if X is None:
+            break
+
+        try:
+            labels = server.assign(X)
+        except Exception as e:
+            _write_error(out, e)
+        else:
+            _write_array(out, labels)
+
+
+def serve_socket(server, host, port):
+    """Answer requests over TCP connections, each on its own thread"""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            serve_stream(server, self.rfile, self.wfile)
+
+    tcp_server = socketserver.ThreadingTCPServer((host, port), Handler)
+    tcp_server.daemon_threads = True
+    print('Listening on %s:%d' % tcp_server.server_address, file=sys.stderr)
+    try:
+        tcp_server.serve_forever()
+    finally:
+        tcp_server.server_close()
+
+
+class AssignServerCommand(Command):
+    _concrete = True
+    _group = 'X'
+    name = 'AssignServer'
+    description = __doc__
+
+    g = argument_group('required arguments')
+    mdl = g.add_argument('-m', '--model', help='''Path to a pre-fit clustering
+        model, either saved using the pickle protocol (suffix .pkl), or a
+        directory written by save_assignment_model(), whose cluster centers
+        will be memory-mapped.''', required=True)
+
+    s = argument_group('server options')
+    port = s.add_argument('--port', help='''Listen for connections on this TCP
+        port. If not supplied, requests are read from stdin and responses
+        written to stdout.''', default=None, type=int)
+    host = s.add_argument('--host', help='''Address to listen on, with
+        --port.''', default='127.0.0.1')
+    max_batch = s.add_argument('--max_batch', help='''Maximum number of frames
+        to assign at once.''', default=10000, type=int)
+
+    def __init__(self, args):
+        self.args = args
+
+    def start(self):
+        if os.path.isdir(self.args.model):
+            model = load_assignment_model(self.args.model)
+        else:
+            model = load(self.args.model)
+        if not (isinstance(model, BaseEstimator) and
+                hasattr(model, 'partial_predict')):
+            self.error('%r is not an MSMBuilder clustering model' % model)
+
+        server = AssignmentServer(model, max_batch=self.args.max_batch)
+        if self.args.port is not None:
+            serve_socket(server, self.args.host, self.args.port)
+        else:
+            # stdout is used for the responses
+            print('Reading requests from stdin', file=sys.stderr)
+            serve_stream(server, getattr(sys.stdin, 'buffer', sys.stdin),
+                         getattr(sys.stdout, 'buffer', sys.stdout))
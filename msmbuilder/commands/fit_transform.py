@@ -11,6 +11,7 @@ from __future__ import print_function, absolute_import
 
 import os
 import numpy as np
+from sklearn.externals.joblib import Parallel, delayed
 
 from ..utils.progressbar import ProgressBar, Percentage, Bar, ETA
 from ..dataset import dataset, _guess_format
@@ -41,6 +42,10 @@ class FitTransformCommand(NumpydocClassCommand):
         '-t', '--transformed', help='''Path to output transformed dataset. This
         will be a collection of arrays, as transfomed by the model''',
         default='', type=exttype('.h5'))
+    transform_n_jobs = g2.add_argument(
+        '--transform_n_jobs', help='''Number of threads used to compute the
+        transformed dataset. Each thread transforms one sequence at a time.''',
+        default=1, type=int)
 
     def load_dataset(self):
         return dataset(self.inp, mode='r', verbose=False)
@@ -63,13 +68,25 @@ class FitTransformCommand(NumpydocClassCommand):
 
         if self.transformed is not '':
             out_ds = inp_ds.create_derived(self.transformed, fmt=self._transformed_fmt)
+            keys = list(inp_ds.keys())
+            # the sequences are read (in this thread) and transformed in
+            # batches of `transform_n_jobs`, so that only one batch needs
+            # to be in memory at a time
+            batch_size = max(self.transform_n_jobs, 1)
+            parallel = Parallel(n_jobs=batch_size, backend='threading')
             pbar = ProgressBar(
                 widgets=['Transforming ', Percentage(), Bar(), ETA()],
-                maxval=len(inp_ds)).start()
-
-            for key in pbar(inp_ds.keys()):
-                in_seq = inp_ds.get(key)
-                out_ds[key] = self.instance.partial_transform(in_seq)
+                maxval=len(keys)).start()
+
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                transformed = parallel(
+                    delayed(_partial_transform)(self.instance, inp_ds.get(key))
+                    for key in batch)
+                for key, out_seq in zip(batch, transformed):
+                    out_ds[key] = out_seq
+                pbar.update(start + len(batch))
+            pbar.finish()
             out_ds.close()
 
             print("\nSaving transformed dataset to '%s'" % self.transformed)
@@ -91,6 +108,10 @@ class FitTransformCommand(NumpydocClassCommand):
 
 
 
+def _partial_transform(model, X):
+    return model.partial_transform(X)
+
+
 class TrajectoryClusterCommand(FitTransformCommand):
     # A fit-transform for clustering that can either accept a collection
     # of arrays _or_ a collection of Trajectories to fit()
@@ -25,6 +25,7 @@ from __future__ import print_function, division, absolute_import
 from os.path import splitext
 import sys
 import json
+import warnings
 
 import pandas as pd
 
@@ -49,8 +50,9 @@ class ImpliedTimescales(Command):
     fmt = argument('--fmt', help='Output file format', default='csv',
         choices=('csv', 'json', 'excel'))
     _extensions = {'csv': '.csv', 'json': '.json', 'excel': '.xlsx'}
-    n_jobs = argument('--n_jobs', help='Number of parallel processes',
-        default=1, type=int)
+    n_jobs = argument('--n_jobs', help='''DEPRECATED: has no effect, and
+        will be removed. The transitions at all of the lag times are counted
+        together, in a single pass over the data.''', default=1, type=int)
 
     p = argument_group('MSM parameters')
     n_timescales = p.add_argument('--n_timescales', default=10, help='''
@@ -83,6 +85,10 @@ class ImpliedTimescales(Command):
         self.args = args
 
     def start(self):
+        if self.args.n_jobs != 1:
+            warnings.warn("--n_jobs is deprecated and has no effect. It will "
+                          "be removed in MSMBuilder3.4")
+
         kwargs = {
             'n_timescales': self.args.n_timescales,
             'reversible_type': self.args.reversible_type,
@@ -97,7 +103,6 @@ class ImpliedTimescales(Command):
                 ds, lag_times=self.args.lag_times,
                 n_timescales=self.args.n_timescales,
                 msm=model,
-                n_jobs=self.args.n_jobs,
                 verbose=self.args.verbose)
 
         cols = ['Timescale %d' % (d+1) for d in range(len(lines[0]))]
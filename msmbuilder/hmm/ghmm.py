@@ -26,6 +26,7 @@ from .discrete_approx import discrete_approx_mvn, NotSatisfiableError
 from . import _ghmm
 from ..msm._markovstatemodel import _transmat_mle_prinz
 from ..utils import check_iter_of_sequences, printoptions
+from ..utils.draw_samples import _draw_samples_by_state
 from ..base import BaseEstimator
 
 EPS = np.finfo(np.float32).eps
@@ -597,16 +598,8 @@ class GaussianFusionHMM(BaseEstimator):
                     x, self.means_, self.vars_, covariance_type='diag'
                 ) for x in sequences]
             ass = [lp.argmax(1) for lp in logprob]
-
-            selected_pairs_by_state = []
-            for state in range(self.n_states):
-                all_frames = [np.where(a == state)[0] for a in ass]
-                pairs = [(trj, frame) for (trj, frames)
-                         in enumerate(all_frames) for frame in frames]
-                selected_pairs_by_state.append(
-                    [pairs[random.choice(len(pairs))]
-                     for i in range(n_samples)]
-                )
+            selected_pairs_by_state = _draw_samples_by_state(
+                ass, self.n_states, n_samples, random)
 
         elif scheme == "maxent":
             X_concat = np.concatenate(sequences)
@@ -11,8 +11,10 @@ import mdtraj as md
 from libc.float cimport FLT_MAX
 from libc.string cimport strcmp
 from numpy cimport npy_intp
+from cython cimport floating
+from sklearn.externals.joblib import Parallel, delayed, cpu_count
 
-__all__ = ['assign_nearest', 'pdist', 'dist']
+__all__ = ['assign_nearest', 'pdist', 'dist', 'RMSDCoordinates']
 
 cdef VECTOR_METRICS = ("euclidean", "sqeuclidean", "cityblock", "chebyshev",
                        "canberra", "braycurtis", "hamming", "jaccard",
@@ -33,16 +35,19 @@ cdef extern from "assign.hpp":
         npy_intp n_Y, npy_intp n_features, npy_intp n_X_indices,
         npy_intp* assignments) nogil
 cdef extern from "pdist.hpp":
-    void pdist_double(const double* X, const char* metric, npy_intp n, npy_intp m,
-        double* out) nogil
-    void pdist_float(const float* X, const char* metric, npy_intp n, npy_intp m,
-        double* out) nogil
-    void pdist_double_X_indices(const double* X, const char* metric, npy_intp n,
-        npy_intp m, const npy_intp* X_indices, npy_intp n_X_indices,
-        double* out) nogil
-    void pdist_float_X_indices(const float* X, const char* metric, npy_intp n,
-        npy_intp m, const npy_intp* X_indices, npy_intp n_X_indices,
-        double* out) nogil
+    enum: PDIST_TILE
+    void pdist_double(const double* X, const char* metric, npy_intp m,
+        const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+        npy_intp row_end, double* out) nogil
+    void pdist_double(const double* X, const char* metric, npy_intp m,
+        const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+        npy_intp row_end, float* out) nogil
+    void pdist_float(const float* X, const char* metric, npy_intp m,
+        const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+        npy_intp row_end, double* out) nogil
+    void pdist_float(const float* X, const char* metric, npy_intp m,
+        const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+        npy_intp row_end, float* out) nogil
 cdef extern from "dist.hpp":
     void dist_double(const double* X, const double* y, const char* metric,
         npy_intp n, npy_intp m, double* out) nogil
@@ -69,6 +74,118 @@ cdef extern from "theobald_rmsd.h":
 cdef extern from "math.h":
     float sqrt(float x) nogil
 
+#-----------------------------------------------------------------------------
+# Prepared coordinates for RMSD
+#-----------------------------------------------------------------------------
+
+class RMSDCoordinates(object):
+    """Centered coordinates and their traces, ready for RMSD calculations
+
+    The coordinates are stored in a single float32 array in atom-major
+    layout, with the number of atoms zero-padded to a multiple of four.
+    They are centered, and their traces (the inner product of each frame
+    with itself) computed, only once, when the object is built.
+
+    Parameters
+    ----------
+    xyz : array, shape=(n_frames, n_padded_atoms, 3), dtype=float32
+        Centered coordinates, with zeros for the padding atoms
+    traces : array, shape=(n_frames,), dtype=float32
+        The trace of each frame
+    n_atoms : int
+        The number of (non-padding) atoms
+    topology : md.Topology, optional
+        Topology, used to convert back to a trajectory
+
+    See Also
+    --------
+    RMSDCoordinates.from_trajectories
+    """
+    def __init__(self, xyz, traces, n_atoms, topology=None):
+        self.xyz = xyz
+        self.traces = traces
+        self.n_atoms = n_atoms
+        self.topology = topology
+
+    @classmethod
+    def from_trajectories(cls, trajectories):
+        """Prepare the coordinates of a list of trajectories
+
+        Each trajectory is copied once, directly into the combined array,
+        and centered there. The trajectories are not modified.
+        """
+        trajectories = list(trajectories)
+        n_atoms = trajectories[0].n_atoms
+        lengths = [len(t) for t in trajectories]
+        if any(t.n_atoms != n_atoms for t in trajectories):
+            raise ValueError('All trajectories must have the same number '
+                             'of atoms')
+
+        xyz = np.zeros((sum(lengths), 4 * ((n_atoms + 3) // 4), 3),
+                       dtype=np.float32)
+        traces = np.zeros(len(xyz), dtype=np.float32)
+        start = 0
+        for t, length in zip(trajectories, lengths):
+            xyz[start:start + length, :n_atoms] = t.xyz
+            start += length
+        _center_and_trace(xyz, traces, n_atoms)
+        return cls(xyz, traces, n_atoms, trajectories[0].topology)
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            key = [key]
+        return RMSDCoordinates(np.ascontiguousarray(self.xyz[key]),
+                               np.ascontiguousarray(self.traces[key]),
+                               self.n_atoms, self.topology)
+
+    def padded(self, n_padded):
+        """Copy of the coordinates, padded to `n_padded` atoms"""
+        xyz = np.zeros((len(self.xyz), n_padded, 3), dtype=np.float32)
+        xyz[:, :self.n_atoms] = self.xyz[:, :self.n_atoms]
+        return RMSDCoordinates(xyz, self.traces, self.n_atoms, self.topology)
+
+    def to_trajectory(self):
+        """Convert to a (pre-centered) md.Trajectory"""
+        traj = md.Trajectory(self.xyz[:, :self.n_atoms], self.topology)
+        traj._rmsd_traces = np.array(self.traces)
+        return traj
+
+
+RMSD_TYPES = (md.Trajectory, RMSDCoordinates)
+
+
+cdef _center_and_trace(float[:, :, ::1] xyz, float[::1] traces, int n_atoms):
+    # one frame at a time, so that the padding atoms are left alone
+    cdef npy_intp i
+    with nogil:
+        for i in range(xyz.shape[0]):
+            inplace_center_and_trace_atom_major(&xyz[i, 0, 0], &traces[i],
+                                                1, n_atoms)
+
+
+def _rmsd_coordinates(*args):
+    """Get RMSDCoordinates for each md.Trajectory or RMSDCoordinates, with
+    the same padding"""
+    coords = []
+    for X in args:
+        if isinstance(X, md.Trajectory):
+            if X._rmsd_traces is None:
+                raise ValueError('Trajectories must be pre-centered, using '
+                                 'md.Trajectory.center_coordinates')
+            X = RMSDCoordinates(X.xyz, X._rmsd_traces, X.n_atoms)
+        coords.append(X)
+
+    if any(X.n_atoms != coords[0].n_atoms for X in coords):
+        raise ValueError("Input trajectories must have same number of atoms. "
+                         "found %s." % ', '.join(str(X.n_atoms) for X in coords))
+    n_padded = max(X.xyz.shape[1] for X in coords)
+    return [X if X.xyz.shape[1] == n_padded else X.padded(n_padded)
+            for X in coords]
+
+
 #-----------------------------------------------------------------------------
 # Public interface functions
 #-----------------------------------------------------------------------------
@@ -88,8 +205,8 @@ def assign_nearest(X, Y, const char* metric, npy_intp[::1] X_indices=None):
     metric : {"euclidean", "sqeuclidean", "cityblock", "chebyshev", "canberra",
               "braycurtis", "hamming", "jaccard", "cityblock", "rmsd"}
         The distance metric to use. metric = "rmsd" requires that both X
-        and cluster centers be of type md.Trajectory; other distance metrics
-        require that they be arrays.
+        and cluster centers be of type md.Trajectory or RMSDCoordinates;
+        other distance metrics require that they be arrays.
     X_indices : array of indices, or None
         If supplied, only data points with index in X_indices will be
         considered. `X_indices = None` is equivalent to
@@ -108,7 +225,7 @@ def assign_nearest(X, Y, const char* metric, npy_intp[::1] X_indices=None):
     --------
     mdtraj.rmsd
     """
-    if (isinstance(X, md.Trajectory) and isinstance(Y, md.Trajectory) and strcmp(metric, RMSD) == 0):
+    if (isinstance(X, RMSD_TYPES) and isinstance(Y, RMSD_TYPES) and strcmp(metric, RMSD) == 0):
         return _assign_nearest_rmsd(X, Y, X_indices)
 
 
@@ -126,8 +243,9 @@ def assign_nearest(X, Y, const char* metric, npy_intp[::1] X_indices=None):
         raise TypeError('X and y must be both float32 or float64')
 
 
-def pdist(X, const char* metric, npy_intp[::1] X_indices=None):
-    """pdist(X, metric, X_indices=None)
+def pdist(X, const char* metric, npy_intp[::1] X_indices=None, out=None,
+          dtype=np.float64, n_jobs=1):
+    """pdist(X, metric, X_indices=None, out=None, dtype=np.float64, n_jobs=1)
 
     Pairwise distances between observations
 
@@ -138,10 +256,22 @@ def pdist(X, const char* metric, npy_intp[::1] X_indices=None):
     metric : {"euclidean", "sqeuclidean", "cityblock", "chebyshev", "canberra",
               "braycurtis", "hamming", "jaccard", "cityblock", "rmsd"}
         The distance metric to use. metric = "rmsd" requires that X be of type
-        md.Trajectory; other distance metrics require that it be a numpy array
+        md.Trajectory or RMSDCoordinates; other distance metrics require that
+        it be a numpy array
     X_indices : array of indices, or None
         If supplied, only data points with index in X_indices will be considered.
         `X_indices = None` is equivalent to `X_indices = range(len(X))`
+    out : array, shape=(len(X) choose 2,), optional
+        A contiguous float32 or float64 array (which may be a writable
+        ``np.memmap``) to store the distances in. If supplied, ``dtype`` is
+        ignored.
+    dtype : {np.float64, np.float32}
+        The dtype of the returned distances, if ``out`` is not supplied.
+        float32 output halves the memory required for the distance matrix.
+    n_jobs : int, default=1
+        Number of threads used to compute the distances. The rows of the
+        distance matrix are split into blocks with a similar number of
+        pairs, which are computed concurrently. If -1, all CPUs are used.
 
     Returns
     -------
@@ -149,6 +279,7 @@ def pdist(X, const char* metric, npy_intp[::1] X_indices=None):
         Returns a condensed distance matrix `dist`.  For
         each :math:`i` and :math:`j` (where :math:`i<j<n`), the
         metric ``dist(u=X[i], v=X[j])`` is computed and stored in entry ``ij``.
+        If ``out`` was supplied, it is returned.
 
     See Also
     --------
@@ -156,21 +287,62 @@ def pdist(X, const char* metric, npy_intp[::1] X_indices=None):
     scipy.spatial.distance.pdist
     scipy.spatial.distance.squareform
     """
-    if (isinstance(X, md.Trajectory) and strcmp(metric, RMSD) == 0):
-        return _pdist_rmsd(X, X_indices)
-
-    if not isinstance(X, np.ndarray):
-        raise TypeError()
-    if metric not in VECTOR_METRICS:
-        raise ValueError('metric must be one of %s' %
-                         ', '.join("'%s'" % s for s in VECTOR_METRICS))
-
-    if X.dtype == np.float64:
-        return _pdist_double(X, metric, X_indices)
-    elif X.dtype == np.float32:
-        return _pdist_float(X, metric, X_indices)
+    if (isinstance(X, RMSD_TYPES) and strcmp(metric, RMSD) == 0):
+        X, = _rmsd_coordinates(X)
     else:
-        raise TypeError('X must be float32 or float64')
+        if not isinstance(X, np.ndarray):
+            raise TypeError()
+        if metric not in VECTOR_METRICS:
+            raise ValueError('metric must be one of %s' %
+                             ', '.join("'%s'" % s for s in VECTOR_METRICS))
+        if X.dtype not in (np.float32, np.float64):
+            raise TypeError('X must be float32 or float64')
+
+    cdef npy_intp n = len(X) if X_indices is None else X_indices.shape[0]
+    cdef npy_intp n_pairs = n * (n - 1) // 2
+    if out is None:
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise TypeError('dtype must be float32 or float64')
+        out = np.empty(n_pairs, dtype=dtype)
+    elif not (isinstance(out, np.ndarray) and out.shape == (n_pairs,) and
+              out.dtype in (np.float32, np.float64) and
+              out.flags.c_contiguous):
+        raise ValueError('out must be a contiguous float32 or float64 array '
+                         'of shape (%d,)' % n_pairs)
+    if n < 2:
+        return out
+
+    if n_jobs < 0:
+        n_jobs = max(cpu_count() + 1 + n_jobs, 1)
+    if n_jobs == 1:
+        _pdist_rows(X, metric, X_indices, out, 0, n)
+    else:
+        # a few blocks per thread, to even out the load
+        starts = _pdist_row_blocks(n, 4 * n_jobs)
+        Parallel(n_jobs=n_jobs, backend='threading')(
+            delayed(_pdist_rows)(X, metric, X_indices, out, start, end)
+            for start, end in zip(starts[:-1], starts[1:]))
+    return out
+
+
+def _pdist_row_blocks(npy_intp n, npy_intp n_blocks):
+    """Split the rows of a condensed distance matrix of n points into
+    n_blocks ranges with (about) the same number of pairs, returning the
+    boundaries"""
+    n_pairs = np.cumsum(np.arange(n - 1, 0, -1))
+    starts = 1 + np.searchsorted(n_pairs, np.linspace(0, n_pairs[-1],
+                                                      n_blocks + 1)[1:-1])
+    return np.unique(np.concatenate(([0], starts, [n])))
+
+
+def _pdist_rows(X, const char* metric, npy_intp[::1] X_indices, out,
+                npy_intp row_start, npy_intp row_end):
+    if isinstance(X, RMSDCoordinates):
+        _pdist_rmsd(X, X_indices, out, row_start, row_end)
+    elif X.dtype == np.float64:
+        _pdist_double(X, metric, X_indices, out, row_start, row_end)
+    else:
+        _pdist_float(X, metric, X_indices, out, row_start, row_end)
 
 
 def dist(X, y, const char* metric, npy_intp[::1] X_indices=None):
@@ -187,8 +359,8 @@ def dist(X, y, const char* metric, npy_intp[::1] X_indices=None):
     metric : {"euclidean", "sqeuclidean", "cityblock", "chebyshev", "canberra",
               "braycurtis", "hamming", "jaccard", "cityblock", "rmsd"}
         The distance metric to use. metric = "rmsd" requires that both X
-        and cluster centers be of type md.Trajectory; other distance metrics
-        require that they be arrays.
+        and cluster centers be of type md.Trajectory or RMSDCoordinates;
+        other distance metrics require that they be arrays.
 
     Returns
     -------
@@ -200,7 +372,7 @@ def dist(X, y, const char* metric, npy_intp[::1] X_indices=None):
     mdtraj.rmsd
     scipy.spatial.distance.cdist
     """
-    if (isinstance(X, md.Trajectory) and isinstance(y, md.Trajectory) and strcmp(metric, RMSD) == 0):
+    if (isinstance(X, RMSD_TYPES) and isinstance(y, RMSD_TYPES) and strcmp(metric, RMSD) == 0):
         return _dist_rmsd(X, y, X_indices)
 
     if not isinstance(X, np.ndarray) and isinstance(y, np.ndarray):
@@ -229,8 +401,8 @@ def sumdist(X, const char* metric, npy_intp[:, ::1] pair_indices):
     metric : {"euclidean", "sqeuclidean", "cityblock", "chebyshev", "canberra",
               "braycurtis", "hamming", "jaccard", "cityblock", "rmsd"}
         The distance metric to use. metric = "rmsd" requires that both X
-        and cluster centers be of type md.Trajectory; other distance metrics
-        require that they be arrays.
+        and cluster centers be of type md.Trajectory or RMSDCoordinates;
+        other distance metrics require that they be arrays.
     pair_indices : array, shape = (n_pairs, 2)
         Each element in pair_indices is a tuple of two indices -- a pair of
         elements in X to include in the summation.
@@ -241,7 +413,7 @@ def sumdist(X, const char* metric, npy_intp[:, ::1] pair_indices):
         The sum of the distance between each pair of elements:
         ``sum(dist(X[p[0]], X[p[1]]) for p in pair_indices)``
     """
-    if (isinstance(X, md.Trajectory) and strcmp(metric, RMSD) == 0):
+    if (isinstance(X, RMSD_TYPES) and strcmp(metric, RMSD) == 0):
         return _sumdist_rmsd(X, pair_indices)
 
     if metric not in VECTOR_METRICS:
@@ -262,56 +434,49 @@ def sumdist(X, const char* metric, npy_intp[:, ::1] pair_indices):
 
 cdef _assign_nearest_rmsd(X, Y, npy_intp[::1] X_indices=None):
     cdef npy_intp i, j
-    assert (X.xyz.ndim == 3) and (Y.xyz.ndim == 3) and \
-           (X.xyz.shape[2]) == 3 and (Y.xyz.shape[2] == 3)
-    if not (X.xyz.shape[1]  == Y.xyz.shape[1]):
-        raise ValueError("Input trajectories must have same number of atoms. "
-                         "found %d and %d." % (X.xyz.shape[1], Y.xyz.shape[1]))
+    X, Y = _rmsd_coordinates(X, Y)
 
     cdef double inertia = 0
     cdef float min_d, rmsd
     cdef float[:, :, ::1] X_xyz = X.xyz
     cdef float[:, :, ::1] Y_xyz = Y.xyz
-    cdef int n_atoms = X.xyz.shape[1]
+    cdef float[::1] X_trace = X.traces
+    cdef float[::1] Y_trace = Y.traces
+    cdef int n_atoms = X.n_atoms
+    cdef int n_padded = X_xyz.shape[1]
     cdef npy_intp length
     cdef npy_intp X_length = X_xyz.shape[0]
     cdef npy_intp Y_length = Y_xyz.shape[0]
     cdef npy_intp[::1] assignments
-    cdef float[::1] X_trace
-    cdef float[::1] Y_trace
-
-    if X._rmsd_traces is None or Y._rmsd_traces is None:
-        raise ValueError('X and Y must be pre-centered, using '
-                         'md.Trajectory.center_coordinates')
-    X_trace = X._rmsd_traces
-    Y_trace = Y._rmsd_traces
 
     if X_indices is None:
         length = X_length
         assignments = np.zeros(length, dtype=np.intp)
 
-        for i in range(length):
-            min_d = FLT_MAX;
-            for j in range(Y_length):
-                rmsd = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[i, 0, 0],
-                    &Y_xyz[j, 0, 0], X_trace[i], Y_trace[j], 0, NULL))
-                if rmsd < min_d:
-                    min_d = rmsd;
-                    assignments[i] = j;
-            inertia += min_d;
+        with nogil:
+            for i in range(length):
+                min_d = FLT_MAX;
+                for j in range(Y_length):
+                    rmsd = sqrt(msd_atom_major(n_atoms, n_padded, &X_xyz[i, 0, 0],
+                        &Y_xyz[j, 0, 0], X_trace[i], Y_trace[j], 0, NULL))
+                    if rmsd < min_d:
+                        min_d = rmsd;
+                        assignments[i] = j;
+                inertia += min_d;
     else:
         length = X_indices.shape[0]
         assignments = np.zeros(length, dtype=np.intp)
 
-        for i in range(length):
-            min_d = FLT_MAX;
-            for j in range(Y_length):
-                rmsd = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[X_indices[i], 0, 0],
-                            &Y_xyz[j, 0, 0], X_trace[X_indices[i]], Y_trace[j], 0, NULL))
-                if rmsd < min_d:
-                    min_d = rmsd;
-                    assignments[i] = j;
-            inertia += min_d;
+        with nogil:
+            for i in range(length):
+                min_d = FLT_MAX;
+                for j in range(Y_length):
+                    rmsd = sqrt(msd_atom_major(n_atoms, n_padded, &X_xyz[X_indices[i], 0, 0],
+                                &Y_xyz[j, 0, 0], X_trace[X_indices[i]], Y_trace[j], 0, NULL))
+                    if rmsd < min_d:
+                        min_d = rmsd;
+                        assignments[i] = j;
+                inertia += min_d;
 
     return np.array(assignments, copy=False), inertia
 
@@ -327,12 +492,20 @@ cdef _assign_nearest_double(double[:, ::1] X, double[:, ::1] Y,
     else:
         length = X_indices.shape[0]
     assignments = np.zeros(length, dtype=np.intp)
-
-    cdef double inertia = assign_nearest_double(
-        &X[0, 0], &Y[0, 0], metric,
-        <npy_intp*> NULL if X_indices is None else &X_indices[0],
-        X.shape[0], Y.shape[0], n_features, length,
-        &assignments[0])
+    if length == 0:
+        # nothing to assign, and no &X[0, 0] to take
+        return np.array(assignments, copy=False), 0.0
+
+    cdef double inertia
+    cdef npy_intp* X_indices_ptr = NULL
+    if X_indices is not None:
+        X_indices_ptr = &X_indices[0]
+
+    with nogil:
+        inertia = assign_nearest_double(
+            &X[0, 0], &Y[0, 0], metric, X_indices_ptr,
+            X.shape[0], Y.shape[0], n_features, length,
+            &assignments[0])
     return np.array(assignments, copy=False), inertia
 
 
@@ -347,112 +520,139 @@ cdef _assign_nearest_float(float[:, ::1] X, float[:, ::1] Y,
     else:
         length = X_indices.shape[0]
     assignments = np.zeros(length, dtype=np.intp)
-
-    cdef double inertia = assign_nearest_float(
-        &X[0, 0], &Y[0, 0], metric,
-        <npy_intp*> NULL if X_indices is None else &X_indices[0],
-        X.shape[0], Y.shape[0], n_features, length,
-        &assignments[0])
+    if length == 0:
+        # nothing to assign, and no &X[0, 0] to take
+        return np.array(assignments, copy=False), 0.0
+
+    cdef double inertia
+    cdef npy_intp* X_indices_ptr = NULL
+    if X_indices is not None:
+        X_indices_ptr = &X_indices[0]
+
+    with nogil:
+        inertia = assign_nearest_float(
+            &X[0, 0], &Y[0, 0], metric, X_indices_ptr,
+            X.shape[0], Y.shape[0], n_features, length,
+            &assignments[0])
     return np.array(assignments, copy=False), inertia
 
 
-cdef _pdist_rmsd(X, npy_intp[::1] X_indices=None):
-    cdef npy_intp i, j, k
-
-    cdef double[::1] out
+cdef _pdist_rmsd(X, npy_intp[::1] X_indices, out, npy_intp row_start,
+                 npy_intp row_end):
     cdef float[:, :, ::1] X_xyz = X.xyz
-    cdef int n_atoms = X.xyz.shape[1]
-    cdef npy_intp X_length = X_xyz.shape[0]
-    cdef float[::1] X_trace
-
-    if X._rmsd_traces is None:
-        raise ValueError('X must be pre-centered using '
-                         'md.Trajectory.center_coordinates')
-    X_trace = X._rmsd_traces
-
+    cdef float[::1] X_trace = X.traces
+    cdef int n_atoms = X.n_atoms
+    cdef double[::1] out_double
+    cdef float[::1] out_float
     if X_indices is None:
-        out = np.zeros(X_xyz.shape[0] * (X_xyz.shape[0] - 1) / 2, dtype=np.double)
+        X_indices = np.arange(X_xyz.shape[0], dtype=np.intp)
 
-        k = 0
-        for i in range(X_xyz.shape[0]):
-            for j in range(i+1, X_xyz.shape[0]):
-                rmsd = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[i, 0, 0],
-                            &X_xyz[j, 0, 0], X_trace[i], X_trace[j], 0, NULL))
-                out[k] = rmsd
-                k += 1
+    if out.dtype == np.float64:
+        out_double = out
+        with nogil:
+            _pdist_rmsd_rows(X_xyz, X_trace, n_atoms, X_indices, row_start,
+                             row_end, out_double)
     else:
-        out = np.zeros(X_indices.shape[0] * (X_indices.shape[0] - 1) / 2, dtype=np.double)
-
-        k = 0
-        for i in range(X_indices.shape[0]):
-            for j in range(i+1, X_indices.shape[0]):
-                rmsd = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[X_indices[i], 0, 0],
-                            &X_xyz[X_indices[j], 0, 0], X_trace[X_indices[i]],
-                            X_trace[X_indices[j]], 0, NULL))
-                out[k] = rmsd
+        out_float = out
+        with nogil:
+            _pdist_rmsd_rows(X_xyz, X_trace, n_atoms, X_indices, row_start,
+                             row_end, out_float)
+
+
+cdef void _pdist_rmsd_rows(float[:, :, ::1] X_xyz, float[::1] X_trace,
+                           int n_atoms, npy_intp[::1] X_indices,
+                           npy_intp row_start, npy_intp row_end,
+                           floating[::1] out) nogil:
+    # same traversal as pdist_rows in pdist.hpp
+    cdef npy_intp i, j, jj, j_end, k
+    cdef int n_padded = X_xyz.shape[1]
+    cdef npy_intp n = X_indices.shape[0]
+
+    jj = row_start + 1
+    while jj < n:
+        j_end = min(jj + PDIST_TILE, n)
+        for i in range(row_start, min(row_end, j_end - 1)):
+            j = max(jj, i + 1)
+            k = i * (2 * n - i - 1) // 2 + (j - i - 1)
+            while j < j_end:
+                out[k] = sqrt(msd_atom_major(n_atoms, n_padded,
+                    &X_xyz[X_indices[i], 0, 0], &X_xyz[X_indices[j], 0, 0],
+                    X_trace[X_indices[i]], X_trace[X_indices[j]], 0, NULL))
+                j += 1
                 k += 1
-
-    return np.array(out, copy=False)
-
-
-cdef _pdist_double(double[:, ::1] X, const char* metric, npy_intp[::1] X_indices=None):
-    cdef double[::1] out
-    if X_indices is None:
-        out = np.zeros(X.shape[0] * (X.shape[0] - 1) / 2, dtype=np.double)
-        pdist_double(&X[0,0], metric, X.shape[0], X.shape[1], &out[0])
+        jj += PDIST_TILE
+
+
+cdef _pdist_double(double[:, ::1] X, const char* metric,
+                   npy_intp[::1] X_indices, out, npy_intp row_start,
+                   npy_intp row_end):
+    cdef double[::1] out_double
+    cdef float[::1] out_float
+    cdef const npy_intp* indices = NULL
+    cdef npy_intp n = X.shape[0]
+    if X_indices is not None:
+        indices = &X_indices[0]
+        n = X_indices.shape[0]
+
+    if out.dtype == np.float64:
+        out_double = out
+        with nogil:
+            pdist_double(&X[0, 0], metric, X.shape[1], indices, n, row_start,
+                         row_end, &out_double[0])
     else:
-        out = np.zeros(X_indices.shape[0] * (X_indices.shape[0] - 1) / 2, dtype=np.double)
-        pdist_double_X_indices(&X[0, 0], metric, X.shape[0], X.shape[1],
-            &X_indices[0], X_indices.shape[0], &out[0])
-
-    return np.array(out, copy=False)
-
-
-cdef _pdist_float(float[:, ::1] X, const char* metric, npy_intp[::1] X_indices=None):
-    cdef double[::1] out
-    if X_indices is None:
-        out = np.zeros(X.shape[0] * (X.shape[0] - 1) / 2, dtype=np.double)
-        pdist_float(&X[0,0], metric, X.shape[0], X.shape[1], &out[0])
+        out_float = out
+        with nogil:
+            pdist_double(&X[0, 0], metric, X.shape[1], indices, n, row_start,
+                         row_end, &out_float[0])
+
+
+cdef _pdist_float(float[:, ::1] X, const char* metric,
+                  npy_intp[::1] X_indices, out, npy_intp row_start,
+                  npy_intp row_end):
+    cdef double[::1] out_double
+    cdef float[::1] out_float
+    cdef const npy_intp* indices = NULL
+    cdef npy_intp n = X.shape[0]
+    if X_indices is not None:
+        indices = &X_indices[0]
+        n = X_indices.shape[0]
+
+    if out.dtype == np.float64:
+        out_double = out
+        with nogil:
+            pdist_float(&X[0, 0], metric, X.shape[1], indices, n, row_start,
+                        row_end, &out_double[0])
     else:
-        out = np.zeros(X_indices.shape[0] * (X_indices.shape[0] - 1) / 2, dtype=np.double)
-        pdist_float_X_indices(&X[0, 0], metric, X.shape[0], X.shape[1],
-            &X_indices[0], X_indices.shape[0], &out[0])
-    return np.array(out, copy=False)
+        out_float = out
+        with nogil:
+            pdist_float(&X[0, 0], metric, X.shape[1], indices, n, row_start,
+                        row_end, &out_float[0])
 
 
 cdef _dist_rmsd(X, y, npy_intp[::1] X_indices=None):
     cdef npy_intp i, ii, j
-    assert (X.xyz.ndim == 3) and (y.xyz.ndim == 3) and \
-           (X.xyz.shape[2]) == 3 and (y.xyz.shape[2] == 3)
-    if not (X.xyz.shape[1]  == y.xyz.shape[1]):
-        raise ValueError("Input trajectories must have same number of atoms. "
-                         "found %d and %d." % (X.xyz.shape[1], y.xyz.shape[1]))
+    X, y = _rmsd_coordinates(X, y)
 
     cdef double[::1] out
     cdef float[:, :, ::1] X_xyz = X.xyz
     cdef float[:, :, ::1] Y_xyz = y.xyz
-    cdef int n_atoms = X.xyz.shape[1]
+    cdef float[::1] X_trace = X.traces
+    cdef float[::1] y_trace = y.traces
+    cdef int n_atoms = X.n_atoms
+    cdef int n_padded = X_xyz.shape[1]
     cdef npy_intp X_length = X_xyz.shape[0]
     cdef npy_intp y_length = Y_xyz.shape[0]
     cdef float rmsd
-    cdef float[::1] X_trace
-    cdef float[::1] y_trace
-
-    if X._rmsd_traces is None or y._rmsd_traces is None:
-        raise ValueError('X and y must be pre-centered, using '
-                         'md.Trajectory.center_coordinates')
-    X_trace = X._rmsd_traces
-    y_trace = y._rmsd_traces
 
     if X_indices is None:
         out = np.zeros(X_xyz.shape[0], dtype=np.double)
         for i in range(X_xyz.shape[0]):
-            out[i] = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[i, 0, 0],
+            out[i] = sqrt(msd_atom_major(n_atoms, n_padded, &X_xyz[i, 0, 0],
                           &Y_xyz[0, 0, 0], X_trace[i], y_trace[0], 0, NULL))
     else:
         out = np.zeros(X_indices.shape[0], dtype=np.double)
         for i in range(X_indices.shape[0]):
-            out[i] = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[X_indices[i], 0, 0],
+            out[i] = sqrt(msd_atom_major(n_atoms, n_padded, &X_xyz[X_indices[i], 0, 0],
                           &Y_xyz[0, 0, 0], X_trace[X_indices[i]], y_trace[0], 0, NULL))
     return np.array(out, copy=False)
 
@@ -462,11 +662,13 @@ cdef _dist_double(double[:, ::1] X, double[::1] y, const char* metric, npy_intp[
     assert X.shape[1] == y.shape[0]
     if X_indices is None:
         out = np.zeros(X.shape[0], dtype=np.double)
-        dist_double(&X[0,0], &y[0], metric, X.shape[0], X.shape[1], &out[0])
+        with nogil:
+            dist_double(&X[0,0], &y[0], metric, X.shape[0], X.shape[1], &out[0])
     else:
         out = np.zeros(X_indices.shape[0], dtype=np.double)
-        dist_double_X_indices(&X[0, 0], &y[0], metric, X.shape[0], X.shape[1],
-            &X_indices[0], X_indices.shape[0], &out[0])
+        with nogil:
+            dist_double_X_indices(&X[0, 0], &y[0], metric, X.shape[0], X.shape[1],
+                &X_indices[0], X_indices.shape[0], &out[0])
     return np.array(out, copy=False)
 
 
@@ -475,11 +677,13 @@ cdef _dist_float(float[:, ::1] X, float[::1] y, const char* metric, npy_intp[::1
     assert X.shape[1] == y.shape[0]
     if X_indices is None:
         out = np.zeros(X.shape[0], dtype=np.double)
-        dist_float(&X[0,0], &y[0], metric, X.shape[0], X.shape[1], &out[0])
+        with nogil:
+            dist_float(&X[0,0], &y[0], metric, X.shape[0], X.shape[1], &out[0])
     else:
         out = np.zeros(X_indices.shape[0], dtype=np.double)
-        dist_float_X_indices(&X[0, 0], &y[0], metric, X.shape[0], X.shape[1],
-            &X_indices[0], X_indices.shape[0], &out[0])
+        with nogil:
+            dist_float_X_indices(&X[0, 0], &y[0], metric, X.shape[0], X.shape[1],
+                &X_indices[0], X_indices.shape[0], &out[0])
     return np.array(out, copy=False)
 
 
@@ -489,19 +693,16 @@ cdef double _sumdist_rmsd(X, npy_intp[:, ::1] pair_indices):
 
     cdef npy_intp i, ii, jj
     cdef double s = 0
+    X, = _rmsd_coordinates(X)
     cdef float[:, :, ::1] X_xyz = X.xyz
-    cdef int n_atoms = X.xyz.shape[1]
-    cdef float[::1] X_trace
-
-    if X._rmsd_traces is None:
-        raise ValueError('X must be pre-centered using '
-                         'md.Trajectory.center_coordinates')
-    X_trace = X._rmsd_traces
+    cdef float[::1] X_trace = X.traces
+    cdef int n_atoms = X.n_atoms
+    cdef int n_padded = X_xyz.shape[1]
 
     for i in range(pair_indices.shape[0]):
         ii = pair_indices[i, 0]
         jj = pair_indices[i, 1]
-        rmsd = sqrt(msd_atom_major(n_atoms, n_atoms, &X_xyz[ii, 0, 0],
+        rmsd = sqrt(msd_atom_major(n_atoms, n_padded, &X_xyz[ii, 0, 0],
                     &X_xyz[jj, 0, 0], X_trace[ii], X_trace[jj], 0, NULL))
         s += rmsd
     return s
@@ -34,17 +34,61 @@
 
 #ifndef MIXTAPE_LIBDISTANCE_KERNELS_H
 #define MIXTAPE_LIBDISTANCE_KERNELS_H
+#ifdef __SSE2__
+#include <emmintrin.h>
+#endif
 #ifdef __cplusplus
 extern "C" {
 #endif
 
+/*
+ * The euclidean, sqeuclidean, cityblock and chebyshev kernels are vectorized
+ * with SSE2 when the compiler targets it (always the case on x86-64). The
+ * float kernels compute the differences in single precision, like the scalar
+ * loops, but accumulate in double precision.
+ */
+#ifdef __SSE2__
+#define SSE_ABS_PD(x) _mm_andnot_pd(_mm_set1_pd(-0.0), (x))
+
+static NPY_INLINE double
+sse_hsum_pd(__m128d x)
+{
+    return _mm_cvtsd_f64(_mm_add_sd(x, _mm_unpackhi_pd(x, x)));
+}
+
+static NPY_INLINE double
+sse_hmax_pd(__m128d x)
+{
+    return _mm_cvtsd_f64(_mm_max_sd(x, _mm_unpackhi_pd(x, x)));
+}
+
+/* Load u[i:i+4] - v[i:i+4], converted to double precision */
+static NPY_INLINE void
+sse_diff_ps_pd(const float *u, const float *v, __m128d *lo, __m128d *hi)
+{
+    __m128 d = _mm_sub_ps(_mm_loadu_ps(u), _mm_loadu_ps(v));
+    *lo = _mm_cvtps_pd(d);
+    *hi = _mm_cvtps_pd(_mm_movehl_ps(d, d));
+}
+#endif
+
 static NPY_INLINE double
 sqeuclidean_distance_double(const double *u, const double *v, npy_intp n)
 {
     double s = 0.0, d;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, s0 = _mm_setzero_pd(), s1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        d0 = _mm_sub_pd(_mm_loadu_pd(u + i), _mm_loadu_pd(v + i));
+        d1 = _mm_sub_pd(_mm_loadu_pd(u + i + 2), _mm_loadu_pd(v + i + 2));
+        s0 = _mm_add_pd(s0, _mm_mul_pd(d0, d0));
+        s1 = _mm_add_pd(s1, _mm_mul_pd(d1, d1));
+    }
+    s = sse_hsum_pd(_mm_add_pd(s0, s1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = u[i] - v[i];
         s += d * d;
     }
@@ -55,9 +99,18 @@ static NPY_INLINE double
 sqeuclidean_distance_float(const float *u, const float *v, npy_intp n)
 {
     double s = 0.0, d;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, s0 = _mm_setzero_pd(), s1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        sse_diff_ps_pd(u + i, v + i, &d0, &d1);
+        s0 = _mm_add_pd(s0, _mm_mul_pd(d0, d0));
+        s1 = _mm_add_pd(s1, _mm_mul_pd(d1, d1));
+    }
+    s = sse_hsum_pd(_mm_add_pd(s0, s1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = u[i] - v[i];
         s += d * d;
     }
@@ -80,9 +133,19 @@ static NPY_INLINE double
 chebyshev_distance_double(const double *u, const double *v, npy_intp n)
 {
     double d, maxv = 0.0;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, m0 = _mm_setzero_pd(), m1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        d0 = _mm_sub_pd(_mm_loadu_pd(u + i), _mm_loadu_pd(v + i));
+        d1 = _mm_sub_pd(_mm_loadu_pd(u + i + 2), _mm_loadu_pd(v + i + 2));
+        m0 = _mm_max_pd(m0, SSE_ABS_PD(d0));
+        m1 = _mm_max_pd(m1, SSE_ABS_PD(d1));
+    }
+    maxv = sse_hmax_pd(_mm_max_pd(m0, m1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = fabs(u[i] - v[i]);
         if (d > maxv) {
             maxv = d;
@@ -95,9 +158,18 @@ static NPY_INLINE double
 chebyshev_distance_float(const float *u, const float *v, npy_intp n)
 {
     double d, maxv = 0.0;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, m0 = _mm_setzero_pd(), m1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        sse_diff_ps_pd(u + i, v + i, &d0, &d1);
+        m0 = _mm_max_pd(m0, SSE_ABS_PD(d0));
+        m1 = _mm_max_pd(m1, SSE_ABS_PD(d1));
+    }
+    maxv = sse_hmax_pd(_mm_max_pd(m0, m1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = fabs(u[i] - v[i]);
         if (d > maxv) {
             maxv = d;
@@ -219,9 +291,19 @@ static NPY_INLINE double
 city_block_distance_double(const double *u, const double *v, npy_intp n)
 {
     double s = 0.0, d;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, s0 = _mm_setzero_pd(), s1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        d0 = _mm_sub_pd(_mm_loadu_pd(u + i), _mm_loadu_pd(v + i));
+        d1 = _mm_sub_pd(_mm_loadu_pd(u + i + 2), _mm_loadu_pd(v + i + 2));
+        s0 = _mm_add_pd(s0, SSE_ABS_PD(d0));
+        s1 = _mm_add_pd(s1, SSE_ABS_PD(d1));
+    }
+    s = sse_hsum_pd(_mm_add_pd(s0, s1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = fabs(u[i] - v[i]);
         s = s + d;
     }
@@ -232,9 +314,18 @@ static NPY_INLINE double
 city_block_distance_float(const float *u, const float *v, npy_intp n)
 {
     double s = 0.0, d;
-    npy_intp i;
+    npy_intp i = 0;
+#ifdef __SSE2__
+    __m128d d0, d1, s0 = _mm_setzero_pd(), s1 = _mm_setzero_pd();
+    for (; i + 4 <= n; i += 4) {
+        sse_diff_ps_pd(u + i, v + i, &d0, &d1);
+        s0 = _mm_add_pd(s0, SSE_ABS_PD(d0));
+        s1 = _mm_add_pd(s1, SSE_ABS_PD(d1));
+    }
+    s = sse_hsum_pd(_mm_add_pd(s0, s1));
+#endif
 
-    for (i = 0; i < n; i++) {
+    for (; i < n; i++) {
         d = fabs(u[i] - v[i]);
         s = s + d;
     }
@@ -242,59 +333,56 @@ city_block_distance_float(const float *u, const float *v, npy_intp n)
 }
 
 
-static double(*metric_double(const char* metric))
-  (const double *u, const double *v, npy_intp n)
-{
-    if (strcmp(metric, "euclidean") == 0) {
-        return &euclidean_distance_double;  
-    } else if (strcmp(metric, "sqeuclidean") == 0) {
-        return &sqeuclidean_distance_double;
-    } else if (strcmp(metric, "cityblock") == 0) {
-      return &city_block_distance_double;
-    } else if (strcmp(metric, "chebyshev") == 0) {
-      return &chebyshev_distance_double;
-    } else if (strcmp(metric, "canberra") == 0) {
-      return &canberra_distance_double;
-    } else if (strcmp(metric, "braycurtis") == 0) {
-      return &bray_curtis_distance_double;
-    } else if (strcmp(metric, "hamming") == 0) {
-      return &hamming_distance_double;
-    } else if (strcmp(metric, "jaccard") == 0) {
-      return &jaccard_distance_double;
-    } else if (strcmp(metric, "cityblock") == 0) {
-      return &city_block_distance_double;
-    }
-    return NULL;
-}
-
-static double(*metric_float(const char* metric))
-  (const float *u, const float *v, npy_intp n)
-{
-    if (strcmp(metric, "euclidean") == 0) {
-        return &euclidean_distance_float;  
-    } else if (strcmp(metric, "sqeuclidean") == 0) {
-        return &sqeuclidean_distance_float;
-    } else if (strcmp(metric, "cityblock") == 0) {
-      return &city_block_distance_float;
-    } else if (strcmp(metric, "chebyshev") == 0) {
-      return &chebyshev_distance_float;
-    } else if (strcmp(metric, "canberra") == 0) {
-      return &canberra_distance_float;
-    } else if (strcmp(metric, "braycurtis") == 0) {
-      return &bray_curtis_distance_float;
-    } else if (strcmp(metric, "hamming") == 0) {
-      return &hamming_distance_float;
-    } else if (strcmp(metric, "jaccard") == 0) {
-      return &jaccard_distance_float;
-    } else if (strcmp(metric, "cityblock") == 0) {
-      return &city_block_distance_float;
-    }
-    return NULL;
+#ifdef __cplusplus
 }
 
+/*
+ * Each metric as a type, for use as a template parameter. The loops in
+ * pdist.hpp, dist.hpp, assign.hpp and sumdist.hpp are templated on the
+ * metric, so it is resolved once per call instead of going through a
+ * function pointer for every pair of points, and the kernel can be inlined
+ * into the loop.
+ */
+#define LIBDISTANCE_METRIC(name, kernel)                                     \
+    struct name {                                                           \
+        static double distance(const double *u, const double *v, npy_intp n) \
+            { return kernel##_double(u, v, n); }                            \
+        static double distance(const float *u, const float *v, npy_intp n)  \
+            { return kernel##_float(u, v, n); }                             \
+    };
+
+LIBDISTANCE_METRIC(EuclideanMetric, euclidean_distance)
+LIBDISTANCE_METRIC(SqEuclideanMetric, sqeuclidean_distance)
+LIBDISTANCE_METRIC(CityBlockMetric, city_block_distance)
+LIBDISTANCE_METRIC(ChebyshevMetric, chebyshev_distance)
+LIBDISTANCE_METRIC(CanberraMetric, canberra_distance)
+LIBDISTANCE_METRIC(BrayCurtisMetric, bray_curtis_distance)
+LIBDISTANCE_METRIC(HammingMetric, hamming_distance)
+LIBDISTANCE_METRIC(JaccardMetric, jaccard_distance)
+
+/*
+ * `return func<T, Metric> args;` for the metric named by `metric`. Falls
+ * through (after printing an error) if the metric is unknown.
+ */
+#define LIBDISTANCE_DISPATCH(T, metric, func, args)                          \
+    if (strcmp(metric, "euclidean") == 0) {                                 \
+        return func<T, EuclideanMetric> args;                               \
+    } else if (strcmp(metric, "sqeuclidean") == 0) {                        \
+        return func<T, SqEuclideanMetric> args;                             \
+    } else if (strcmp(metric, "cityblock") == 0) {                          \
+        return func<T, CityBlockMetric> args;                               \
+    } else if (strcmp(metric, "chebyshev") == 0) {                          \
+        return func<T, ChebyshevMetric> args;                               \
+    } else if (strcmp(metric, "canberra") == 0) {                           \
+        return func<T, CanberraMetric> args;                                \
+    } else if (strcmp(metric, "braycurtis") == 0) {                         \
+        return func<T, BrayCurtisMetric> args;                              \
+    } else if (strcmp(metric, "hamming") == 0) {                            \
+        return func<T, HammingMetric> args;                                 \
+    } else if (strcmp(metric, "jaccard") == 0) {                            \
+        return func<T, JaccardMetric> args;                                 \
+    }                                                                       \
+    fprintf(stderr, "Error");
 
-
-#ifdef __cplusplus
-}
 #endif
-#endif
\ No newline at end of file
+#endif
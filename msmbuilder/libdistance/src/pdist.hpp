@@ -1,96 +1,75 @@
 #include "distance_kernels.h"
 
+/* Number of points in each tile of the column loop. The rows of a tile
+   (and the row they are compared against) stay in cache while the tile
+   is swept, instead of streaming through all of X for every row. */
+#define PDIST_TILE 64
 
-void pdist_double(const double* X, const char* metric, npy_intp n, npy_intp m,
-                  double* out)
-{
-    npy_intp i, j, k;
-    const double *u, *v;
-    double (*metricfunc) (const double *u, const double *v, npy_intp n) = \
-            metric_double(metric);
-    if (metricfunc == NULL) {
-        fprintf(stderr, "Error");
-        return;
-    }
 
-    k = 0;
-    for (i = 0; i < n; i++) {
-        for (j = i+1; j < n; j++) {
-            u = X + m * i;
-            v = X + m * j;
-            out[k++] = metricfunc(u, v, m);
-        }
-    }
+/* Offset of the pair (i, i+1) in a condensed distance matrix of n points */
+static inline npy_intp condensed_row_offset(npy_intp i, npy_intp n)
+{
+    return i * (2 * n - i - 1) / 2;
 }
 
-void pdist_double_X_indices(const double* X, const char* metric, npy_intp n,
-                            npy_intp m, const npy_intp* X_indices,
-                            npy_intp n_X_indices, double* out)
+
+/* Compute the rows [row_start, row_end) of the condensed distance matrix,
+   i.e. the distances d(i, j) for row_start <= i < row_end and i < j < n.
+
+   If X_indices is NULL the n points are the rows of X, otherwise they are
+   the rows X[X_indices[0]], ..., X[X_indices[n-1]]. `out` is the start of
+   the full condensed distance matrix, of length n*(n-1)/2, so that disjoint
+   row ranges can be filled concurrently. */
+template <typename T, typename Metric, typename OutT>
+void pdist_rows(const T* X, npy_intp m, const npy_intp* X_indices, npy_intp n,
+                npy_intp row_start, npy_intp row_end, OutT* out)
 {
-    npy_intp i, ii, j, jj, k;
-    const double *u, *v;
-    double (*metricfunc) (const double *u, const double *v, npy_intp n) = \
-            metric_double(metric);
-    if (metricfunc == NULL) {
-        fprintf(stderr, "Error");
-        return;
-    }
+    npy_intp i, j, jj, j_end, k;
+    const T *u, *v;
 
-    k = 0;
-    for (ii = 0; ii < n_X_indices; ii++) {
-        i = X_indices[ii];
-        for (jj = ii+1; jj < n_X_indices; jj++) {
-            j = X_indices[jj];
-            u = X + m * i;
-            v = X + m * j;
-            out[k++] = metricfunc(u, v, m);
+    for (jj = row_start + 1; jj < n; jj += PDIST_TILE) {
+        j_end = (jj + PDIST_TILE < n) ? jj + PDIST_TILE : n;
+        for (i = row_start; i < row_end && i < j_end - 1; i++) {
+            u = X + m * (X_indices == NULL ? i : X_indices[i]);
+            j = (jj > i + 1) ? jj : i + 1;
+            k = condensed_row_offset(i, n) + (j - i - 1);
+            for (; j < j_end; j++) {
+                v = X + m * (X_indices == NULL ? j : X_indices[j]);
+                out[k++] = static_cast<OutT>(Metric::distance(u, v, m));
+            }
         }
     }
 }
 
 
-void pdist_float(const float* X, const char* metric, npy_intp n, npy_intp m,
-                 double* out)
+void pdist_double(const double* X, const char* metric, npy_intp m,
+                  const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+                  npy_intp row_end, double* out)
 {
-    npy_intp i, j, k;
-    const float *u, *v;
-    double (*metricfunc) (const float *u, const float *v, npy_intp n) = \
-            metric_float(metric);
-    if (metricfunc == NULL) {
-        fprintf(stderr, "Error");
-        return;
-    }
+    LIBDISTANCE_DISPATCH(double, metric, pdist_rows,
+                         (X, m, X_indices, n, row_start, row_end, out));
+}
 
-    k = 0;
-    for (i = 0; i < n; i++) {
-        for (j = i+1; j < n; j++) {
-            u = X + m * i;
-            v = X + m * j;
-            out[k++] = metricfunc(u, v, m);
-        }
-    }
+void pdist_double(const double* X, const char* metric, npy_intp m,
+                  const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+                  npy_intp row_end, float* out)
+{
+    LIBDISTANCE_DISPATCH(double, metric, pdist_rows,
+                         (X, m, X_indices, n, row_start, row_end, out));
 }
-void pdist_float_X_indices(const float* X, const char* metric, npy_intp n,
-                           npy_intp m, const npy_intp* X_indices,
-                           npy_intp n_X_indices, double* out)
+
+void pdist_float(const float* X, const char* metric, npy_intp m,
+                 const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+                 npy_intp row_end, double* out)
 {
-    npy_intp i, ii, j, jj, k;
-    const float *u, *v;
-    double (*metricfunc) (const float *u, const float *v, npy_intp n) = \
-            metric_float(metric);
-    if (metricfunc == NULL) {
-        fprintf(stderr, "Error");
-        return;
-    }
+    LIBDISTANCE_DISPATCH(float, metric, pdist_rows,
+                         (X, m, X_indices, n, row_start, row_end, out));
+}
 
-    k = 0;
-    for (ii = 0; ii < n_X_indices; ii++) {
-        i = X_indices[ii];
-        for (jj = ii+1; jj < n_X_indices; jj++) {
-            j = X_indices[jj];
-            u = X + m * i;
-            v = X + m * j;
-            out[k++] = metricfunc(u, v, m);
-        }
-    }
-}
\ No newline at end of file
+void pdist_float(const float* X, const char* metric, npy_intp m,
+                 const npy_intp* X_indices, npy_intp n, npy_intp row_start,
+                 npy_intp row_end, float* out)
+{
+    LIBDISTANCE_DISPATCH(float, metric, pdist_rows,
+                         (X, m, X_indices, n, row_start, row_end, out));
+}
@@ -101,8 +101,9 @@ class PCCA(MarkovStateModel):
         self
         """
         trimmed_sequences = super(PCCA, self).transform(sequences)
-        f = np.vectorize(self.trimmed_microstates_to_macrostates.get)
-        return [f(seq) for seq in trimmed_sequences]
+        # the trimmed sequences are in internal indexing, which is how
+        # microstate_mapping_ is indexed
+        return [self.microstate_mapping_[seq] for seq in trimmed_sequences]
 
     @classmethod
     def from_msm(cls, msm, n_macrostates):
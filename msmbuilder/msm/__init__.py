@@ -3,5 +3,5 @@ from .core import *
 from .msm import MarkovStateModel
 from .ratematrix import ContinuousTimeMSM
 from .bayesmsm import BayesianMarkovStateModel
-from .implied_timescales import implied_timescales
+from .implied_timescales import implied_timescales, fit_lag_times
 from .bayes_ratematrix import BayesianContinuousTimeMSM
@@ -3,13 +3,29 @@
 # Copyright (c) 2014, Stanford University
 # All rights reserved.
 
+import warnings
 import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
 
 cdef extern from "transmat_mle_prinz.h":
     int transmat_mle_prinz(const double* C, int n_states,
-                           double tol, double* T, double* pi)
+                           double tol, const double* X0, double* T,
+                           double* pi)
+    int transmat_mle_prinz_sparse(const int* indptr, const int* indices,
+                                  const double* C, const double* C_sym,
+                                  int n_states, double tol, int max_iter,
+                                  const double* X0, double* T,
+                                  double* pi) nogil
 
-def _transmat_mle_prinz(double[:, ::1] C, double tol=1e-10):
+cdef extern from "sample_discrete.h":
+    int sample_discrete(const int* indptr, const int* indices,
+                        const double* cumprob, int n_trajs, int n_steps,
+                        const double* r, int* chain, long stride) nogil
+
+# number of random numbers drawn at a time by _sample_discrete
+_SAMPLE_CHUNK_SIZE = 2**22
+
+def _transmat_mle_prinz(double[:, ::1] C, double tol=1e-10, X0=None):
     """Compute a maximum likelihood reversible transition matrix, given
     a set of directed transition counts.
 
@@ -22,6 +38,11 @@ def _transmat_mle_prinz(double[:, ::1] C, double tol=1e-10):
     tol : (input) float
         Convergence tolerance. The algorithm will iterate until the
         change in the log-likelihood is less than `tol`.
+    X0 : (input) 2d array of shape=(n_states, n_states), optional
+        Symmetric starting point for the iteration, such as
+        ``populations[:, np.newaxis] * T`` from the solution for a similar
+        count matrix (e.g. at a neighbouring lag time). By default, the
+        iteration starts from ``C + C.T``.
 
     Returns
     -------
@@ -45,9 +66,18 @@ def _transmat_mle_prinz(double[:, ::1] C, double tol=1e-10):
         raise ValueError('C must be square')
     cdef double[:, ::1] T = np.zeros((n_states, n_states))
     cdef double[::1] pi = np.zeros(n_states)
+    cdef double[:, ::1] X0_
+    cdef double* X0_ptr = NULL
     cdef int n_iter
 
-    n_iter = transmat_mle_prinz(&C[0,0], n_states, tol, &T[0,0], &pi[0]);
+    if X0 is not None:
+        X0_ = np.ascontiguousarray(X0, dtype=np.float64)
+        if X0_.shape[0] != n_states or X0_.shape[1] != n_states:
+            raise ValueError('X0 must have the same shape as C')
+        X0_ptr = &X0_[0, 0]
+
+    n_iter = transmat_mle_prinz(&C[0,0], n_states, tol, X0_ptr, &T[0,0],
+                                &pi[0]);
     if n_iter < 0:
         # diagnose the error
         msg = ' Error code=%d' % n_iter
@@ -58,3 +88,168 @@ def _transmat_mle_prinz(double[:, ::1] C, double tol=1e-10):
         raise ValueError(msg)
 
     return np.array(T), np.array(pi)
+
+
+def _transmat_mle_prinz_sparse(C, double tol=1e-10, int max_iter=100000,
+                               X0=None):
+    """Compute a maximum likelihood reversible transition matrix, given
+    a sparse set of directed transition counts.
+
+    Only the nonzero entries of ``C + C.T`` are stored and updated, so
+    each iteration is O(nnz), and the rows are updated in parallel with
+    OpenMP. This uses a fixed-point (Jacobi) form of the iteration of
+    Prinz et al.[1], which converges to the same estimate as
+    ``_transmat_mle_prinz``.
+
+    Parameters
+    ----------
+    C : (input) sparse matrix of shape=(n_states, n_states)
+        The directed transition counts.
+    tol : (input) float
+        Convergence tolerance. The algorithm will iterate until the
+        change in the stationary distribution is less than `tol` in
+        every state.
+    max_iter : (input) int
+        Maximum number of iterations.
+    X0 : (input) sparse matrix of shape=(n_states, n_states), optional
+        Symmetric starting point for the iteration, such as
+        ``diags(populations).dot(T)`` from the solution for a similar count
+        matrix (e.g. at a neighbouring lag time). By default, the iteration
+        starts from ``C + C.T``.
+
+    Returns
+    -------
+    T : csr_matrix, shape=(n_states, n_states)
+        The maximum likelihood reversible transition matrix.
+    populations : array, shape = (n_states_,)
+        The equilibrium population (stationary left eigenvector) of T
+
+     References
+     ----------
+     .. [1] Prinz, Jan-Hendrik, et al. "Markov models of molecular kinetics:
+        Generation and validation." J Chem. Phys. 134.17 (2011): 174105.
+    """
+    C = coo_matrix(C, dtype=np.float64)
+    C.sum_duplicates()
+    cdef int n_states = C.shape[0]
+    if C.shape[1] != n_states:
+        raise ValueError('C must be square')
+    if n_states == 0:
+        return csr_matrix((0, 0)), np.zeros(0)
+    if C.nnz == 0:
+        raise ValueError('Row-sums of C must be positive.')
+
+    # the symmetric nonzero pattern of C + C.T, in CSR (row-major) order,
+    # encoded as i*n_states + j
+    codes = C.row.astype(np.int64) * n_states + C.col
+    pattern = np.union1d(codes, C.col.astype(np.int64) * n_states + C.row)
+    rows = pattern // n_states
+    cdef int[::1] indices = (pattern % n_states).astype(np.intc)
+    cdef int[::1] indptr = np.concatenate(
+        [[0], np.cumsum(np.bincount(rows, minlength=n_states))]).astype(np.intc)
+    cdef double[::1] c = np.zeros(len(pattern))
+    np.asarray(c)[np.searchsorted(pattern, codes)] = C.data
+    cdef double[::1] c_sym = np.asarray(c) + np.asarray(c)[np.searchsorted(
+        pattern, np.asarray(indices, dtype=np.int64) * n_states + rows)]
+
+    cdef double[::1] T = np.zeros(len(pattern))
+    cdef double[::1] pi = np.zeros(n_states)
+    cdef double[::1] x0
+    cdef double* x0_ptr = NULL
+    cdef int n_iter
+
+    if X0 is not None:
+        if X0.shape != C.shape:
+            raise ValueError('X0 must have the same shape as C')
+        # the starting point, on the nonzero pattern
+        x0 = np.asarray(csr_matrix(X0)[rows, np.asarray(indices)],
+                        dtype=np.float64).ravel()
+        x0_ptr = &x0[0]
+
+    with nogil:
+        n_iter = transmat_mle_prinz_sparse(
+            &indptr[0], &indices[0], &c[0], &c_sym[0], n_states, tol,
+            max_iter, x0_ptr, &T[0], &pi[0])
+    if n_iter == -3:
+        warnings.warn('Reversible MLE did not converge in %d iterations' %
+                      max_iter)
+    elif n_iter < 0:
+        # diagnose the error
+        msg = ' Error code=%d' % n_iter
+        if np.any(C.data < 0):
+            msg = 'Domain error. C must be positive.' + msg
+        if np.any(np.bincount(C.row, weights=C.data, minlength=n_states) == 0):
+            msg = 'Row-sums of C must be positive.' + msg
+        raise ValueError(msg)
+
+    T_ = csr_matrix((np.asarray(T), np.asarray(indices), np.asarray(indptr)),
+                    shape=(n_states, n_states))
+    return T_, np.array(pi)
+
+
+def _sample_discrete(T, initial, int n_steps, random):
+    """Propagate Markov chains from a (dense or sparse) transition matrix.
+
+    Parameters
+    ----------
+    T : array or sparse matrix, shape=(n_states, n_states)
+        The transition matrix.
+    initial : array of int, shape=(n_trajs,)
+        The initial state of each chain.
+    n_steps : int
+        The length of each chain, including the initial state.
+    random : RandomState
+        Source of the uniform random numbers. Each chain takes one number
+        per step, and the numbers are drawn in blocks of shape
+        (n_trajs, n_block).
+
+    Returns
+    -------
+    chains : array of int, shape=(n_trajs, n_steps)
+        The states of each chain, in the indexing of T.
+    """
+    T = csr_matrix(T, dtype=np.float64)
+    T.eliminate_zeros()
+    T.sort_indices()
+    cdef int n_states = T.shape[0]
+    cdef int[::1] indptr = T.indptr.astype(np.intc)
+    cdef int[::1] indices = T.indices.astype(np.intc)
+    cdef double[::1] data = T.data
+    cdef double[::1] cumprob = np.zeros(T.nnz)
+    cdef double total
+    cdef int i, k
+
+    for i in range(n_states):
+        total = 0
+        for k in range(indptr[i], indptr[i+1]):
+            total += data[k]
+            cumprob[k] = total
+
+    initial = np.asarray(initial, dtype=np.intc)
+    cdef int n_trajs = len(initial)
+    cdef int[:, ::1] chains = np.zeros((n_trajs, max(n_steps, 1)),
+                                       dtype=np.intc)
+    cdef double[:, ::1] r
+    cdef int start, n_block, status = 0
+    cdef int block_size = max(1, _SAMPLE_CHUNK_SIZE // max(n_trajs, 1))
+    if n_trajs == 0 or n_steps == 0:
+        return np.asarray(chains)[:, :n_steps]
+    if np.any(initial < 0) or np.any(initial >= n_states):
+        raise ValueError('initial states must be between 0 and n_states-1')
+    if T.nnz == 0 and n_steps > 1:
+        raise ValueError('The chain reached a state with no outgoing '
+                         'transitions')
+    np.asarray(chains)[:, 0] = initial
+
+    for start in range(1, n_steps, block_size):
+        n_block = min(block_size, n_steps - start)
+        r = random.rand(n_trajs, n_block)
+        with nogil:
+            status = sample_discrete(&indptr[0], &indices[0], &cumprob[0],
+                                     n_trajs, n_block, &r[0, 0],
+                                     &chains[0, start], n_steps)
+        if status != 0:
+            raise ValueError('The chain reached a state with no outgoing '
+                             'transitions')
+
+    return np.asarray(chains)
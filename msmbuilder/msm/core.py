@@ -7,23 +7,98 @@ from __future__ import print_function, division, absolute_import
 
 import numpy as np
 import scipy.linalg
-from scipy.sparse import csgraph, csr_matrix, coo_matrix
+import scipy.sparse.linalg
+from scipy.sparse import csgraph, csr_matrix, coo_matrix, diags, issparse
 
 from sklearn.base import TransformerMixin
 from sklearn.utils import check_random_state
 
 from . import _ratematrix
+from ._markovstatemodel import _sample_discrete
 from ..utils import list_of_1d
+from ..utils.draw_samples import _draw_samples_by_state
 
 
 __all__ = [
     '_MappingTransformMixin', '_dict_compose', '_strongly_connected_subgraph',
     '_transition_counts', '_solve_ratemat_eigensystem', '_normalize_eigensystem',
-    '_solve_msm_eigensystem',
+    '_solve_msm_eigensystem', '_multi_lag_transition_counts',
 ]
 
+# number of transitions encoded at a time by _bincount_transitions
+_COUNTS_CHUNK_SIZE = 2**20
+
 
 class _MappingTransformMixin(TransformerMixin):
+    def _mapping_tables(self):
+        """Lookup tables for ``mapping_``, which are cached, and rebuilt
+        whenever ``mapping_`` changes.
+
+        Returns
+        -------
+        keys : array
+            The labels, in sorted order
+        values : array of int
+            The internal index of each label in `keys`
+        labels : array
+            The label of each internal index (``labels[i]`` is the label which
+            is mapped to ``i``)
+        lut : array of int, or None
+            If the labels are (not too sparse) non-negative integers, a lookup
+            table with ``lut[k]`` the internal index of label ``k``, and -1
+            for the labels which aren't mapped, including a final entry which
+            is used for labels past the end of the table.
+        """
+        cache = getattr(self, '_mapping_cache', None)
+        if cache is not None and cache[0] == self.mapping_:
+            return cache[1]
+
+        mapping = dict(self.mapping_)
+        sorted_labels = sorted(mapping)
+        keys = np.array(sorted_labels)
+        if keys.ndim != 1:
+            # e.g. tuples, which shouldn't be unpacked into a 2d array
+            keys = np.empty(len(sorted_labels), dtype=object)
+            keys[:] = sorted_labels
+        values = np.array([mapping[k] for k in sorted_labels], dtype=np.intp)
+        labels = np.empty_like(keys)
+        labels[values] = keys
+
+        lut = None
+        if (keys.dtype.kind in 'iu' and len(keys) > 0 and keys[0] >= 0 and
+                keys[-1] < 4 * len(keys) + 1024):
+            lut = np.empty(keys[-1] + 2, dtype=np.intp)
+            lut.fill(-1)
+            lut[keys] = values
+
+        tables = (keys, values, labels, lut)
+        self._mapping_cache = (mapping, tables)
+        return tables
+
+    def _label_indices(self, y):
+        """Internal index of each label in the sequence `y`, with -1 for the
+        labels which aren't in ``mapping_``"""
+        keys, values, labels, lut = self._mapping_tables()
+        y = np.asarray(y)
+
+        if lut is not None and y.dtype.kind in 'iu':
+            end = len(lut) - 1
+            return lut[np.where((y >= 0) & (y < end), y, end)]
+
+        if len(keys) > 0 and y.dtype.kind != 'O':
+            try:
+                i = np.searchsorted(keys, y)
+                i[i == len(keys)] = 0
+                found = (keys[i] == y)
+            except TypeError:
+                # the labels can't be compared with y
+                found = None
+            if np.shape(found) == y.shape:
+                return np.where(found, values[i], -1)
+
+        f = np.vectorize(lambda k: self.mapping_.get(k, -1), otypes=[np.intp])
+        return f(y)
+
     def transform(self, sequences, mode='clip'):
         r"""Transform a list of sequences to internal indexing
 
@@ -64,20 +139,20 @@ class _MappingTransformMixin(TransformerMixin):
             raise ValueError('mode must be one of ["clip", "fill"]: %s' % mode)
         sequences = list_of_1d(sequences)
 
-        f = np.vectorize(lambda k: self.mapping_.get(k, np.nan),
-                         otypes=[np.float])
-
         result = []
         for y in sequences:
-            a = f(y)
+            a = self._label_indices(y)
+            missing = np.flatnonzero(a < 0)
             if mode == 'fill':
-                if np.all(np.mod(a, 1) == 0):
-                    result.append(a.astype(int))
-                else:
-                    result.append(a)
+                if len(missing) > 0:
+                    a = a.astype(np.float64)
+                    a[missing] = np.nan
+                result.append(a)
             elif mode == 'clip':
-                result.extend([a[s].astype(int) for s in
-                               np.ma.clump_unmasked(np.ma.masked_invalid(a))])
+                # the runs of mapped labels between the unmapped ones
+                starts = np.concatenate([[0], missing + 1])
+                ends = np.concatenate([missing, [len(a)]])
+                result.extend([a[s:e] for s, e in zip(starts, ends) if e > s])
             else:
                 raise RuntimeError()
 
@@ -100,21 +175,27 @@ class _MappingTransformMixin(TransformerMixin):
             of labels.
         """
         sequences = list_of_1d(sequences)
-        inverse_mapping = {v: k for k, v in self.mapping_.items()}
-        f = np.vectorize(inverse_mapping.get)
+        labels = self._mapping_tables()[2]
 
         result = []
         for y in sequences:
-            uq = np.unique(y)
-            if not np.all(np.logical_and(0 <= uq, uq < self.n_states_)):
+            y = np.asarray(y)
+            if len(y) > 0 and not (0 <= np.min(y) and
+                                   np.max(y) < self.n_states_):
                 raise ValueError('sequence must be between 0 and n_states-1')
+            if y.dtype.kind not in 'iu':
+                if not np.all(np.mod(y, 1) == 0):
+                    raise ValueError('sequence must be between 0 and '
+                                     'n_states-1')
+                y = y.astype(np.intp)
 
-            result.append(f(y))
+            result.append(labels[y])
         return result
 
 class _SampleMSMMixin(object):
     """Provides msm.sample() for drawing samples from continuous and discrete time MSMs."""
-    def sample_discrete(self, state=None, n_steps=100, random_state=None):
+    def sample_discrete(self, state=None, n_steps=100, random_state=None,
+                        n_trajs=None):
         r"""Generate a random sequence of states by propagating the model
         using discrete time steps given by the model lagtime.
 
@@ -140,29 +221,35 @@ class _SampleMSMMixin(object):
         random_state : int or RandomState instance or None (default)
             Pseudo Random Number generator seed control. If None, use the
             numpy.random singleton.
+        n_trajs : int, optional
+            If supplied, generate this many independent trajectories (which
+            are propagated in parallel), each with its own initial state
+            drawn as described for ``state``.
 
         Returns
         -------
         sequence : array of length n_steps
-            A randomly sampled label sequence
+            A randomly sampled label sequence. If ``n_trajs`` is supplied,
+            this is instead a list of ``n_trajs`` such sequences.
         """
         random = check_random_state(random_state)
-        r = random.rand(1 + n_steps)
+        n = 1 if n_trajs is None else n_trajs
+        r = random.rand(n)
 
         if state is None:
-            initial = np.sum(np.cumsum(self.populations_) < r[0])
+            initial = np.searchsorted(np.cumsum(self.populations_), r)
         elif hasattr(state, '__len__') and len(state) == self.n_states_:
-            initial = np.sum(np.cumsum(state) < r[0])
+            initial = np.searchsorted(np.cumsum(state), r)
         else:
-            initial = self.mapping_[state]
-
-        cstr = np.cumsum(self.transmat_, axis=1)
+            initial = np.repeat(self.mapping_[state], n)
+        # roundoff in the cumulative sum can leave r past the last state
+        initial = np.minimum(initial, self.n_states_ - 1)
 
-        chain = [initial]
-        for i in range(1, n_steps):
-            chain.append(np.sum(cstr[chain[i-1], :] < r[i]))
+        chains = _sample_discrete(self.transmat_, initial, n_steps, random)
 
-        return self.inverse_transform([chain])[0]
+        if n_trajs is None:
+            return self.inverse_transform(chains)[0]
+        return self.inverse_transform(chains)
 
     def draw_samples(self, sequences, n_samples, random_state=None):
         """Sample conformations from each state.
@@ -187,19 +274,13 @@ class _SampleMSMMixin(object):
         utils.map_drawn_samples : Extract conformations from MD trajectories by index.
 
         """
-        n_states = max(map(lambda x: max(x), sequences)) + 1
-        n_states_2 = len(np.unique(np.concatenate(sequences)))
+        labels = np.concatenate(sequences)
+        n_states = np.max(labels) + 1
+        n_states_2 = len(np.unique(labels))
         assert n_states == n_states_2, "Must have non-empty, zero-indexed, consecutive states: found %d states and %d unique states." % (n_states, n_states_2)
 
         random = check_random_state(random_state)
-
-        selected_pairs_by_state = []
-        for state in range(n_states):
-            all_frames = [np.where(a == state)[0] for a in sequences]
-            pairs = [(trj, frame) for (trj, frames) in enumerate(all_frames) for frame in frames]
-            selected_pairs_by_state.append([pairs[random.choice(len(pairs))] for i in range(n_samples)])
-
-        return np.array(selected_pairs_by_state)
+        return _draw_samples_by_state(sequences, n_states, n_samples, random)
 
 
 def _solve_ratemat_eigensystem(theta, k, n):
@@ -250,15 +331,22 @@ def _solve_ratemat_eigensystem(theta, k, n):
     return _normalize_eigensystem(u, lv, rv)
 
 
-def _solve_msm_eigensystem(transmat, k):
+def _solve_msm_eigensystem(transmat, k, populations=None):
     """Find the dominant eigenpairs of an MSM transition matrix
 
     Parameters
     ----------
-    transmat : np.ndarray, shape=(n_states, n_states)
-        The transition matrix
+    transmat : np.ndarray or sparse matrix, shape=(n_states, n_states)
+        The transition matrix. If it's a scipy.sparse matrix, the ``k``
+        eigenpairs are found iteratively with ARPACK, without forming a
+        dense matrix (unless ``k >= n_states - 1``).
     k : int
         The number of eigenpairs to find.
+    populations : np.ndarray, shape=(n_states,), optional
+        The stationary distribution of ``transmat``, if it is reversible.
+        For a sparse ``transmat``, the eigenpairs are then found from the
+        symmetric matrix :math:`D^{1/2} T D^{-1/2}`, with D the diagonal
+        matrix of the populations.
 
     Notes
     -----
@@ -281,6 +369,14 @@ def _solve_msm_eigensystem(transmat, k):
     rv :  np.ndarray, shape=(n_states, k)
         The normalized right eigenvectors (:math:`\psi`) of ``transmat``
     """
+    if issparse(transmat):
+        if k < transmat.shape[0] - 1:
+            if populations is not None:
+                return _solve_sparse_reversible_msm_eigensystem(
+                    transmat, k, populations)
+            return _solve_sparse_msm_eigensystem(transmat, k)
+        transmat = transmat.toarray()
+
     u, lv, rv = scipy.linalg.eig(transmat, left=True, right=True)
     order = np.argsort(-np.real(u))
     u = np.real_if_close(u[order[:k]])
@@ -289,6 +385,56 @@ def _solve_msm_eigensystem(transmat, k):
     return _normalize_eigensystem(u, lv, rv)
 
 
+def _solve_sparse_msm_eigensystem(transmat, k):
+    """Dominant eigenpairs of a sparse transition matrix, with ARPACK"""
+    transmat = csr_matrix(transmat)
+    u, rv = scipy.sparse.linalg.eigs(transmat, k=k, which='LR')
+    u_left, lv = scipy.sparse.linalg.eigs(transmat.T.tocsr(), k=k, which='LR')
+
+    # complex conjugate pairs are ordered consistently by their imaginary part
+    order = np.lexsort((np.imag(u), -np.real(u)))
+    order_left = np.lexsort((np.imag(u_left), -np.real(u_left)))
+    u = np.real_if_close(u[order])
+    lv = np.real_if_close(_fix_phase(lv[:, order_left]))
+    rv = np.real_if_close(_fix_phase(rv[:, order]))
+
+    # The two ARPACK runs return unrelated bases for the eigenspaces of
+    # degenerate eigenvalues, so make the left eigenvectors biorthogonal to
+    # the right ones. This only mixes left eigenvectors within each
+    # eigenspace, since those of distinct eigenvalues are already
+    # biorthogonal.
+    lv = lv.dot(np.linalg.inv(lv.T.dot(rv)).T)
+    return _normalize_eigensystem(u, lv, rv)
+
+
+def _solve_sparse_reversible_msm_eigensystem(transmat, k, populations):
+    """Dominant eigenpairs of a sparse reversible transition matrix, from
+    the symmetric eigenproblem for D^1/2 T D^-1/2, with ARPACK"""
+    sqrt_pi = np.sqrt(populations)
+    S = diags(sqrt_pi).dot(csr_matrix(transmat)).dot(diags(1 / sqrt_pi))
+    # symmetric, up to roundoff
+    S = (S + S.T) / 2
+
+    u, v = scipy.sparse.linalg.eigsh(S, k=k, which='LA')
+    order = np.argsort(-u)
+    u = u[order]
+    v = _fix_phase(v[:, order])
+
+    # the eigenvectors v are orthonormal, so lv = D^1/2 v and rv = D^-1/2 v
+    # are biorthonormal, including within degenerate eigenspaces
+    lv = sqrt_pi[:, np.newaxis] * v
+    rv = v / sqrt_pi[:, np.newaxis]
+    return _normalize_eigensystem(u, lv, rv)
+
+
+def _fix_phase(vectors):
+    """Rotate each (complex) eigenvector so that its largest element is real,
+    since ARPACK only determines them up to an arbitrary complex phase"""
+    largest = vectors[np.argmax(np.abs(vectors), axis=0),
+                      np.arange(vectors.shape[1])]
+    return vectors * (np.abs(largest) / largest)
+
+
 def _normalize_eigensystem(u, lv, rv):
     """Normalize the eigenvectors of a reversible Markov state model according
     to our preferred scheme.
@@ -308,7 +454,8 @@ def _normalize_eigensystem(u, lv, rv):
     return u, lv, rv
 
 
-def _strongly_connected_subgraph(counts, weight=1, verbose=True):
+def _strongly_connected_subgraph(counts, weight=1, verbose=True,
+                                 return_labels=False):
     """Trim a transition count matrix down to its maximal
     strongly ergodic subgraph.
 
@@ -320,14 +467,17 @@ def _strongly_connected_subgraph(counts, weight=1, verbose=True):
 
     Parameters
     ----------
-    counts : np.array, shape=(n_states_in, n_states_in)
-        Input set of directed counts.
+    counts : np.array or sparse matrix, shape=(n_states_in, n_states_in)
+        Input set of directed counts. If it's sparse, the trimmed counts
+        are returned as a CSR matrix.
     weight : float
         Threshold by which ergodicity is judged in the input data. Greater or
         equal to this many transition counts in both directions are required
         to include an edge in the ergodic subgraph.
     verbose : bool
         Print a short statement
+    return_labels : bool
+        Also return the strongly connected component of each input state.
 
     Returns
     -------
@@ -339,13 +489,27 @@ def _strongly_connected_subgraph(counts, weight=1, verbose=True):
         The semantics of ``mapping[i] = j`` is that state ``i`` from the
         "input space" for the counts matrix is represented by the index
         ``j`` in counts_component
+    labels : np.array, shape=(n_states_in,)
+        Only returned if ``return_labels`` is True. The index of the
+        strongly connected component containing each input state.
     """
     n_states_input = counts.shape[0]
-    n_components, component_assignments = csgraph.connected_components(
-        csr_matrix(counts >= weight), connection="strong")
-    populations = np.array(counts.sum(0)).flatten()
-    component_pops = np.array([populations[component_assignments == i].sum() for
-                               i in range(n_components)])
+    if weight <= 0:
+        # every pair of states is connected
+        n_components = min(n_states_input, 1)
+        component_assignments = np.zeros(n_states_input, dtype=np.int32)
+    else:
+        if issparse(counts):
+            graph = csr_matrix(counts, copy=True)
+            graph.data = graph.data >= weight
+            graph.eliminate_zeros()
+        else:
+            graph = csr_matrix(counts >= weight)
+        n_components, component_assignments = csgraph.connected_components(
+            graph, connection="strong")
+    populations = np.array(counts.sum(0), dtype=float).flatten()
+    component_pops = np.bincount(component_assignments, weights=populations,
+                                 minlength=n_components)
     which_component = component_pops.argmax()
 
     def cpop(which):
@@ -360,23 +524,47 @@ def _strongly_connected_subgraph(counts, weight=1, verbose=True):
 
 
     # keys are all of the "input states" which have a valid mapping to the output.
-    keys = np.arange(n_states_input)[component_assignments == which_component]
+    keys = np.flatnonzero(component_assignments == which_component)
 
-    if n_components == n_states_input and counts[np.ix_(keys, keys)] == 0:
+    if n_components == n_states_input and counts.diagonal()[keys[0]] == 0:
         # if we have a completely disconnected graph with no self-transitions
-        return np.zeros((0, 0)), {}
+        if issparse(counts):
+            trimmed_counts, mapping = csr_matrix((0, 0)), {}
+        else:
+            trimmed_counts, mapping = np.zeros((0, 0)), {}
+        if return_labels:
+            return trimmed_counts, mapping, component_assignments
+        return trimmed_counts, mapping
 
     # values are the "output" state that these guys are mapped to
     values = np.arange(len(keys))
     mapping = dict(zip(keys, values))
     n_states_output = len(mapping)
 
-    trimmed_counts = np.zeros((n_states_output, n_states_output), dtype=counts.dtype)
-    trimmed_counts[np.ix_(values, values)] = counts[np.ix_(keys, keys)]
+    if issparse(counts):
+        # keep the entries whose row and column are both in the component
+        coo = coo_matrix(counts)
+        output_index = np.empty(n_states_input, dtype=np.intp)
+        output_index.fill(-1)
+        output_index[keys] = values
+        row = output_index[coo.row]
+        col = output_index[coo.col]
+        keep = (row >= 0) & (col >= 0)
+        trimmed_counts = csr_matrix(
+            (coo.data[keep], (row[keep], col[keep])),
+            shape=(n_states_output, n_states_output))
+    elif n_states_output == n_states_input:
+        trimmed_counts = counts.copy()
+    else:
+        trimmed_counts = counts[np.ix_(keys, keys)]
+
+    if return_labels:
+        return trimmed_counts, mapping, component_assignments
     return trimmed_counts, mapping
 
 
-def _transition_counts(sequences, lag_time=1, sliding_window=True):
+def _transition_counts(sequences, lag_time=1, sliding_window=True,
+                       sparse=False):
     """Count the number of directed transitions in a collection of sequences
     in a discrete space.
 
@@ -393,10 +581,13 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
         ``N = lag_time`` strided sequences starting from index
          0, 1, 2, ..., ``lag_time - 1``. The total, raw counts will
          be divided by ``N``. When this is False, only start from index 0.
+    sparse : bool
+        Return the counts as a ``scipy.sparse.csr_matrix``. The dense
+        (n_states, n_states) matrix is never formed.
 
     Returns
     -------
-    counts : array, shape=(n_states, n_states)
+    counts : array or csr_matrix, shape=(n_states, n_states)
         ``counts[i][j]`` counts the number of times a sequences was in state
         `i` at time t, and state `j` at time `t+self.lag_time`, over the
         full set of trajectories.
@@ -430,7 +621,14 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
     be counted. The mapping return value will not include the NaN or None.
     """
     if (not sliding_window) and lag_time > 1:
-        return _transition_counts([X[::lag_time] for X in sequences], lag_time=1)
+        return _transition_counts([X[::lag_time] for X in sequences],
+                                  lag_time=1, sparse=sparse)
+
+    if len(sequences) > 0:
+        arrays = [np.asarray(y) for y in sequences]
+        if all(y.ndim == 1 and y.dtype.kind in 'iu' for y in arrays):
+            if all(len(y) == 0 or y.min() >= 0 for y in arrays):
+                return _integer_transition_counts(arrays, lag_time, sparse)
 
     classes = np.unique(np.concatenate(sequences))
     contains_nan = (classes.dtype.kind == 'f') and np.any(np.isnan(classes))
@@ -449,7 +647,6 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
     none_to_nan = np.vectorize(lambda x: np.nan if x is None else x,
                                otypes=[np.float])
 
-    counts = np.zeros((n_states, n_states), dtype=float)
     _transitions = []
 
     for y in sequences:
@@ -476,7 +673,10 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
     transitions = np.hstack(_transitions)
     C = coo_matrix((np.ones(transitions.shape[1], dtype=int), transitions),
         shape=(n_states, n_states))
-    counts = counts + np.asarray(C.todense())
+    if sparse:
+        counts = C.tocsr().astype(float)
+    else:
+        counts = np.asarray(C.todense(), dtype=float)
 
     # If sliding window is False, this function will be called recursively
     # with strided trajectories and lag_time = 1, which gives the desired
@@ -489,6 +689,283 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
     return counts, mapping
 
 
+def _multi_lag_transition_counts(sequences, lag_times, sliding_window=True,
+                                 sparse=False):
+    """Count the number of directed transitions in a collection of sequences,
+    at several lag times.
+
+    This is equivalent to calling ``_transition_counts`` at each lag time,
+    but the labels are only mapped onto the states once, and the counts at
+    all of the lag times are accumulated in a single pass over the data.
+
+    Parameters
+    ----------
+    sequences : list of array-like
+        List of sequences. Each sequence should be a 1D iterable of state
+        labels. Labels can be integers, strings, or other orderable objects.
+    lag_times : list of int
+        The time (index) delays for the counts.
+    sliding_window : bool
+        Whether to count transitions with a sliding window. See
+        ``_transition_counts``.
+    sparse : bool
+        Return the counts as ``scipy.sparse.csr_matrix``.
+
+    Returns
+    -------
+    counts : list of arrays or csr_matrix, shape=(n_states, n_states)
+        The counts at each of the lag times, in the order of ``lag_times``.
+    mappings : list of dict
+        Mapping from the items in the sequences to the indices in
+        ``(0, n_states-1)`` used for each count matrix. These are all the
+        same, unless ``sliding_window=False``: then only the labels in the
+        subsampled sequences are included.
+    """
+    lag_times = [int(lag_time) for lag_time in lag_times]
+    sequences, mapping = _map_labels(sequences)
+    n_states = len(mapping)
+    # NaN and None are mapped to -1
+    missing = any(len(y) > 0 and y.min() < 0 for y in sequences)
+
+    counters = [_TransitionCounter(n_states, sparse, missing)
+                for _ in lag_times]
+    # the states which occur in the subsampled sequences, without a
+    # sliding window
+    present = [np.zeros(n_states, dtype=bool) for _ in lag_times]
+    for y in sequences:
+        for i, lag_time in enumerate(lag_times):
+            if sliding_window:
+                counters[i].add_sequence(y, lag_time)
+            else:
+                counters[i].add_sequence(y, lag_time, step=lag_time)
+                subsampled = y[::lag_time]
+                present[i][subsampled[subsampled >= 0]] = True
+
+    labels = sorted(mapping, key=mapping.get)
+    all_counts, mappings = [], []
+    for i, lag_time in enumerate(lag_times):
+        counts = counters[i].counts().astype(float)
+        if sliding_window:
+            counts /= float(lag_time)
+            all_counts.append(counts)
+            mappings.append(mapping)
+            continue
+
+        states = np.flatnonzero(present[i])
+        if len(states) < n_states:
+            if sparse:
+                counts = counts[states][:, states]
+            else:
+                counts = counts[np.ix_(states, states)]
+        all_counts.append(counts)
+        mappings.append(dict(zip([labels[j] for j in states],
+                                 range(len(states)))))
+    return all_counts, mappings
+
+
+def _map_labels(sequences):
+    """Map the labels in sequences onto ``range(n_states)``
+
+    Returns
+    -------
+    sequences : list of int arrays
+        The state of each frame, or -1 for the invalid labels (NaN or None).
+    mapping : dict
+        Mapping from the labels to the states
+    """
+    arrays = [np.asarray(y) for y in sequences]
+    if len(arrays) > 0 and all(y.ndim == 1 and y.dtype.kind in 'iu' and
+                               (len(y) == 0 or y.min() >= 0) for y in arrays):
+        arrays, classes = _map_integer_labels(arrays)
+        return arrays, dict(zip(classes, range(len(classes))))
+
+    classes = np.unique(np.concatenate(arrays))
+    if classes.dtype.kind == 'f':
+        classes = classes[~np.isnan(classes)]
+    if any(c is None for c in classes):
+        classes = np.array([c for c in classes if c is not None])
+    mapping = dict(zip(classes, range(len(classes))))
+
+    if any(y.dtype.kind == 'O' for y in arrays) or len(classes) == 0:
+        mapping_fn = np.vectorize(lambda x: mapping.get(x, -1),
+                                  otypes=[np.intp])
+        return [mapping_fn(y) if len(y) > 0 else np.zeros(0, dtype=np.intp)
+                for y in arrays], mapping
+
+    result = []
+    for y in arrays:
+        states = np.minimum(np.searchsorted(classes, y), len(classes) - 1)
+        states[classes[states] != y] = -1
+        result.append(states)
+    return result, mapping
+
+
+def _map_integer_labels(sequences):
+    """Map sequences of non-negative ints onto ``range(n_states)``
+
+    Returns
+    -------
+    sequences : list of int arrays
+    classes : array, shape=(n_states,)
+        The label of each state, in increasing order
+    """
+    n_labels = 1 + max(y.max() if len(y) > 0 else -1 for y in sequences)
+    n_frames = sum(len(y) for y in sequences)
+    if n_labels <= 4 * n_frames:
+        present = np.zeros(n_labels, dtype=bool)
+        for y in sequences:
+            present[y] = True
+        classes = np.flatnonzero(present)
+        lookup = np.cumsum(present, dtype=np.intp) - 1
+        return [lookup[y] for y in sequences], classes
+
+    classes = np.unique(np.concatenate(sequences))
+    return [np.searchsorted(classes, y) for y in sequences], classes
+
+
+def _integer_transition_counts(sequences, lag_time=1, sparse=False):
+    """Fast path of _transition_counts, for sequences of non-negative ints
+
+    Each transition i -> j is encoded as the integer ``i*n_states + j`` and
+    counted with ``np.bincount`` (or ``np.unique``, for sparse counts). If
+    the labels are reasonably dense, dense counts are computed directly on
+    the labels, and the labels which never occur are dropped afterwards.
+    Otherwise the labels are first mapped onto ``range(n_states)``.
+    """
+    n_labels = 1 + max(y.max() if len(y) > 0 else -1 for y in sequences)
+    n_frames = sum(len(y) for y in sequences)
+
+    if not sparse and n_labels ** 2 <= max(4 * n_frames, _COUNTS_CHUNK_SIZE):
+        counts = _bincount_transitions(sequences, lag_time, n_labels)
+        present = (counts.sum(axis=0) > 0) | (counts.sum(axis=1) > 0)
+        for y in sequences:
+            # in short sequences, some frames have no transitions at all
+            if len(y) < 2 * lag_time:
+                present[y] = True
+        classes = np.flatnonzero(present)
+        if len(classes) < n_labels:
+            counts = counts[np.ix_(classes, classes)]
+    else:
+        sequences, classes = _map_integer_labels(sequences)
+        if sparse:
+            counts = _sparse_transitions(sequences, lag_time, len(classes))
+        else:
+            counts = _bincount_transitions(sequences, lag_time, len(classes))
+
+    mapping = dict(zip(classes, range(len(classes))))
+    counts = counts.astype(float)
+    counts /= float(lag_time)
+    return counts, mapping
+
+
+def _bincount_transitions(sequences, lag_time, n_states):
+    """Count the transitions in sequences of ints in range(n_states)"""
+    counter = _TransitionCounter(n_states)
+    for y in sequences:
+        counter.add_sequence(y, lag_time)
+    return counter.counts()
+
+
+def _sparse_transitions(sequences, lag_time, n_states):
+    """Count the transitions in sequences of ints in range(n_states), as a
+    sparse matrix"""
+    counter = _TransitionCounter(n_states, sparse=True)
+    for y in sequences:
+        counter.add_sequence(y, lag_time)
+    return counter.counts()
+
+
+class _TransitionCounter(object):
+    """Accumulate the transitions in sequences of ints in range(n_states)
+
+    Each transition i -> j is encoded as the integer ``i*n_states + j``.
+    The codes are buffered, and counted about ``_COUNTS_CHUNK_SIZE`` at a
+    time, with ``np.bincount`` into a dense (n_states*n_states) array, or
+    with ``np.unique`` into a sorted list of (code, count) pairs for sparse
+    counts.
+
+    Parameters
+    ----------
+    n_states : int
+    sparse : bool
+        Accumulate sparse counts.
+    missing : bool
+        Whether the sequences contain missing data (negative labels). The
+        transitions from or to missing data are not counted.
+    """
+
+    def __init__(self, n_states, sparse=False, missing=False):
+        self.n_states = n_states
+        self.sparse = sparse
+        self.missing = missing
+        if sparse:
+            self.chunk_size = _COUNTS_CHUNK_SIZE
+            self._codes, self._counts = [], []
+            self._n_codes, self._n_merged = 0, 0
+        else:
+            # each call to bincount is O(n_states**2), so the transitions
+            # from several (short) sequences are counted together
+            self.chunk_size = max(_COUNTS_CHUNK_SIZE, n_states * n_states)
+            self._counts = np.zeros(n_states * n_states, dtype=np.int64)
+        self._buffer, self._n_buffer = [], 0
+
+    def add_sequence(self, y, lag_time, step=1):
+        """Add the transitions from y[t] to y[t+lag_time], for every
+        ``step``-th frame t"""
+        n_from = len(y) - lag_time
+        for start in range(0, n_from, self.chunk_size * step):
+            end = min(start + self.chunk_size * step, n_from)
+            from_states = y[start:end:step]
+            to_states = y[start + lag_time:end + lag_time:step]
+            codes = from_states.astype(np.int64)
+            codes *= self.n_states
+            codes += to_states
+            if self.missing:
+                codes = codes[(from_states >= 0) & (to_states >= 0)]
+            self._buffer.append(codes)
+            self._n_buffer += len(codes)
+            if self._n_buffer >= self.chunk_size:
+                self._flush()
+
+    def counts(self):
+        """The (integer) counts, as an array or a csr_matrix"""
+        self._flush()
+        n_states = self.n_states
+        if not self.sparse:
+            return self._counts.reshape(n_states, n_states)
+        self._merge()
+        codes, counts = self._codes[0], self._counts[0]
+        return csr_matrix((counts, (codes // n_states, codes % n_states)),
+                          shape=(n_states, n_states))
+
+    def _flush(self):
+        if self._n_buffer == 0:
+            return
+        codes = np.concatenate(self._buffer)
+        self._buffer, self._n_buffer = [], 0
+        if not self.sparse:
+            self._counts += np.bincount(
+                codes, minlength=self.n_states * self.n_states)
+            return
+
+        codes, counts = np.unique(codes, return_counts=True)
+        self._codes.append(codes)
+        self._counts.append(counts)
+        self._n_codes += len(codes)
+        if self._n_codes > max(4 * _COUNTS_CHUNK_SIZE, 2 * self._n_merged):
+            self._merge()
+
+    def _merge(self):
+        if len(self._codes) == 0:
+            codes = counts = np.zeros(0, dtype=np.int64)
+        else:
+            codes, inverse = np.unique(np.concatenate(self._codes),
+                                       return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate(self._counts))
+        self._codes, self._counts = [codes], [counts.astype(np.int64)]
+        self._n_codes = self._n_merged = len(codes)
+
+
 def _dict_compose(dict1, dict2):
     """
     Example
@@ -5,8 +5,10 @@
 
 
 import numpy as np
-from ..utils import param_sweep
+from sklearn import clone
+from ..utils import param_sweep, list_of_1d
 from . import MarkovStateModel
+from .core import _multi_lag_transition_counts
 
 
 def implied_timescales(sequences, lag_times, n_timescales=10,
@@ -31,7 +33,9 @@ def implied_timescales(sequences, lag_times, n_timescales=10,
         parameters (as implemented by msmbuilder.msm.MarkovStateModel)
         will be used.
     n_jobs : int, optional
-        Number of jobs to run in parallel
+        Number of jobs to run in parallel. This is only used for
+        subclasses of MarkovStateModel, which are fit separately at
+        each lag time with ``param_sweep``.
 
     Returns
     -------
@@ -43,10 +47,59 @@ def implied_timescales(sequences, lag_times, n_timescales=10,
     if msm is None:
         msm = MarkovStateModel()
 
-    param_grid = {'lag_time' : lag_times}
-    models = param_sweep(msm, sequences, param_grid, n_jobs=n_jobs,
-                         verbose=verbose)
-    timescales = [m.timescales_ for m in models]
+    if type(msm) is MarkovStateModel:
+        models = fit_lag_times(msm, sequences, lag_times)
+        timescales = [m.timescales_ for m in models]
+    else:
+        param_grid = {'lag_time' : lag_times}
+        timescales = param_sweep(msm, sequences, param_grid, n_jobs=n_jobs,
+                                 verbose=verbose, attributes='timescales_')
     n_timescales = min(n_timescales, min(len(ts) for ts in timescales))
     timescales = np.array([ts[:n_timescales] for ts in timescales])
     return timescales
+
+
+def fit_lag_times(msm, sequences, lag_times):
+    """Fit a MarkovStateModel at each of several lag times.
+
+    This gives the same models as ``param_sweep(msm, sequences,
+    {'lag_time': lag_times})``, but the sequences are only validated and
+    mapped onto the states once, and the transitions at all of the lag
+    times are counted in a single pass over the data. The models are fit
+    in order of increasing lag time, and the reversible maximum likelihood
+    estimate at each lag time starts from the solution at the previous one.
+
+    Parameters
+    ----------
+    msm : msmbuilder.msm.MarkovStateModel
+        Instance of an MSM to specify parameters other than the lag time.
+    sequences : list of array-like
+        List of sequences, or a single sequence. Each sequence should be a
+        1D iterable of state labels. Labels can be integers, strings, or
+        other orderable objects.
+    lag_times : array-like
+        Lag times at which to fit the models.
+
+    Returns
+    -------
+    models : list of MarkovStateModel
+        The fit models, in the order of ``lag_times``.
+    """
+    lag_times = [int(lag_time) for lag_time in lag_times]
+    if any(lag_time <= 0 for lag_time in lag_times):
+        raise ValueError('Invalid lag_times: %s' % lag_times)
+    if msm.sparse and msm.prior_counts != 0:
+        raise ValueError('prior_counts must be 0 with sparse=True')
+
+    sequences = list_of_1d(sequences)
+    all_counts, mappings = _multi_lag_transition_counts(
+        sequences, lag_times, sliding_window=msm.sliding_window,
+        sparse=msm.sparse)
+
+    models = [None] * len(lag_times)
+    previous = None
+    for i in np.argsort(lag_times, kind='mergesort'):
+        model = clone(msm).set_params(lag_time=lag_times[i])
+        model._fit_counts(all_counts[i], dict(mappings[i]), init=previous)
+        models[i] = previous = model
+    return models
@@ -14,11 +14,13 @@ import warnings
 import operator
 import numpy as np
 import scipy.linalg
+import scipy.sparse.linalg
+from scipy.sparse import coo_matrix, diags, issparse
 
 from sklearn.utils import check_random_state
 from ..utils import list_of_1d
 from ..base import BaseEstimator
-from ._markovstatemodel import _transmat_mle_prinz
+from ._markovstatemodel import _transmat_mle_prinz, _transmat_mle_prinz_sparse
 from .core import (_MappingTransformMixin, _dict_compose,
                    _strongly_connected_subgraph, _transition_counts,
                    _solve_msm_eigensystem, _SampleMSMMixin)
@@ -74,6 +76,14 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         contain more data but cannot be assumed to be statistically
         independent. Otherwise, the sequences are simply subsampled at an
         interval of ``lag_time``.
+    sparse : bool, default=False
+        Store ``countsmat_`` and ``transmat_`` as ``scipy.sparse.csr_matrix``,
+        which is useful for models with many (e.g. more than 10^4) states,
+        where the dense matrices would not fit in memory. The counts are
+        accumulated without ever forming the dense matrix, and the eigenvalues
+        and eigenvectors are computed iteratively (with ARPACK), so
+        ``n_timescales`` should be small compared to the number of states.
+        Requires ``prior_counts=0``.
     verbose : bool
         Enable verbose printout
 
@@ -99,22 +109,24 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         Number of transition counts between states. countsmat_[i, j] is counted
         during `fit()`. The indices `i` and `j` are the "internal" indices
         described above. No correction for reversibility is made to this
-        matrix.
+        matrix. A ``csr_matrix`` if ``sparse=True``.
     transmat_ : array_like, shape = (n_states_, n_states_)
         Maximum likelihood estimate of the reversible transition matrix.
         The indices `i` and `j` are the "internal" indices described above.
+        A ``csr_matrix`` if ``sparse=True``.
     populations_ : array, shape = (n_states_,)
         The equilibrium population (stationary eigenvector) of transmat_
     """
 
     def __init__(self, lag_time=1, n_timescales=10, reversible_type='mle',
                  ergodic_cutoff='on', prior_counts=0, sliding_window=True,
-                 verbose=True):
+                 sparse=False, verbose=True):
         self.reversible_type = reversible_type
         self.lag_time = lag_time
         self.n_timescales = n_timescales
         self.prior_counts = prior_counts
         self.sliding_window = sliding_window
+        self.sparse = sparse
         self.verbose = verbose
         if isinstance(ergodic_cutoff, str) and ergodic_cutoff.lower() == 'on':
             if sliding_window:
@@ -163,9 +175,27 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         # step 1. count the number of transitions
         if int(self.lag_time) <= 0:
             raise ValueError('Invalid lag_time: %s' % self.lag_time)
+        if self.sparse and self.prior_counts != 0:
+            raise ValueError('prior_counts must be 0 with sparse=True')
         raw_counts, mapping = _transition_counts(
-            sequences, int(self.lag_time), sliding_window=self.sliding_window)
+            sequences, int(self.lag_time), sliding_window=self.sliding_window,
+            sparse=self.sparse)
+        return self._fit_counts(raw_counts, mapping)
 
+    def _fit_counts(self, raw_counts, mapping, init=None):
+        """Estimate the model from the raw transition counts
+
+        Parameters
+        ----------
+        raw_counts : array or sparse matrix, shape=(n_states, n_states)
+            The counts, as returned by ``_transition_counts``.
+        mapping : dict
+            Mapping from the labels to the indices in raw_counts.
+        init : MarkovStateModel, optional
+            A model fit to similar data (e.g. at a neighbouring lag time).
+            If it has the same states after ergodic trimming, its
+            transition matrix is the starting point for the reversible MLE.
+        """
         if self.ergodic_cutoff > 0:
             # step 2. restrict the counts to the maximal strongly ergodic
             # subgraph
@@ -191,7 +221,11 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
             # pull out the appropriate method
             fit_method = fit_method_map[str(self.reversible_type).lower()]
             # step 3. estimate transition matrix
-            self.transmat_, self.populations_ = fit_method(self.countsmat_)
+            if fit_method == self._fit_mle:
+                self.transmat_, self.populations_ = fit_method(
+                    self.countsmat_, init=init)
+            else:
+                self.transmat_, self.populations_ = fit_method(self.countsmat_)
         except KeyError:
             raise ValueError('reversible_type must be one of %s: %s' % (
                 ', '.join(fit_method_map.keys()), self.reversible_type))
@@ -199,16 +233,33 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         self._is_dirty = True
         return self
 
-    def _fit_mle(self, counts):
+    def _fit_mle(self, counts, init=None):
         if self.ergodic_cutoff <= 0 and self.prior_counts == 0:
             warnings.warn("reversible_type='mle' and ergodic_cutoff <= 0 "
                           "are not generally compatible")
 
+        X0 = None
+        if (init is not None and init.mapping_ == self.mapping_ and
+                str(init.reversible_type).lower() == 'mle'):
+            # the solution for init, X = diag(pi) T, scaled like the counts
+            X0 = diags(init.populations_ * counts.sum()).dot(init.transmat_)
+
+        if issparse(counts):
+            return _transmat_mle_prinz_sparse(counts, X0=X0)
+
         transmat, populations = _transmat_mle_prinz(
-            counts + self.prior_counts)
+            counts + self.prior_counts, X0=X0)
         return transmat, populations
 
     def _fit_transpose(self, counts):
+        if issparse(counts):
+            rev_counts = 0.5 * (counts + counts.T)
+            populations = np.asarray(rev_counts.sum(axis=0)).ravel()
+            populations /= populations.sum(dtype=float)
+            row_sums = np.asarray(rev_counts.sum(axis=1)).ravel()
+            transmat = diags(1.0 / row_sums).dot(rev_counts).tocsr()
+            return transmat, populations
+
         rev_counts = 0.5 * (counts + counts.T) + self.prior_counts
 
         populations = rev_counts.sum(axis=0)
@@ -217,6 +268,18 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         return transmat, populations
 
     def _fit_asymetric(self, counts):
+        if issparse(counts):
+            row_sums = np.asarray(counts.sum(axis=1)).ravel()
+            transmat = diags(1.0 / row_sums).dot(counts).tocsr()
+            if transmat.shape[0] < 3:
+                u, lv = scipy.linalg.eig(transmat.toarray(), left=True,
+                                         right=False)
+            else:
+                u, lv = scipy.sparse.linalg.eigs(transmat.T, k=1, which='LR')
+            populations = lv[:, np.argmax(np.real(u))]
+            populations = np.real(populations / populations.sum())
+            return transmat, populations
+
         rc = counts + self.prior_counts
         transmat = rc.astype(float) / rc.sum(axis=1)[:, None]
 
@@ -323,7 +386,7 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
             :math:`\sum_{ij} C_{ij} \log(P_{ij})`
             where C is a matrix of counts computed from the input sequences.
         """
-        counts, mapping = _transition_counts(sequences)
+        counts, mapping = _transition_counts(sequences, sparse=self.sparse)
         if not set(self.mapping_.keys()).issuperset(mapping.keys()):
             return -np.inf
         inverse_mapping = {v: k for k, v in mapping.items()}
@@ -332,6 +395,14 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
         m2 = _dict_compose(inverse_mapping, self.mapping_)
         indices = [e[1] for e in sorted(m2.items())]
 
+        if issparse(self.transmat_):
+            counts = coo_matrix(counts)
+            transmat_slice = self.transmat_[indices][:, indices]
+            with np.errstate(divide='ignore'):
+                log_transmat = np.log(np.asarray(
+                    transmat_slice[counts.row, counts.col]).ravel())
+            return np.sum(log_transmat * counts.data)
+
         transmat_slice = self.transmat_[np.ix_(indices, indices)]
         return np.nansum(np.log(transmat_slice) * counts)
 
@@ -346,7 +417,10 @@ class MarkovStateModel(BaseEstimator, _MappingTransformMixin, _SampleMSMMixin):
             n_timescales = self.n_states_ - 1
 
         k = n_timescales + 1
-        u, lv, rv = _solve_msm_eigensystem(self.transmat_, k)
+        populations = None
+        if self.reversible_type is not None:
+            populations = self.populations_
+        u, lv, rv = _solve_msm_eigensystem(self.transmat_, k, populations)
         self._eigenvalues = u
         self._left_eigenvectors = lv
         self._right_eigenvectors = rv
@@ -383,8 +457,11 @@ Total transition counts / lag_time:
 Timescales:
     [{ts}]  units
 '''
-        counts_nz = np.count_nonzero(self.countsmat_)
-        cnz = self.countsmat_[np.nonzero(self.countsmat_)]
+        if issparse(self.countsmat_):
+            cnz = self.countsmat_.data[np.nonzero(self.countsmat_.data)]
+        else:
+            cnz = self.countsmat_[np.nonzero(self.countsmat_)]
+        counts_nz = len(cnz)
 
         return doc.format(
             lag_time=self.lag_time,
@@ -393,7 +470,7 @@ Timescales:
             prior_counts=self.prior_counts,
             n_states=self.n_states_,
             counts_nz=counts_nz,
-            percent_counts_nz=(100 * counts_nz / self.countsmat_.size),
+            percent_counts_nz=(100 * counts_nz / self.n_states_ ** 2),
             cnz_min=np.min(cnz),
             cnz_1st=np.percentile(cnz, 25),
             cnz_med=np.percentile(cnz, 50),
@@ -452,12 +529,14 @@ Timescales:
             # into the m2 space
 
         # How well do they diagonalize S and C, which are
-        # computed from the new test data?
-        S = np.diag(m2.populations_)
-        C = S.dot(m2.transmat_)
+        # computed from the new test data? S = diag(populations) and
+        # C = S.dot(transmat) are only ever applied to V
+        populations = m2.populations_[:, np.newaxis]
+        SV = populations * V
+        CV = populations * m2.transmat_.dot(V)
 
         try:
-            trace = np.trace(V.T.dot(C.dot(V)).dot(np.linalg.inv(V.T.dot(S.dot(V)))))
+            trace = np.trace(V.T.dot(CV).dot(np.linalg.inv(V.T.dot(SV))))
         except np.linalg.LinAlgError:
             trace = np.nan
 
@@ -572,20 +651,28 @@ Timescales:
         if self.reversible_type is None:
             raise NotImplementedError('reversible_type must be "mle" or "transpose"')
 
-        n_timescales = min(self.n_timescales, self.n_states_ - 1)
+        n_timescales = self.n_timescales
         if n_timescales is None:
             n_timescales = self.n_states_ - 1
+        n_timescales = min(n_timescales, self.n_states_ - 1)
         u, lv, rv = self._get_eigensystem()
-
-        sigma2 = np.zeros(n_timescales + 1)
-        for k in range(n_timescales + 1):
-            dLambda_dT = np.outer(lv[:, k], rv[:, k])
-            for i in range(self.n_states_):
-                ui = self.countsmat_[:, i]
-                wi = np.sum(ui)
-                cov = wi*np.diag(ui) - np.outer(ui, ui)
-                quad_form = dLambda_dT[i].dot(cov).dot(dLambda_dT[i])
-                sigma2[k] += quad_form / (wi**2*(wi+1))
+        lv = lv[:, :n_timescales + 1]
+        rv = rv[:, :n_timescales + 1]
+
+        # With d = lv[i, k] * rv[:, k] (the derivative of eigenvalue k with
+        # respect to row i of transmat_) and u_i = countsmat_[:, i], the
+        # quadratic form d^T (w_i diag(u_i) - u_i u_i^T) d is
+        # lv[i, k]^2 (w_i u_i.rv[:, k]^2 - (u_i.rv[:, k])^2), so it can be
+        # computed for all i and k without forming the covariance matrices.
+        # The covariance matrices are positive semidefinite, so negative
+        # values can only come from roundoff (e.g. for the stationary
+        # eigenvalue, whose right eigenvector is constant) and are clipped.
+        counts = self.countsmat_
+        w = np.asarray(counts.sum(axis=0), dtype=float).ravel()
+        u_rv2 = np.asarray(counts.T.dot(rv**2))
+        u_rv = np.asarray(counts.T.dot(rv))
+        quad_form = lv**2 * np.maximum(w[:, np.newaxis]*u_rv2 - u_rv**2, 0)
+        sigma2 = np.sum(quad_form / (w**2*(w+1))[:, np.newaxis], axis=0)
         return np.sqrt(sigma2)
 
     def uncertainty_timescales(self):
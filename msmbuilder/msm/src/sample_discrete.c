@@ -0,0 +1,77 @@
+#include <stdlib.h>
+#include "sample_discrete.h"
+
+/**
+ * Propagate a set of Markov chains by `n_steps` steps, given the cumulative
+ * transition probabilities of each row of a transition matrix in CSR format.
+ *
+ * The next state is found by a binary search for the first entry of
+ * the current state's row whose cumulative probability is >= the uniform
+ * random number for the step (which gives the same state as counting the
+ * entries of the cumulative row that are < the random number). The chains
+ * are propagated in parallel.
+ *
+ * Parameters
+ * ----------
+ * indptr : (input) pointer to 1d array of shape=(n_states+1,)
+ *     Row pointers of the transition matrix, in CSR format.
+ * indices : (input) pointer to 1d array of shape=(nnz,)
+ *     Column indices of the nonzero entries of the transition matrix.
+ * cumprob : (input) pointer to 1d array of shape=(nnz,)
+ *     Cumulative sum, along each row, of the nonzero transition
+ *     probabilities.
+ * n_trajs : (input) int
+ *     Number of chains.
+ * n_steps : (input) int
+ *     Number of steps to take in each chain.
+ * r : (input) pointer to 2d array of shape=(n_trajs, n_steps)
+ *     Uniform random numbers in [0, 1), one for each step.
+ * chain : (input/output) pointer to the first step of the first chain
+ *     The states of chain i are written to chain[i*stride + 0], ...,
+ *     chain[i*stride + n_steps-1]. The current state of chain i is read
+ *     from chain[i*stride - 1].
+ * stride : (input) long
+ *     Distance between the starts of consecutive chains in `chain`.
+ *
+ * Returns
+ * -------
+ * status : int
+ *     0 on success, and -1 if a chain reached a state with no outgoing
+ *     transitions.
+ */
+int sample_discrete(const int* indptr, const int* indices,
+                    const double* cumprob, int n_trajs, int n_steps,
+                    const double* r, int* chain, long stride)
+{
+    int i, status = 0;
+
+    #ifdef _OPENMP
+    #pragma omp parallel for
+    #endif
+    for (i = 0; i < n_trajs; i++) {
+        int s, lo, hi, mid;
+        int* c = chain + i * stride;
+        const double* ri = r + (long) i * n_steps;
+
+        for (s = 0; s < n_steps; s++) {
+            lo = indptr[c[s-1]];
+            hi = indptr[c[s-1]+1] - 1;
+            if (hi < lo) {
+                status = -1;
+                break;
+            }
+            /* first k in [lo, hi] with cumprob[k] >= r, or hi if the
+               row sums to slightly less than r due to roundoff */
+            while (lo < hi) {
+                mid = lo + (hi - lo) / 2;
+                if (cumprob[mid] < ri[s])
+                    lo = mid + 1;
+                else
+                    hi = mid;
+            }
+            c[s] = indices[lo];
+        }
+    }
+
+    return status;
+}
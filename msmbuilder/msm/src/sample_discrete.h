@@ -0,0 +1,15 @@
+#ifndef SAMPLE_DISCRETE_H
+#define SAMPLE_DISCRETE_H
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+int sample_discrete(const int* indptr, const int* indices,
+                    const double* cumprob, int n_trajs, int n_steps,
+                    const double* r, int* chain, long stride);
+#ifdef __cplusplus
+}
+#endif
+
+#endif
@@ -19,6 +19,10 @@
  * tol : (input) float
  *     Convergence tolerance. The algorithm will iterate until the
  *     change in the log-likelihood is les than `tol`.
+ * X0 : (input) pointer to a dense 2d array of shape=(n_states, n_states)
+ *     Symmetric initial guess for the matrix X, e.g. from the solution at a
+ *     neighbouring lag time (any multiple of diag(pi) T). If NULL, the
+ *     iteration starts from C + C^T.
  * T : (output) pointer to output 2d array of shape=(n_states, n_states)
  *     The output transition matrix will be written to `T`.
  * pi : (output) pointer to output 1d array of shape=(n_states,)
@@ -38,7 +42,7 @@
  *    Generation and validation." J Chem. Phys. 134.17 (2011): 174105.
  */
 int transmat_mle_prinz(const double* C, int n_states, double tol,
-                       double* T, double* pi)
+                       const double* X0, double* T, double* pi)
 {
     double a, b, c, v, tmp, pi_sum, denom;
     double *X, *X_RS, *C_RS;
@@ -62,7 +66,7 @@ int transmat_mle_prinz(const double* C, int n_states, double tol,
     /* initialize X */
     for (i = 0; i < n_states; i++)
         for (j = 0; j < n_states; j++)
-            x(i,j) = c(i,j) + c(j,i);
+            x(i,j) = (X0 == NULL) ? c(i,j) + c(j,i) : X0[i*n_states + j];
 
     /* initialize x_rs and c_rs */
     for (i = 0; i < n_states; i++) {
@@ -173,3 +177,155 @@ int transmat_mle_prinz(const double* C, int n_states, double tol,
     /* exit success */
     return iter;
 }
+
+
+/**
+ * Compute a maximum likelihood reversible transition matrix, given
+ * a sparse set of directed transition counts.
+ *
+ * The counts are stored in CSR format, on the (symmetric) nonzero pattern
+ * of C + C^T, and only those entries are ever touched, so each iteration is
+ * O(nnz). Instead of the sequential (Gauss-Seidel) updates of Algorithm 1
+ * of Prinz et al.[1], every entry of the symmetric matrix X is updated at
+ * once from the current row sums, with the fixed-point iteration
+ *
+ *     x_ij <- (c_ij + c_ji) / (c_i / x_i + c_j / x_j)
+ *
+ * where c_i and x_i are the row sums of C and X. The rows are independent,
+ * and are updated in parallel with OpenMP.
+ *
+ * Parameters
+ * ----------
+ * indptr : (input) pointer to 1d array of shape=(n_states+1,)
+ *     The CSR row pointers of the nonzero pattern of C + C^T.
+ * indices : (input) pointer to 1d array of shape=(nnz,)
+ *     The CSR column indices of the nonzero pattern of C + C^T. This
+ *     pattern must be symmetric.
+ * C : (input) pointer to 1d array of shape=(nnz,)
+ *     The directed transition counts, C_ij, on the nonzero pattern.
+ * C_sym : (input) pointer to 1d array of shape=(nnz,)
+ *     The symmetrized counts, C_ij + C_ji, on the nonzero pattern.
+ * n_states : (input) int
+ *     The number of states
+ * tol : (input) float
+ *     Convergence tolerance. The algorithm will iterate until the change
+ *     in the stationary distribution is less than `tol` in every state.
+ * max_iter : (input) int
+ *     The maximum number of iterations.
+ * X0 : (input) pointer to 1d array of shape=(nnz,)
+ *     Initial guess for the symmetric matrix X, on the nonzero pattern. If
+ *     NULL, the iteration starts from C_sym.
+ * T : (output) pointer to output 1d array of shape=(nnz,)
+ *     The output transition matrix, on the nonzero pattern.
+ * pi : (output) pointer to output 1d array of shape=(n_states,)
+ *     The stationary eigenvector of the output transition matrix will
+ *     be written to pi
+ *
+ * Returns
+ * -------
+ * n_iter : int
+ *     Number of iterations performed. A value of n_iter < 0 indicates
+ *     failure. If the iteration did not converge within max_iter
+ *     iterations, -3 is returned, and the last iterate is written to
+ *     T and pi.
+ *
+ * References
+ * ----------
+ * .. [1] Prinz, Jan-Hendrik, et al. "Markov models of molecular kinetics:
+ *    Generation and validation." J Chem. Phys. 134.17 (2011): 174105.
+ */
+int transmat_mle_prinz_sparse(const int* indptr, const int* indices,
+                              const double* C, const double* C_sym,
+                              int n_states, double tol, int max_iter,
+                              const double* X0, double* T, double* pi)
+{
+    double *X, *X_RS, *C_RS, *W;
+    double s, x_sum, delta = DBL_MAX;
+    int iter, i, k;
+
+    X = (double*) malloc((size_t) indptr[n_states] * sizeof(double));
+    X_RS = (double*) malloc(n_states*sizeof(double));
+    C_RS = (double*) malloc(n_states*sizeof(double));
+    W = (double*) malloc(n_states*sizeof(double));
+    if (X == NULL || X_RS == NULL || C_RS == NULL || W == NULL) {
+        free(X); free(X_RS); free(C_RS); free(W);
+        return -4;
+    }
+
+    /* initialize X, and the row sums */
+    x_sum = 0;
+    for (i = 0; i < n_states; i++) {
+        X_RS[i] = 0;
+        C_RS[i] = 0;
+        for (k = indptr[i]; k < indptr[i+1]; k++) {
+            if (C[k] < 0) {
+                // domain error. counts must be positive
+                free(X); free(X_RS); free(C_RS); free(W);
+                return -1;
+            }
+            X[k] = (X0 == NULL) ? C_sym[k] : X0[k];
+            X_RS[i] += X[k];
+            C_RS[i] += C[k];
+        }
+
+        if (X_RS[i] <= 0 || C_RS[i] <= 0) {
+            // domain error. we can't have rows with sum=0
+            free(X); free(X_RS); free(C_RS); free(W);
+            return -1;
+        }
+        x_sum += X_RS[i];
+    }
+    for (i = 0; i < n_states; i++) {
+        W[i] = C_RS[i] / X_RS[i];
+        pi[i] = X_RS[i] / x_sum;
+    }
+
+    for (iter = 0; iter < max_iter && delta >= tol; iter++) {
+        /* update X, O(nnz). Each row only reads W, which is constant
+           during the sweep, and writes its own entries */
+        #ifdef _OPENMP
+        #pragma omp parallel for default(none) schedule(dynamic, 64) \
+            shared(indptr, indices, C_sym, X, X_RS, W, n_states) private(k, s)
+        #endif
+        for (i = 0; i < n_states; i++) {
+            s = 0;
+            for (k = indptr[i]; k < indptr[i+1]; k++) {
+                X[k] = C_sym[k] / (W[i] + W[indices[k]]);
+                s += X[k];
+            }
+            X_RS[i] = s;
+        }
+
+        /* check for convergence, O(n_states) */
+        x_sum = 0;
+        for (i = 0; i < n_states; i++)
+            x_sum += X_RS[i];
+        delta = 0;
+        for (i = 0; i < n_states; i++) {
+            s = X_RS[i] / x_sum;
+            if (fabs(s - pi[i]) > delta)
+                delta = fabs(s - pi[i]);
+            pi[i] = s;
+            W[i] = C_RS[i] / X_RS[i];
+        }
+
+        if (delta != delta) {
+            // delta is a nan
+            free(X); free(X_RS); free(C_RS); free(W);
+            return -2;
+        }
+    }
+
+    for (i = 0; i < n_states; i++)
+        for (k = indptr[i]; k < indptr[i+1]; k++)
+            T[k] = X[k] / X_RS[i];
+
+    free(X);
+    free(X_RS);
+    free(C_RS);
+    free(W);
+    if (delta >= tol)
+        return -3;
+    /* exit success */
+    return iter;
+}
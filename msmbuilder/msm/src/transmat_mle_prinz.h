@@ -6,7 +6,11 @@ extern "C" {
 #endif
 
 int transmat_mle_prinz(const double* C, int n_states, double tol,
-                       double* T, double* pi);
+                       const double* X0, double* T, double* pi);
+int transmat_mle_prinz_sparse(const int* indptr, const int* indices,
+                              const double* C, const double* C_sym,
+                              int n_states, double tol, int max_iter,
+                              const double* X0, double* T, double* pi);
 #ifdef __cplusplus
 }
 #endif
@@ -51,3 +51,46 @@ def test_3():
     data = np.random.RandomState(0).randn(100, 2)
     eq(model1.fit_predict([data])[0], model2.fit_predict([data])[0])
     
+
+
+def test_predict_blocks():
+    # predicting in small blocks of rows should give the same result
+    from msmbuilder.cluster import agglomerative
+    data = np.random.RandomState(0).randn(100, 2)
+
+    for linkage in ['single', 'average', 'complete']:
+        model = LandmarkAgglomerative(n_clusters=5, n_landmarks=20,
+                                      linkage=linkage).fit([data])
+        labels = model.predict([data])[0]
+
+        block_size = agglomerative.PREDICT_BLOCK_SIZE
+        agglomerative.PREDICT_BLOCK_SIZE = 3 * 20
+        try:
+            eq(labels, model.predict([data])[0])
+        finally:
+            agglomerative.PREDICT_BLOCK_SIZE = block_size
+
+
+def test_low_memory():
+    # the low-memory linkage algorithms should give the same clustering
+    data = np.random.RandomState(0).randn(100, 2)
+
+    for linkage in ['single', 'ward']:
+        model1 = LandmarkAgglomerative(n_clusters=5, linkage=linkage)
+        model2 = LandmarkAgglomerative(n_clusters=5, linkage=linkage,
+                                       low_memory=True)
+        labels1 = model1.fit_predict([data])[0]
+        labels2 = model2.fit_predict([data])[0]
+        assert adjusted_rand_score(labels1, labels2) == 1
+
+
+def test_ward_predict():
+    # three well separated blobs
+    random = np.random.RandomState(0)
+    data = np.concatenate([random.randn(20, 2) + [0, 0],
+                           random.randn(20, 2) + [20, 0],
+                           random.randn(20, 2) + [0, 20]])
+    model = LandmarkAgglomerative(n_clusters=3, linkage='ward').fit([data])
+    eq(model.landmark_labels_, model.predict([data])[0])
+    assert adjusted_rand_score(model.landmark_labels_,
+                               np.repeat([0, 1, 2], 20)) == 1
@@ -1,9 +1,14 @@
 from __future__ import print_function
+import os
+import shutil
+import tempfile
 import numpy as np
 import msmbuilder.cluster
+from msmbuilder.dataset import dataset
 import mdtraj as md
 import mdtraj.testing
 import scipy.spatial.distance
+from nose.tools import assert_raises
 
 X1 = 0.3 * np.random.RandomState(0).randn(1000, 10).astype(np.double)
 X2 = 0.3 * np.random.RandomState(1).randn(1000, 10).astype(np.float32)
@@ -68,3 +73,125 @@ def test_kcenters_spatial():
         assert isinstance(predict, list) and len(predict) == 1
         assert len(predict[0]) == len(X)
         assert isinstance(predict[0], np.ndarray) and predict[0].dtype == np.intp
+
+
+def test_regular_spatial_multisequence():
+    # concatenation of many sequences, including an empty one, with
+    # mixed precision
+    sequences = [X1[:300], X1[300:300], X2[:200], X1[300:]]
+    model = msmbuilder.cluster.RegularSpatial(d_min=0.8)
+    model.fit(sequences)
+
+    assert model.cluster_centers_.dtype == np.float64
+    predict = model.predict([s.astype(np.float64) for s in sequences])
+    assert [len(l) for l in predict] == [300, 0, 200, 700]
+    for i, (traj_i, frame_i) in enumerate(model.cluster_center_indices_):
+        np.testing.assert_array_equal(
+            sequences[traj_i][frame_i], model.cluster_centers_[i])
+
+
+def test_predict_n_jobs():
+    sequences = [X1[:300], X1[300:600], X1[600:]]
+    for model in [msmbuilder.cluster.KCenters(5, random_state=0),
+                  msmbuilder.cluster.KMedoids(5, random_state=0)]:
+        model.fit(sequences)
+        serial = model.predict(sequences)
+        parallel = model.predict(sequences, n_jobs=2)
+        assert len(parallel) == 3
+        for p, s in zip(parallel, serial):
+            np.testing.assert_array_equal(p, s)
+        for p, s in zip(model.transform(sequences, n_jobs=3), serial):
+            np.testing.assert_array_equal(p, s)
+
+    model = msmbuilder.cluster.KCenters(3, metric='rmsd').fit([trj])
+    np.testing.assert_array_equal(model.predict([trj[:50], trj[50:]], n_jobs=2)[1],
+                                  model.predict([trj])[0][50:])
+
+
+def test_minibatch_kmeans_fit_lazy():
+    random = np.random.RandomState(0)
+    sequences = [random.randn(100, 2) + [10, 0], random.randn(50, 2),
+                 random.randn(80, 2) + [0, 10]]
+
+    model = msmbuilder.cluster.MiniBatchKMeans(
+        n_clusters=3, batch_size=20, random_state=0)
+    model.fit_lazy(sequences)
+    assert [len(l) for l in model.labels_] == [100, 50, 80]
+    for labels in model.labels_:
+        assert len(np.unique(labels)) == 1
+    assert len(np.unique([l[0] for l in model.labels_])) == 3
+
+    for y, labels in zip(model.predict(sequences), model.labels_):
+        np.testing.assert_array_equal(y, labels)
+
+    # fitting again starts over, rather than continuing from the first fit
+    centers, n_steps = model.cluster_centers_.copy(), model.n_steps_
+    model.fit_lazy(sequences)
+    np.testing.assert_array_equal(model.cluster_centers_, centers)
+    assert model.n_steps_ == n_steps
+
+    # write the assignments out instead of storing them
+    out = {}
+    model.fit_lazy(sequences, out_ds=out)
+    assert model.labels_ is None
+    assert sorted(out.keys()) == [0, 1, 2]
+    assert [len(out[i]) for i in range(3)] == [100, 50, 80]
+
+
+def test_minibatch_kmeans_fit_lazy_dataset():
+    # from a memory-mapped (read-only) float64 dataset on disk
+    random = np.random.RandomState(0)
+    sequences = [random.randn(100, 2) + [10, 0], random.randn(50, 2),
+                 random.randn(80, 2) + [0, 10]]
+
+    path = tempfile.mkdtemp()
+    shutil.rmtree(path)
+    try:
+        ds = dataset(path, 'w', 'dir-npy')
+        for i, X in enumerate(sequences):
+            ds[i] = X
+
+        model = msmbuilder.cluster.MiniBatchKMeans(
+            n_clusters=3, batch_size=20, random_state=0)
+        model.fit_lazy(dataset(path, mode='r'))
+    finally:
+        shutil.rmtree(path)
+
+    reference = msmbuilder.cluster.MiniBatchKMeans(
+        n_clusters=3, batch_size=20, random_state=0)
+    reference.fit_lazy(sequences)
+    np.testing.assert_array_equal(model.cluster_centers_,
+                                  reference.cluster_centers_)
+    for labels, ref in zip(model.labels_, reference.labels_):
+        np.testing.assert_array_equal(labels, ref)
+
+
+def test_assignment_model():
+    from msmbuilder.cluster import load_assignment_model
+    sequences = [X1[:300], X1[300:]]
+    models = [msmbuilder.cluster.KCenters(5, random_state=0).fit(sequences),
+              msmbuilder.cluster.LandmarkAgglomerative(5, n_landmarks=50).fit(sequences),
+              msmbuilder.cluster.NDGrid(n_bins_per_feature=2, sparse=True).fit([X1[:, :3]]),
+              msmbuilder.cluster.NDGrid(n_bins_per_feature=2).fit([X1[:, :3]]),
+              msmbuilder.cluster.KCenters(3, metric='rmsd').fit([trj]),
+              msmbuilder.cluster.GMM(3, random_state=0).fit(sequences)]
+    data = [sequences, sequences, [X1[:, :3]], [X1[:, :3]], [trj], sequences]
+
+    path = tempfile.mkdtemp()
+    try:
+        for i, (model, X) in enumerate(zip(models, data)):
+            model.save_assignment_model(os.path.join(path, str(i)))
+            loaded = load_assignment_model(os.path.join(path, str(i)))
+            assert type(loaded) == type(model)
+            assert not hasattr(loaded, 'labels_')
+            for a, b in zip(model.predict(X), loaded.predict(X)):
+                np.testing.assert_array_equal(a, b)
+
+        # models which aren't fit, or can't predict, can't be saved
+        for model, error in [(msmbuilder.cluster.KCenters(5), ValueError),
+                             (msmbuilder.cluster.Ward(5), NotImplementedError)]:
+            assert_raises(error, model.save_assignment_model,
+                          os.path.join(path, 'error'))
+            assert not os.path.exists(os.path.join(path, 'error'))
+    finally:
+        shutil.rmtree(path)
@@ -1,5 +1,6 @@
 from __future__ import print_function, division
 import os
+import io
 import sys
 import json
 import glob
@@ -8,6 +9,7 @@ import itertools
 import tempfile
 import shutil
 import subprocess
+import threading
 import numpy as np
 import mdtraj as md
 from mdtraj.testing import eq
@@ -186,6 +188,83 @@ def test_transform_command_2():
                   "--metric rmsd "
                   "--stride 2".format(data_home=get_data_home()))
 
+def test_assign_server_command():
+    with tempdir():
+        shell("msmb KCenters -i {data_home}/alanine_dipeptide/trajectory_0.dcd "
+              "-o model.pkl --top {data_home}/alanine_dipeptide/ala2.pdb "
+              "--metric rmsd".format(data_home=get_data_home()))
+        model = load('model.pkl')
+        t = md.load('{data_home}/alanine_dipeptide/trajectory_0.dcd'.format(
+            data_home=get_data_home()),
+            top='{data_home}/alanine_dipeptide/ala2.pdb'.format(
+                data_home=get_data_home()))
+
+        requests = io.BytesIO()
+        for start in range(0, len(t), 1000):
+            np.save(requests, t.xyz[start:start+1000])
+        p = subprocess.Popen(['msmb', 'AssignServer', '-m', 'model.pkl'],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        out, _ = p.communicate(requests.getvalue())
+        assert p.returncode == 0
+
+        out = io.BytesIO(out)
+        labels = [np.load(out) for start in range(0, len(t), 1000)]
+        eq(np.concatenate(labels), model.labels_[0])
+
+
+def test_assignment_server_batching():
+    from msmbuilder.cluster import KMeans
+    from msmbuilder.commands.assign_server import AssignmentServer
+    X = np.random.RandomState(0).randn(1000, 3)
+    model = KMeans(n_clusters=10, random_state=0).fit([X])
+    server = AssignmentServer(model, max_batch=300)
+
+    chunks = np.array_split(X, 50)
+    results = [None] * len(chunks)
+
+    def worker(i):
+        results[i] = server.assign(chunks[i])
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(len(chunks))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    eq(np.concatenate(results), model.labels_[0])
+
+
+def test_assignment_server_errors():
+    from msmbuilder.cluster import KMeans
+    from msmbuilder.commands.assign_server import (AssignmentServer,
+                                                   serve_stream)
+    X = np.random.RandomState(0).randn(100, 3)
+    model = KMeans(n_clusters=5, random_state=0).fit([X])
+    server = AssignmentServer(model)
+
+    # a request with the wrong number of features gets an error response,
+    # and the following requests are still answered
+    requests = io.BytesIO()
+    np.save(requests, X[:10])
+    np.save(requests, X[:10, :2])
+    np.save(requests, X[10:])
+    out = io.BytesIO()
+    serve_stream(server, io.BytesIO(requests.getvalue()), out)
+    out.seek(0)
+    eq(np.load(out), model.labels_[0][:10])
+    assert np.load(out).dtype.kind == 'U'
+    eq(np.load(out), model.labels_[0][10:])
+
+    # a truncated request gets an error response, and ends the stream
+    out = io.BytesIO()
+    serve_stream(server, io.BytesIO(requests.getvalue()[:-8]), out)
+    out.seek(0)
+    responses = []
+    while out.tell() < len(out.getvalue()):
+        responses.append(np.load(out))
+    assert len(responses) == 3
+    assert responses[2].dtype.kind == 'U'
+
+
 def test_help():
     shell('msmb -h')
 
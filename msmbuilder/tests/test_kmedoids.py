@@ -1,14 +1,17 @@
 from __future__ import print_function, absolute_import, division
 
+import shutil
+import tempfile
 import numpy as np
 from numpy.testing import assert_raises
 from scipy.spatial.distance import euclidean
-from msmbuilder.cluster._kmedoids import contigify_ids
+from msmbuilder.cluster._kmedoids import contigify_ids, kmedoids
 from msmbuilder.cluster.kmedoids import _KMedoids
 from msmbuilder.cluster.minibatchkmedoids import _MiniBatchKMedoids
 from msmbuilder.cluster.kmedoids import KMedoids
 from msmbuilder.cluster.minibatchkmedoids import MiniBatchKMedoids
 from msmbuilder import libdistance
+from msmbuilder.dataset import dataset
 
 
 def test_inertia():
@@ -42,6 +45,53 @@ def test_4():
     assert_raises(ValueError, lambda: _KMedoids(metric='sdf').fit(np.zeros((10,2))))
 
 
+def test_passes_n_jobs():
+    # the restarts use their own generators, so running them on several
+    # threads should give the same solution
+    random = np.random.RandomState(0)
+    X = random.randn(100, 2)
+    dmat = libdistance.pdist(X, 'euclidean')
+
+    ids1, error1, ifound1 = kmedoids(4, dmat, 8, random_state=0)
+    ids2, error2, ifound2 = kmedoids(4, dmat, 8, random_state=0, n_jobs=4)
+    np.testing.assert_array_equal(ids1, ids2)
+    assert error1 == error2
+    assert 1 <= ifound1 == ifound2 <= 8
+
+
+def test_float32_distances():
+    random = np.random.RandomState(0)
+    X = random.randn(100, 2)
+    dmat = libdistance.pdist(X, 'euclidean')
+    dmat32 = libdistance.pdist(X, 'euclidean', dtype=np.float32)
+
+    ids1, error1, _ = kmedoids(4, dmat, 8, random_state=0)
+    ids2, error2, _ = kmedoids(4, dmat32, 8, random_state=0)
+    np.testing.assert_array_equal(ids1, ids2)
+    np.testing.assert_almost_equal(error1, error2, decimal=4)
+
+
+def test_float32_distance_dtype():
+    # single precision distances give the same medoids on well separated
+    # clusters, with or without subsampling
+    random = np.random.RandomState(0)
+    X = random.randn(150, 2)
+    X[50:100] += 10
+    X[100:] -= 10
+
+    for kwargs in ({}, {'sample_size': 50}):
+        k1 = KMedoids(n_clusters=3, n_passes=8, random_state=0,
+                      **kwargs).fit([X])
+        k2 = KMedoids(n_clusters=3, n_passes=8, random_state=0,
+                      distance_dtype='float32', **kwargs).fit([X])
+        np.testing.assert_array_equal(k1.cluster_ids_, k2.cluster_ids_)
+        np.testing.assert_array_equal(k1.labels_[0], k2.labels_[0])
+        np.testing.assert_almost_equal(k1.inertia_, k2.inertia_, decimal=3)
+
+    assert_raises(TypeError, lambda: _KMedoids(
+        distance_dtype='int32').fit(np.zeros((10, 2))))
+
+
 def test_contigify_ids_1():
     inp = np.array([0, 10, 10, 20, 20, 21])
     ref = np.array([0, 1,  1,  2,  2,  3])
@@ -123,3 +173,91 @@ def test_multitraj_cluster_ids_2():
         for traj_i, frame_i in km.cluster_ids_
     ])
     np.testing.assert_array_equal(km.cluster_centers_, indexed_cluster_centers)
+
+
+def test_subsample_inertia():
+    random = np.random.RandomState(0)
+    X = random.randn(100, 2)
+
+    km = _KMedoids(n_clusters=3, sample_size=20, n_subsamples=3,
+                   random_state=0).fit(X)
+    assert len(km.cluster_ids_) == 3
+    assert km.labels_.shape == (100,)
+
+    inertia = 0
+    for i in range(len(X)):
+        inertia += euclidean(X[km.cluster_ids_[km.labels_[i]]], X[i])
+    np.testing.assert_almost_equal(inertia, km.inertia_)
+
+
+def test_subsample_obvious_clustering():
+    random = np.random.RandomState(0)
+    X = random.randn(200, 2)
+    X[100:] += 10
+
+    k1 = _KMedoids(n_clusters=2, sample_size=30, n_jobs=2,
+                   random_state=0).fit(X)
+    k2 = _KMedoids(n_clusters=2, n_passes=10).fit(X)
+
+    assert (np.all(k1.labels_ == k2.labels_) or
+            np.all(k1.labels_ == np.logical_not(k2.labels_)))
+
+
+def test_subsample_multitraj_cluster_ids():
+    random = np.random.RandomState(0)
+    trajs = [random.randn(40, 2),
+             random.randn(60, 2) + 5]
+    km = KMedoids(n_clusters=2, sample_size=25, random_state=0)
+    km.fit(trajs)
+
+    indexed_cluster_centers = np.asarray([
+        trajs[traj_i][frame_i]
+        for traj_i, frame_i in km.cluster_ids_
+    ])
+    np.testing.assert_array_equal(km.cluster_centers_, indexed_cluster_centers)
+    assert_raises(ValueError, lambda: _KMedoids(
+        n_clusters=5, sample_size=3).fit(np.zeros((10, 2))))
+
+
+def test_minibatch_fit_lazy_1():
+    # fit_lazy should give the same result as fit with the same seed
+    random = np.random.RandomState(0)
+    trajs = [random.randn(30, 2),
+             random.randn(50, 2) + 5,
+             random.randn(20, 2) - 5]
+
+    k1 = MiniBatchKMedoids(n_clusters=3, batch_size=10, random_state=0)
+    k2 = MiniBatchKMedoids(n_clusters=3, batch_size=10, random_state=0)
+    k1.fit(trajs)
+    k2.fit_lazy(trajs, lengths=[30, 50, 20])
+
+    np.testing.assert_array_equal(k1.cluster_ids_, k2.cluster_ids_)
+    np.testing.assert_array_equal(k1.cluster_centers_, k2.cluster_centers_)
+    np.testing.assert_almost_equal(k1.inertia_, k2.inertia_)
+    for l1, l2 in zip(k1.labels_, k2.labels_):
+        np.testing.assert_array_equal(l1, l2)
+
+
+def test_minibatch_fit_lazy_2():
+    # from a memory-mapped dataset, without supplying the lengths
+    random = np.random.RandomState(0)
+    trajs = [random.randn(40, 2), random.randn(20, 2) + 5]
+
+    path = tempfile.mkdtemp()
+    shutil.rmtree(path)
+    try:
+        ds = dataset(path, 'w', 'dir-npy')
+        for i, X in enumerate(trajs):
+            ds[i] = X
+
+        km = MiniBatchKMedoids(n_clusters=2, random_state=0)
+        km.fit_lazy(dataset(path, mode='r'))
+    finally:
+        shutil.rmtree(path)
+
+    assert [len(l) for l in km.labels_] == [40, 20]
+    indexed_cluster_centers = np.asarray([
+        trajs[traj_i][frame_i]
+        for traj_i, frame_i in km.cluster_ids_
+    ])
+    np.testing.assert_array_equal(km.cluster_centers_, indexed_cluster_centers)
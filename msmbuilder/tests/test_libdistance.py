@@ -1,9 +1,11 @@
 from __future__ import print_function
 import sys
+import tempfile
 import numpy as np
 import mdtraj as md
 import scipy.spatial.distance
-from msmbuilder.libdistance import assign_nearest, pdist, dist, sumdist
+from msmbuilder.libdistance import (assign_nearest, pdist, dist, sumdist,
+                                   RMSDCoordinates)
 from msmbuilder.example_datasets import AlanineDipeptide
 
 random = np.random.RandomState()
@@ -153,6 +155,24 @@ def test_pdist_rmsd_2():
     np.testing.assert_almost_equal(got, ref, decimal=4)
 
 
+def test_pdist_blocked():
+    # several threads, and float32 output into a memory-mapped buffer
+    X = random.randn(300, 3)
+    ref = scipy.spatial.distance.pdist(X, 'euclidean')
+    np.testing.assert_almost_equal(pdist(X, 'euclidean', n_jobs=4), ref)
+
+    with tempfile.NamedTemporaryFile() as f:
+        out = np.memmap(f.name, dtype=np.float32, mode='w+',
+                        shape=ref.shape)
+        result = pdist(X, 'euclidean', out=out, n_jobs=3)
+        assert result is out
+        np.testing.assert_almost_equal(out, ref, decimal=5)
+
+    got = pdist(X_rmsd, "rmsd", dtype=np.float32, n_jobs=2)
+    assert got.dtype == np.float32
+    np.testing.assert_almost_equal(got, pdist(X_rmsd, "rmsd"), decimal=5)
+
+
 def test_dist_double_float_1():
     # test without X_indices
     for metric in VECTOR_METRICS:
@@ -208,6 +228,27 @@ def test_sumdist_rmsd():
         decimal=6)
 
 
+def test_rmsd_coordinates():
+    # prepared (padded) coordinates, from trajectories which are not
+    # centered, should give the same distances as centered trajectories
+    traj = AlanineDipeptide().get().trajectories[0]
+    X = RMSDCoordinates.from_trajectories([traj[0:4], traj[4:10]])
+    Y = RMSDCoordinates.from_trajectories([traj[30:33]])
+    assert len(X) == 10
+    assert X.xyz.shape[1] % 4 == 0
+
+    np.testing.assert_almost_equal(pdist(X, "rmsd"), pdist(X_rmsd, "rmsd"),
+                                   decimal=5)
+    np.testing.assert_almost_equal(dist(X, Y[0], "rmsd", X_indices),
+                                   dist(X_rmsd, Y_rmsd[0], "rmsd", X_indices),
+                                   decimal=5)
+    for Y_ in (Y, Y_rmsd, Y.to_trajectory()):
+        assignments, inertia = assign_nearest(X, Y_, "rmsd")
+        ref_assignments, ref_inertia = assign_nearest(X_rmsd, Y_rmsd, "rmsd")
+        np.testing.assert_array_equal(assignments, ref_assignments)
+        np.testing.assert_almost_equal(inertia, ref_inertia, decimal=5)
+
+
 def test_canberra_32_1():
     # with canberra in float32, there is a rounding issue where many of
     # the distances come out exactly the same, but due to finite floating
@@ -6,6 +6,7 @@ import mdtraj as md
 import pandas as pd
 
 import numpy as np
+import scipy.sparse
 from numpy.testing import assert_approx_equal
 from mdtraj.testing import eq
 from sklearn.externals.joblib import load, dump
@@ -187,6 +188,33 @@ def test_8():
     np.testing.assert_array_equal(v[1], [1, 1, 1])
 
 
+def test_transform_2():
+    # integer labels, with some of them trimmed, and others which are
+    # negative or larger than any label seen during fit
+    model = MarkovStateModel()
+    model.fit([[3, 3, 5, 5, 3, 5, 10, 1000]])
+    assert model.mapping_ == {3: 0, 5: 1}
+
+    seq = [5, 3, -1, 3, 10, 1000, 10**9, 5, 4]
+    v = model.transform([seq], 'clip')
+    assert len(v) == 3
+    np.testing.assert_array_equal(v[0], [1, 0])
+    np.testing.assert_array_equal(v[1], [0])
+    np.testing.assert_array_equal(v[2], [1])
+
+    v = model.transform([seq], 'fill')
+    np.testing.assert_array_equal(
+        v[0], [1, 0, np.nan, 0, np.nan, np.nan, np.nan, 1, np.nan])
+
+    np.testing.assert_array_equal(
+        model.inverse_transform([[1, 0, 1]])[0], [5, 3, 5])
+
+    # the lookup tables follow a change in the mapping
+    model.fit([[7, 8, 8, 7]])
+    np.testing.assert_array_equal(model.transform([[8, 3, 7]])[1], [0])
+    np.testing.assert_array_equal(model.inverse_transform([[1]])[0], [8])
+
+
 def test_9():
     # what if the input data contains NaN? They should be ignored
     model = MarkovStateModel(ergodic_cutoff=0)
@@ -227,6 +255,32 @@ def test_11():
     assert np.sum(np.abs(diff)) < 0.1
 
 
+def test_sample_2():
+    # sample many trajectories at once, from dense and sparse models
+    seq = [[0, 0, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 2, 2, 0, 0]]
+    model = MarkovStateModel().fit(seq)
+    sparse_model = MarkovStateModel(sparse=True).fit(seq)
+
+    samples = model.sample_discrete(n_steps=1000, n_trajs=5, random_state=0)
+    assert isinstance(samples, list)
+    assert len(samples) == 5
+    assert all(len(s) == 1000 for s in samples)
+
+    sparse_samples = sparse_model.sample_discrete(
+        n_steps=1000, n_trajs=5, random_state=0)
+    for s1, s2 in zip(samples, sparse_samples):
+        np.testing.assert_array_equal(s1, s2)
+
+    samples = model.sample_discrete(state=2, n_steps=10, n_trajs=3)
+    assert all(s[0] == 2 for s in samples)
+
+    # the transition counts of a long trajectory recover the model
+    sample = model.sample_discrete(n_steps=100000, random_state=0)
+    counts = _transition_counts([sample])[0]
+    transmat = counts / counts.sum(axis=1)[:, np.newaxis]
+    np.testing.assert_array_almost_equal(transmat, model.transmat_, decimal=2)
+
+
 def test_12():
     # test eigtransform
     model = MarkovStateModel(n_timescales=1)
@@ -345,6 +399,17 @@ def test_sample_1():
     eq(mu, np.array([[0., 0., 0.0], [25., 25., 25.]]), decimal=1)
 
 
+def test_draw_samples_2():
+    # every drawn (trj, frame) pair is assigned to the state it's drawn for
+    random = np.random.RandomState(0)
+    sequences = [random.randint(5, size=n) for n in [100, 1, 0, 50]]
+    pairs = MarkovStateModel().draw_samples(sequences, 20, random_state=0)
+    assert pairs.shape == (5, 20, 2)
+    for state in range(5):
+        for trj, frame in pairs[state]:
+            assert sequences[trj][frame] == state
+
+
 def test_score_1():
     # test that GMRQ is equal to the sum of the first n eigenvalues,
     # when testing and training on the same dataset.
@@ -356,3 +421,48 @@ def test_score_1():
 
         assert_approx_equal(model.score([sequence]), model.eigenvalues_.sum())
         assert_approx_equal(model.score([sequence]), model.score_)
+
+
+def test_sparse_1():
+    # sparse and dense models should agree
+    random = np.random.RandomState(0)
+    sequences = [random.randint(20, size=1000) for _ in range(3)]
+    sequences[0][sequences[0] == 5] = 1000
+    for reversible_type in ['mle', 'transpose']:
+        dense = MarkovStateModel(reversible_type=reversible_type,
+                                 n_timescales=3, verbose=False)
+        sparse = MarkovStateModel(reversible_type=reversible_type,
+                                  n_timescales=3, sparse=True, verbose=False)
+        dense.fit(sequences)
+        sparse.fit(sequences)
+
+        assert scipy.sparse.issparse(sparse.countsmat_)
+        assert scipy.sparse.issparse(sparse.transmat_)
+        eq(dense.mapping_, sparse.mapping_)
+        eq(dense.countsmat_, sparse.countsmat_.toarray())
+        eq(dense.transmat_, sparse.transmat_.toarray(), decimal=6)
+        eq(dense.populations_, sparse.populations_, decimal=6)
+        eq(dense.timescales_, sparse.timescales_, decimal=4)
+        eq(np.abs(dense.right_eigenvectors_),
+           np.abs(sparse.right_eigenvectors_), decimal=4)
+        assert_approx_equal(dense.score_ll(sequences),
+                            sparse.score_ll(sequences))
+        assert_approx_equal(dense.score(sequences), sparse.score(sequences))
+
+    # a ring of three identical, weakly coupled blocks has degenerate
+    # eigenvalues, whose left and right eigenvectors must still be
+    # biorthonormal
+    block = random.randint(10, size=1000)
+    sequences = [block, block + 10, block + 20,
+                 [9, 10], [10, 9], [19, 20], [20, 19], [29, 0], [0, 29]]
+    for reversible_type in ['mle', 'transpose']:
+        dense = MarkovStateModel(reversible_type=reversible_type,
+                                 n_timescales=4, verbose=False)
+        sparse = MarkovStateModel(reversible_type=reversible_type,
+                                  n_timescales=4, sparse=True, verbose=False)
+        dense.fit(sequences)
+        sparse.fit(sequences)
+
+        eq(dense.eigenvalues_, sparse.eigenvalues_, decimal=6)
+        eq(sparse.left_eigenvectors_.T.dot(sparse.right_eigenvectors_),
+           np.eye(5), decimal=6)
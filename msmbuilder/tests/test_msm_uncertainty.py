@@ -48,6 +48,33 @@ def test_0():
         np.testing.assert_almost_equal(dLambda_dP_numeric[k], analytic, decimal=5)
 
 
+def test_uncertainty_eigenvalues_1():
+    # the closed form agrees with the quadratic forms of the explicit
+    # covariance matrices, for dense and sparse counts
+    random = np.random.RandomState(0)
+    Y = [random.randint(10, size=1000)]
+    for sparse in [False, True]:
+        model = MarkovStateModel(n_timescales=4, sparse=sparse,
+                                 verbose=False).fit(Y)
+        u, lv, rv = model._get_eigensystem()
+        counts = model.countsmat_
+        if sparse:
+            counts = counts.toarray()
+
+        sigma2 = np.zeros(5)
+        for k in range(5):
+            dLambda_dT = np.outer(lv[:, k], rv[:, k])
+            for i in range(model.n_states_):
+                ui = counts[:, i]
+                wi = np.sum(ui)
+                cov = wi*np.diag(ui) - np.outer(ui, ui)
+                quad_form = dLambda_dT[i].dot(cov).dot(dLambda_dT[i])
+                sigma2[k] += quad_form / (wi**2*(wi+1))
+
+        np.testing.assert_array_almost_equal(
+            model.uncertainty_eigenvalues()[1:], np.sqrt(sigma2[1:]))
+
+
 def test_1():
     X = load_doublewell(random_state=0)['trajectories']
     for i in range(3):
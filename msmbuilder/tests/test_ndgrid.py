@@ -32,3 +32,32 @@ def test_ndgrid_3():
     for indx, (op_z, op_y, op_x) in enumerate(itertools.product(operators, repeat=3)):
         mask = np.logical_and.reduce((op_x(x, 0), op_y(y, 0), op_z(z, 0)))
         assert np.all(labels[mask] == indx)
+
+def test_ndgrid_sparse_1():
+    # the sparse grid should number the occupied bins of the full grid
+    X = np.random.RandomState(0).randn(1000, 3)
+    dense = NDGrid(n_bins_per_feature=4).fit([X])
+    sparse = NDGrid(n_bins_per_feature=4, sparse=True).fit([X])
+
+    labels = dense.predict([X])[0]
+    np.testing.assert_array_equal(np.unique(labels, return_inverse=True)[1],
+                                  sparse.predict([X])[0])
+    assert sparse.n_bins == len(np.unique(labels))
+
+def test_ndgrid_sparse_2():
+    # 20^10 bins, and unoccupied bins are labeled -1
+    X = np.random.RandomState(0).rand(100, 10)
+    model = NDGrid(n_bins_per_feature=20, min=0, max=1, sparse=True)
+    labels = model.fit([X[:50]]).predict([X])[0]
+    np.testing.assert_array_equal(np.sort(labels[:50]), np.arange(50))
+    assert np.all(labels[50:] == -1)
+
+def test_ndgrid_n_bins_per_feature():
+    X = np.random.RandomState(0).randn(100, 2)
+    model = NDGrid(n_bins_per_feature=[2, 3], min=-5, max=5)
+    labels = model.fit([X]).predict([X])[0]
+    assert model.n_bins == 6
+
+    binx = (X[:, 0] > 0).astype(int)
+    biny = np.digitize(X[:, 1], [-5.0 / 3, 5.0 / 3])
+    np.testing.assert_array_equal(labels, binx + 2 * biny)
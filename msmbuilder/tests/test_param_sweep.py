@@ -6,7 +6,7 @@ import numpy.testing as npt
 
 from msmbuilder.msm import MarkovStateModel
 from msmbuilder.utils import param_sweep
-from msmbuilder.msm import implied_timescales
+from msmbuilder.msm import implied_timescales, fit_lag_times
 
 
 def test_both():
@@ -65,3 +65,35 @@ def test_multi_params():
 
     # this is redundant, but w/e
     assert len(set(params)) == 6
+
+
+def test_fit_lag_times():
+    sequences = [np.random.randint(20, size=1000) for _ in range(10)]
+    lag_times = [5, 1, 10]
+    for params in [{}, {'reversible_type': 'transpose'},
+                   {'sliding_window': False}]:
+        msm = MarkovStateModel(verbose=False, **params)
+        models = fit_lag_times(msm, sequences, lag_times)
+        models_ref = param_sweep(msm, sequences, {'lag_time': lag_times})
+
+        for m, m_ref in zip(models, models_ref):
+            assert m.lag_time == m_ref.lag_time
+            assert m.mapping_ == m_ref.mapping_
+            npt.assert_array_almost_equal(m.countsmat_, m_ref.countsmat_)
+            npt.assert_array_almost_equal(m.transmat_, m_ref.transmat_)
+            npt.assert_array_almost_equal(m.timescales_, m_ref.timescales_)
+
+
+def test_attributes():
+    sequences = np.random.randint(20, size=(10, 1000))
+    msm = MarkovStateModel(verbose=False)
+    models = param_sweep(msm, sequences, {'lag_time': [1, 2]})
+    timescales = param_sweep(msm, sequences, {'lag_time': [1, 2]}, n_jobs=2,
+                             attributes='timescales_')
+    results = param_sweep(msm, sequences, {'lag_time': [1, 2]}, n_jobs=2,
+                          attributes=['n_states_', 'populations_'])
+
+    for m, ts, r in zip(models, timescales, results):
+        npt.assert_array_almost_equal(m.timescales_, ts)
+        assert r['n_states_'] == m.n_states_
+        npt.assert_array_almost_equal(r['populations_'], m.populations_)
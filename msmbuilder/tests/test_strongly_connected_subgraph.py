@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse
 from msmbuilder.msm import _strongly_connected_subgraph
 
 def test_0():
@@ -58,3 +59,19 @@ def test_7():
     assert tC.shape == (0, 0)
     assert m == {}
 
+
+
+def test_8():
+    # sparse counts give the same trimming, and the component labels
+    C = np.array([[1, 0, 0, 0],
+                  [0, 2, 1, 0],
+                  [0, 1, 2, 0],
+                  [3, 0, 0, 0]])
+    tC, m, labels = _strongly_connected_subgraph(
+        scipy.sparse.csr_matrix(C), return_labels=True)
+    assert scipy.sparse.issparse(tC)
+    np.testing.assert_array_equal(tC.toarray(), [[2, 1], [1, 2]])
+    assert m == {1: 0, 2: 1}
+    assert len(np.unique(labels)) == 3
+    assert labels[1] == labels[2]
+    assert labels[0] != labels[1] and labels[3] != labels[1]
@@ -1,6 +1,6 @@
 import numpy as np
 from six import PY3
-from msmbuilder.msm import _transition_counts
+from msmbuilder.msm import _transition_counts, _multi_lag_transition_counts
 
 
 def test_1():
@@ -75,3 +75,45 @@ def test_9():
     C2, m2 = _transition_counts([X[::3]], sliding_window=True)
     np.testing.assert_array_almost_equal(C1, C2)
     assert m1 == m2
+
+
+def test_10():
+    # the fast path for non-negative int labels should agree with the
+    # general path (here, float labels)
+    random = np.random.RandomState(0)
+    for scale in [1, 1000003]:
+        sequences = [scale * random.randint(10, size=random.randint(0, 50))
+                     for _ in range(5)] + [[2 * scale]]
+        for lag_time in [1, 3]:
+            C1, m1 = _transition_counts(sequences, lag_time=lag_time)
+            C2, m2 = _transition_counts(
+                [np.asarray(X, dtype=float) for X in sequences],
+                lag_time=lag_time)
+            np.testing.assert_array_equal(C1, C2)
+            assert m1 == m2
+
+
+def test_multi_lag():
+    # counting at several lag times at once should agree with counting at
+    # each lag time separately
+    random = np.random.RandomState(0)
+    sequences = [random.randint(10, size=random.randint(0, 50))
+                 for _ in range(5)]
+    float_sequences = [np.asarray(X, dtype=float) for X in sequences]
+    float_sequences[0][::7] = np.nan
+    lag_times = [1, 3, 5, 2]
+
+    for seqs in [sequences, float_sequences]:
+        for sliding_window in [True, False]:
+            counts, mappings = _multi_lag_transition_counts(
+                seqs, lag_times, sliding_window=sliding_window)
+            for lag_time, C1, m1 in zip(lag_times, counts, mappings):
+                C2, m2 = _transition_counts(seqs, lag_time=lag_time,
+                                            sliding_window=sliding_window)
+                np.testing.assert_array_almost_equal(C1, C2)
+                assert m1 == m2
+
+    counts, _ = _multi_lag_transition_counts(sequences, lag_times, sparse=True)
+    for lag_time, C1 in zip(lag_times, counts):
+        C2, _ = _transition_counts(sequences, lag_time=lag_time)
+        np.testing.assert_array_almost_equal(C1.toarray(), C2)
@@ -1,6 +1,8 @@
 import numpy as np
 import scipy.optimize
-from msmbuilder.msm._markovstatemodel import _transmat_mle_prinz
+import scipy.sparse
+from msmbuilder.msm._markovstatemodel import (_transmat_mle_prinz,
+                                              _transmat_mle_prinz_sparse)
 
 random = np.random.RandomState(0)
 
@@ -122,3 +124,27 @@ def test_7():
     transmat2, pi1 = _transmat_mle_prinz(10*C)
     np.testing.assert_array_almost_equal(transmat1, transmat2)
     np.testing.assert_array_almost_equal(pi1, pi2)
+
+
+def test_sparse_1():
+    # the sparse and dense implementations should agree
+    Cs = [np.array([[5.0, 0.0, 3.0], [0.0, 3.0, 5.0], [7.0, 6.0, 8.0]]),
+          np.array([[0.0, 0.0, 3.0], [0.0, 3.0, 5.0], [7.0, 6.0, 8.0]]),
+          np.array([[0, 1], [1, 0]], dtype=float),
+          np.array([[1]], dtype=float)]
+    C = random.randint(5, size=(50, 50)) * (random.rand(50, 50) < 0.2)
+    Cs.append(C + np.eye(50) + np.roll(np.eye(50), 1, axis=1))
+
+    for C in Cs:
+        T1, pi1 = _transmat_mle_prinz(C)
+        T2, pi2 = _transmat_mle_prinz_sparse(scipy.sparse.csr_matrix(C))
+        assert scipy.sparse.issparse(T2)
+        np.testing.assert_array_almost_equal(T1, T2.toarray())
+        np.testing.assert_array_almost_equal(pi1, pi2)
+
+
+def test_sparse_2():
+    with np.testing.assert_raises(ValueError):
+        _transmat_mle_prinz_sparse(scipy.sparse.csr_matrix((3, 3)))
+    with np.testing.assert_raises(ValueError):
+        _transmat_mle_prinz_sparse(scipy.sparse.csr_matrix(-np.ones((3, 3))))
@@ -67,3 +67,48 @@ def map_drawn_samples(selected_pairs_by_state, trajectories, top=None):
         frames_by_state.append(state_trj)
 
     return frames_by_state
+
+
+def _draw_samples_by_state(sequences, n_states, n_samples, random):
+    """Draw (trajectory, frame) pairs uniformly at random from the frames
+    assigned to each state.
+
+    The frames are grouped by state once, by a stable argsort of the
+    concatenated state labels, so that the frames in each state are found
+    from the offsets of its block in the sorted order, instead of searching
+    every sequence for every state.
+
+    Parameters
+    ----------
+    sequences : list of array-like
+        List of sequences of integer state labels.
+    n_states : int
+        Number of states, labeled 0, ..., n_states - 1.
+    n_samples : int
+        How many samples to draw from each state.
+    random : RandomState
+        Random number generator.
+
+    Returns
+    -------
+    selected_pairs_by_state : np.array, dtype=int, shape=(n_states, n_samples, 2)
+        selected_pairs_by_state[state] gives an array of randomly selected
+        (trj, frame) pairs from the specified state.
+    """
+    sequences = [np.asarray(a) for a in sequences]
+    starts = np.concatenate([[0], np.cumsum([len(a) for a in sequences])])
+    labels = np.concatenate(sequences)
+    order = np.argsort(labels, kind='mergesort')
+    offsets = np.searchsorted(labels[order], np.arange(n_states + 1))
+
+    selected = np.zeros((n_states, n_samples), dtype=np.intp)
+    for state in range(n_states):
+        n_frames = offsets[state + 1] - offsets[state]
+        if n_frames == 0:
+            raise ValueError('No frames are assigned to state %d' % state)
+        selected[state] = order[offsets[state] +
+                                random.randint(n_frames, size=n_samples)]
+
+    trj = np.searchsorted(starts, selected, side='right') - 1
+    return np.concatenate([trj[..., np.newaxis],
+                           (selected - starts[trj])[..., np.newaxis]], axis=-1)
@@ -1,4 +1,10 @@
 from __future__ import print_function, division, absolute_import
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from six import string_types
 from sklearn import clone
 from sklearn.grid_search import ParameterGrid
 from sklearn.externals.joblib import Parallel, delayed
@@ -6,7 +12,8 @@ from sklearn.externals.joblib import Parallel, delayed
 __all__ = ['param_sweep']
 
 
-def param_sweep(model, sequences, param_grid, n_jobs=1, verbose=0):
+def param_sweep(model, sequences, param_grid, n_jobs=1, verbose=0,
+                attributes=None):
     """Fit a series of models over a range of parameters.
 
     Parameters
@@ -23,13 +30,22 @@ def param_sweep(model, sequences, param_grid, n_jobs=1, verbose=0):
         Parameter grid to specify models to fit. See
         sklearn.grid_search.ParameterGrid for an explanation
     n_jobs : int, optional
-        Number of jobs to run in parallel using joblib.Parallel
+        Number of jobs to run in parallel using joblib.Parallel. With
+        n_jobs != 1, numeric sequences are written once to a temporary
+        memory-mapped file, which all of the workers read, instead of
+        being pickled and sent to each job.
+    attributes : str or list of str, optional
+        If supplied, return only these attributes of each fit model (e.g.
+        'timescales_'), rather than the models themselves, so that the
+        (large) fit models don't need to be sent back from the workers.
 
     Returns
     -------
     models : list
         List of models fit to the data according to
-        param_grid
+        param_grid. If ``attributes`` is a string, this is instead the list
+        of the values of that attribute, and if it is a list, a list of
+        dicts mapping each attribute name to its value.
     """
 
     if isinstance(param_grid, dict):
@@ -37,12 +53,21 @@ def param_sweep(model, sequences, param_grid, n_jobs=1, verbose=0):
     elif not isinstance(param_grid, ParameterGrid):
         raise ValueError("param_grid must be a dict or ParamaterGrid instance")
 
-    # iterable with (model, sequence) as items
-    iter_args = ((clone(model).set_params(**params), sequences)
-                 for params in param_grid)
+    temp_folder = None
+    if n_jobs != 1:
+        temp_folder, sequences = _memmap_sequences(sequences)
+
+    try:
+        # iterable with (model, sequence, attributes) as items
+        iter_args = ((clone(model).set_params(**params), sequences,
+                      attributes)
+                     for params in param_grid)
 
-    models = Parallel(n_jobs=n_jobs, verbose=verbose)(
-        delayed(_param_sweep_helper)(args) for args in iter_args)
+        models = Parallel(n_jobs=n_jobs, verbose=verbose)(
+            delayed(_param_sweep_helper)(args) for args in iter_args)
+    finally:
+        if temp_folder is not None:
+            shutil.rmtree(temp_folder, ignore_errors=True)
 
     return models
 
@@ -51,7 +76,54 @@ def _param_sweep_helper(args):
     """
     helper for fitting many models on some data
     """
-    model, sequences = args
+    model, sequences, attributes = args
+    if isinstance(sequences, _MemmapSequences):
+        sequences = sequences.load()
     model.fit(sequences)
 
-    return model
+    if attributes is None:
+        return model
+    if isinstance(attributes, string_types):
+        return getattr(model, attributes)
+    return dict((a, getattr(model, a)) for a in attributes)
+
+
+def _memmap_sequences(sequences):
+    """Write numeric sequences to a memory-mapped file in a temporary
+    folder, returning the folder and a reference to the sequences.
+
+    If the sequences aren't numeric arrays of the same dtype and the same
+    shape (except along the first axis), they're returned as is, and the
+    folder is None.
+    """
+    try:
+        arrays = [np.asarray(s) for s in sequences]
+    except ValueError:
+        return None, sequences
+    if (len(arrays) == 0 or
+            not all(a.ndim >= 1 and a.dtype.kind in 'biuf' for a in arrays)):
+        return None, sequences
+    if len(set((a.dtype, a.shape[1:]) for a in arrays)) != 1:
+        return None, sequences
+
+    temp_folder = tempfile.mkdtemp(prefix='msmb_param_sweep_')
+    try:
+        filename = os.path.join(temp_folder, 'sequences.npy')
+        np.save(filename, np.concatenate(arrays))
+    except Exception:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+    return temp_folder, _MemmapSequences(filename, [len(a) for a in arrays])
+
+
+class _MemmapSequences(object):
+    """Reference to sequences stored end to end in a .npy file, which
+    pickles cheaply, and is loaded as (copy-on-write) memory-mapped views"""
+
+    def __init__(self, filename, lengths):
+        self.filename = filename
+        self.lengths = lengths
+
+    def load(self):
+        X = np.load(self.filename, mmap_mode='c')
+        return np.split(X, np.cumsum(self.lengths)[:-1])
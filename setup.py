@@ -112,7 +112,10 @@ extensions.append(
 extensions.append(
     Extension('msmbuilder.msm._markovstatemodel',
               sources=[pjoin(MSMDIR, '_markovstatemodel.pyx'),
-                       pjoin(MSMDIR, 'src/transmat_mle_prinz.c')],
+                       pjoin(MSMDIR, 'src/transmat_mle_prinz.c'),
+                       pjoin(MSMDIR, 'src/sample_discrete.c')],
+              libraries=compiler.compiler_libraries_openmp,
+              extra_compile_args=compiler.compiler_args_openmp,
               include_dirs=[pjoin(MSMDIR, 'src'), np.get_include()]))
 
 extensions.append(
@@ -142,6 +145,7 @@ extensions.append(
               sources=['msmbuilder/libdistance/libdistance.pyx'],
               # msvc needs to be told "libtheobald", gcc wants just "theobald"
               libraries=['%stheobald' % ('lib' if compiler.msvc else '')],
+              extra_compile_args=compiler.compiler_args_sse3,
               include_dirs=["msmbuilder/libdistance/src",
                             mdtraj_capi['include_dir'], np.get_include()],
               library_dirs=[mdtraj_capi['lib_dir']],